@@ -0,0 +1,641 @@
+#!/usr/bin/env python
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""
+Netlink replay benchmark for ops-arpmgrd.
+
+Feeds a synthetic or recorded stream of RTM_NEWNEIGH/RTM_DELNEIGH
+messages to ops-arpmgrd through --nl-replay, with a local ovsdb-server
+standing in for the switch database, and reports events/s, commits and
+event to commit latency percentiles for each neighbor count.
+
+Synthetic run, 1k, 10k and 100k neighbors:
+
+    arpmgrd_replay_bench.py --schema vswitch.ovsschema
+
+Recorded run, from a capture taken on an nlmon device:
+
+    ip link add nlmon0 type nlmon && ip link set nlmon0 up
+    tcpdump -i nlmon0 -w neigh.pcap
+    arpmgrd_replay_bench.py --schema vswitch.ovsschema --pcap neigh.pcap
+
+Check that generated replay files are framed the way ops-arpmgrd
+reads them, without running it:
+
+    arpmgrd_replay_bench.py --self-test
+
+ops-arpmgrd, ovsdb-server, ovsdb-tool, ovsdb-client and ovs-appctl are
+looked up in PATH unless given. Latency percentiles are the upper bound
+of the power of two bucket they fall in, see arpmgrd/latency.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+# rtnetlink constants, from linux/rtnetlink.h and linux/neighbour.h
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWROUTE = 24
+RTM_NEWNEIGH = 28
+RTM_DELNEIGH = 29
+IFLA_IFNAME = 3
+NDA_DST = 1
+NDA_LLADDR = 2
+NUD_REACHABLE = 0x02
+NUD_STALE = 0x04
+ARPHRD_ETHER = 1
+ARPHRD_NETLINK = 824
+IFF_UP = 0x1
+NETLINK_ROUTE = 0
+NETLINK_GENERIC = 16
+
+NEIGH_TYPES = (RTM_NEWNEIGH, RTM_DELNEIGH)
+REPLAY_TYPES = (RTM_NEWLINK, RTM_DELLINK, RTM_NEWNEIGH, RTM_DELNEIGH)
+
+# pcap link type of captures on an nlmon device
+LINKTYPE_NETLINK = 253
+NLMON_HDR_LEN = 16
+
+DEFAULT_VRF_NAME = "vrf_default"
+PORT_IFINDEX_BASE = 1000
+
+# Longest datagram ops-arpmgrd replays, RECV_BUFFER_SIZE_MAX, and size
+# of a synthetic neighbor message
+RECV_BUFFER_SIZE_MAX = 1024 * 1024
+NEIGH_MSG_LEN = 48
+
+
+def nl_align(n):
+    return (n + 3) & ~3
+
+
+def nl_attr(attr_type, payload):
+    rta_len = 4 + len(payload)
+    pad = nl_align(rta_len) - rta_len
+    return struct.pack("=HH", rta_len, attr_type) + payload + b"\0" * pad
+
+
+def nl_msg(msg_type, body):
+    return struct.pack("=IHHII", 16 + len(body), msg_type, 0, 0, 0) + body
+
+
+def link_msg(ifindex, name):
+    body = struct.pack("=BBHiII", socket.AF_UNSPEC, 0, ARPHRD_ETHER,
+                       ifindex, IFF_UP, 0)
+    body += nl_attr(IFLA_IFNAME, name.encode("ascii") + b"\0")
+    return nl_msg(RTM_NEWLINK, body)
+
+
+def neigh_msg(msg_type, ifindex, addr, mac, state):
+    body = struct.pack("=BBHiHBB", socket.AF_INET, 0, 0, ifindex, state,
+                       0, 0)
+    body += nl_attr(NDA_DST, addr)
+    if mac is not None:
+        body += nl_attr(NDA_LLADDR, mac)
+    return nl_msg(msg_type, body)
+
+
+def write_dgram(f, dgram):
+    f.write(struct.pack("=I", len(dgram)))
+    f.write(dgram)
+
+
+def port_name(p):
+    return "bench%d" % p
+
+
+def synthetic_stream(path, n_neighbors, n_ports, flaps, per_dgram):
+    """
+    Write a replay file where each of 'n_neighbors' neighbors is learnt
+    reachable, goes stale and back 'flaps' times, and is deleted.
+    Returns (port names, neighbor events written).
+    """
+    ports = [port_name(p) for p in range(n_ports)]
+    events = 0
+
+    def neighbors():
+        for i in range(n_neighbors):
+            addr = struct.pack("!I", (10 << 24) + i + 2)
+            mac = struct.pack("!HI", 0x0200, i)
+            yield PORT_IFINDEX_BASE + i % n_ports, addr, mac
+
+    with open(path, "wb") as f:
+        for p, name in enumerate(ports):
+            write_dgram(f, link_msg(PORT_IFINDEX_BASE + p, name))
+
+        batch = []
+        rounds = [(RTM_NEWNEIGH, NUD_REACHABLE)]
+        rounds += [(RTM_NEWNEIGH, NUD_STALE),
+                   (RTM_NEWNEIGH, NUD_REACHABLE)] * flaps
+        rounds += [(RTM_DELNEIGH, NUD_STALE)]
+        for msg_type, state in rounds:
+            for ifindex, addr, mac in neighbors():
+                batch.append(neigh_msg(msg_type, ifindex, addr, mac, state))
+                events += 1
+                if len(batch) == per_dgram:
+                    write_dgram(f, b"".join(batch))
+                    batch = []
+        if batch:
+            write_dgram(f, b"".join(batch))
+    return ports, events
+
+
+def nl_messages(data):
+    """Yield (type, message) of each netlink message in 'data'."""
+    offset = 0
+    while offset + 16 <= len(data):
+        msg_len, msg_type = struct.unpack_from("=IH", data, offset)
+        if msg_len < 16 or offset + msg_len > len(data):
+            break
+        yield msg_type, data[offset:offset + msg_len]
+        offset += nl_align(msg_len)
+
+
+def link_name(msg):
+    """IFLA_IFNAME of a link message, or None."""
+    offset = 16 + 16
+    while offset + 4 <= len(msg):
+        rta_len, rta_type = struct.unpack_from("=HH", msg, offset)
+        if rta_len < 4:
+            break
+        if rta_type == IFLA_IFNAME:
+            name = msg[offset + 4:offset + rta_len].split(b"\0")[0]
+            return name.decode("ascii", "replace")
+        offset += nl_align(rta_len)
+    return None
+
+
+def pcap_stream(pcap, path):
+    """
+    Convert an nlmon capture to a replay file, keeping rtnetlink link
+    and neighbor messages. Returns (port names, neighbor events written).
+    """
+    ports = set()
+    events = 0
+
+    with open(pcap, "rb") as f:
+        hdr = f.read(24)
+        if len(hdr) < 24:
+            raise ValueError("%s: not a pcap file" % pcap)
+        magic = struct.unpack("<I", hdr[:4])[0]
+        if magic in (0xa1b2c3d4, 0xa1b23c4d):
+            endian = "<"
+        elif magic in (0xd4c3b2a1, 0x4d3cb2a1):
+            endian = ">"
+        else:
+            raise ValueError("%s: not a pcap file" % pcap)
+        linktype = struct.unpack(endian + "I", hdr[20:24])[0]
+        if linktype != LINKTYPE_NETLINK:
+            raise ValueError("%s: link type %d, expected an nlmon capture"
+                             % (pcap, linktype))
+
+        with open(path, "wb") as out:
+            while True:
+                rec = f.read(16)
+                if len(rec) < 16:
+                    break
+                incl_len = struct.unpack(endian + "IIII", rec)[2]
+                pkt = f.read(incl_len)
+                if len(pkt) < NLMON_HDR_LEN:
+                    break
+                # Cooked header, protocol is the netlink family
+                protocol = struct.unpack("!H", pkt[14:16])[0]
+                if protocol != NETLINK_ROUTE:
+                    continue
+                keep = []
+                for msg_type, msg in nl_messages(pkt[NLMON_HDR_LEN:]):
+                    if msg_type not in REPLAY_TYPES:
+                        continue
+                    if msg_type in NEIGH_TYPES:
+                        events += 1
+                    elif msg_type == RTM_NEWLINK:
+                        name = link_name(msg)
+                        if name and name != "lo":
+                            ports.add(name)
+                    keep.append(msg + b"\0" * (nl_align(len(msg)) - len(msg)))
+                if keep:
+                    write_dgram(out, b"".join(keep))
+    return sorted(ports), events
+
+
+def read_replay(path):
+    """
+    Yield the datagrams of a replay file, with the framing and length
+    bounds of nl_replay_run().
+    """
+    with open(path, "rb") as f:
+        while True:
+            hdr = f.read(4)
+            if not hdr:
+                return
+            if len(hdr) < 4:
+                raise ValueError("%s: truncated datagram length" % path)
+            dgram_len = struct.unpack("=I", hdr)[0]
+            if not 16 <= dgram_len <= RECV_BUFFER_SIZE_MAX:
+                raise ValueError("%s: bad datagram length %d"
+                                 % (path, dgram_len))
+            dgram = f.read(dgram_len)
+            if len(dgram) < dgram_len:
+                raise ValueError("%s: truncated datagram" % path)
+            yield dgram
+
+
+def check_replay(path):
+    """
+    Check that each datagram of a replay file is made of whole netlink
+    messages. Returns the number of neighbor messages.
+    """
+    events = 0
+    for dgram in read_replay(path):
+        offset = 0
+        for msg_type, msg in nl_messages(dgram):
+            if msg_type in NEIGH_TYPES:
+                events += 1
+            offset += nl_align(len(msg))
+        if offset != len(dgram):
+            raise ValueError("%s: datagram of %d bytes has %d bytes of "
+                             "messages" % (path, len(dgram), offset))
+    return events
+
+
+STATS_KEYS = ("datagrams", "done", "elapsed_ms", "dirty", "pending_deletes",
+              "commits", "commit_failures")
+
+
+def parse_stats(text):
+    """
+    'name value' pairs of the process part of arpmgrd/stats, before the
+    first vrf or port.
+    """
+    total = re.split(r"^(?:vrf|port) ", text, 1, flags=re.M)[0]
+    return dict(re.findall(r"(\w+) (\w+)", total))
+
+
+def write_pcap(path, packets):
+    """Write (netlink family, data) 'packets' as an nlmon capture."""
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535,
+                            LINKTYPE_NETLINK))
+        for protocol, data in packets:
+            pkt = struct.pack("!HHHQH", 0, ARPHRD_NETLINK, 0, 0, protocol)
+            pkt += data
+            f.write(struct.pack("<IIII", 0, 0, len(pkt), len(pkt)))
+            f.write(pkt)
+
+
+def self_test(workdir):
+    """Check replay files written by synthetic_stream() and pcap_stream()."""
+    msg = neigh_msg(RTM_NEWNEIGH, PORT_IFINDEX_BASE, b"\x0a\0\0\x02",
+                    b"\x02\0\0\0\0\0", NUD_REACHABLE)
+    if len(msg) != NEIGH_MSG_LEN:
+        raise RuntimeError("neighbor message is %d bytes, not %d"
+                           % (len(msg), NEIGH_MSG_LEN))
+
+    n_neighbors, flaps = 6000, 1
+    for per_dgram in (1, 7, RECV_BUFFER_SIZE_MAX // NEIGH_MSG_LEN):
+        path = os.path.join(workdir, "synthetic%d.bin" % per_dgram)
+        ports, events = synthetic_stream(path, n_neighbors, 3, flaps,
+                                         per_dgram)
+        if events != n_neighbors * (2 + 2 * flaps):
+            raise RuntimeError("synthetic stream has %d events" % events)
+        if check_replay(path) != events:
+            raise RuntimeError("%s: neighbor messages do not match the %d "
+                               "events written" % (path, events))
+
+    # Capture of the last synthetic stream, with messages and a
+    # netlink family that are not replayed
+    packets = [(NETLINK_ROUTE, dgram) for dgram in read_replay(path)]
+    packets.insert(1, (NETLINK_GENERIC, nl_msg(RTM_NEWNEIGH, b"")))
+    packets.insert(2, (NETLINK_ROUTE, nl_msg(RTM_NEWROUTE, b"\0" * 12)
+                       + link_msg(1, "lo")))
+    pcap = os.path.join(workdir, "capture.pcap")
+    write_pcap(pcap, packets)
+    path = os.path.join(workdir, "pcap.bin")
+    pcap_ports, pcap_events = pcap_stream(pcap, path)
+    if pcap_ports != sorted(ports) or pcap_events != events:
+        raise RuntimeError("capture gave ports %s and %d events, expected "
+                           "%s and %d" % (pcap_ports, pcap_events,
+                                          sorted(ports), events))
+    if check_replay(path) != events:
+        raise RuntimeError("%s: neighbor messages do not match the %d "
+                           "events written" % (path, events))
+
+    st = parse_stats("total: neighbors 0, neighbor_rows 0, dirty 1, "
+                     "pending_deletes 2\n"
+                     "  commits 3, commit_failures 0, resyncs 1\n"
+                     "  replay: datagrams 4, done yes, elapsed_ms 5\n"
+                     "vrf vrf_default (table 0):\n"
+                     "  commits 9\n")
+    if (st.get("commits"), st.get("done")) != ("3", "yes"):
+        raise RuntimeError("arpmgrd/stats parsed as %s" % st)
+
+
+def percentile(hist, p):
+    """Upper bound in usec of the bucket holding percentile 'p'."""
+    count = hist["count"]
+    if not count:
+        return None
+    cum = 0
+    for i, n in enumerate(hist["buckets"]):
+        cum += n
+        if cum >= p * count:
+            return 1 << (i + 1)
+    return 1 << len(hist["buckets"])
+
+
+def merge_hists(hists):
+    merged = {"count": 0, "buckets": []}
+    for h in hists:
+        merged["count"] += h["count"]
+        if not merged["buckets"]:
+            merged["buckets"] = [0] * len(h["buckets"])
+        for i, n in enumerate(h["buckets"]):
+            merged["buckets"][i] += n
+    return merged
+
+
+class Bench(object):
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.db = os.path.join(workdir, "conf.db")
+        self.db_sock = os.path.join(workdir, "db.sock")
+        self.ctl = os.path.join(workdir, "arpmgrd.ctl")
+        self.procs = []
+        with open(args.schema) as f:
+            self.schema = json.load(f)
+
+    def run_cmd(self, cmd):
+        return subprocess.check_output(cmd, universal_newlines=True)
+
+    def spawn(self, cmd, log):
+        with open(os.path.join(self.workdir, log), "w") as f:
+            proc = subprocess.Popen(cmd, stdout=f, stderr=subprocess.STDOUT)
+        self.procs.append(proc)
+        return proc
+
+    def stop(self):
+        for proc in reversed(self.procs):
+            if proc.poll() is None:
+                proc.terminate()
+                proc.wait()
+        self.procs = []
+
+    def wait_for(self, path, proc, what):
+        deadline = time.time() + 10
+        while not os.path.exists(path):
+            if proc.poll() is not None or time.time() > deadline:
+                raise RuntimeError("%s did not start, see logs in %s"
+                                   % (what, self.workdir))
+            time.sleep(0.01)
+
+    def start_ovsdb(self):
+        self.run_cmd([self.args.ovsdb_tool, "create", self.db,
+                      self.args.schema])
+        proc = self.spawn([self.args.ovsdb_server, self.db,
+                           "--remote=punix:" + self.db_sock,
+                           "--unixctl=" + os.path.join(self.workdir,
+                                                       "ovsdb.ctl")],
+                          "ovsdb-server.log")
+        self.wait_for(self.db_sock, proc, "ovsdb-server")
+
+    def has_column(self, table, column):
+        tables = self.schema["tables"]
+        return table in tables and column in tables[table]["columns"]
+
+    def populate(self, ports):
+        """Insert System, default VRF and 'ports' Port rows."""
+        ops = []
+        port_uuids = []
+        for p, name in enumerate(ports):
+            row = {"name": name}
+            if self.has_column("Port", "admin"):
+                row["admin"] = "up"
+            if self.has_column("Port", "ip4_address"):
+                row["ip4_address"] = "192.168.%d.%d/30" % (p // 64,
+                                                           (p % 64) * 4 + 1)
+            uuid_name = "port%d" % p
+            ops.append({"op": "insert", "table": "Port", "row": row,
+                        "uuid-name": uuid_name})
+            port_uuids.append(["named-uuid", uuid_name])
+
+        vrf = {"name": DEFAULT_VRF_NAME, "ports": ["set", port_uuids]}
+        if self.has_column("VRF", "table_id"):
+            vrf["table_id"] = 0
+        ops.append({"op": "insert", "table": "VRF", "row": vrf,
+                    "uuid-name": "vrf"})
+
+        system = {"cur_cfg": 1}
+        if self.has_column("System", "vrfs"):
+            system["vrfs"] = ["set", [["named-uuid", "vrf"]]]
+        ops.append({"op": "insert", "table": "System", "row": system})
+
+        reply = json.loads(self.run_cmd(
+            [self.args.ovsdb_client, "transact", "unix:" + self.db_sock,
+             json.dumps([self.schema["name"]] + ops)]))
+        errors = [r for r in reply if r and "error" in r]
+        if errors:
+            raise RuntimeError("populating database failed: %s" % errors)
+
+    def start_arpmgrd(self, replay):
+        cmd = []
+        if self.args.netns:
+            cmd += ["unshare", "--net"]
+            if os.geteuid() != 0:
+                cmd += ["--map-root-user"]
+        cmd += [self.args.arpmgrd, "--nl-replay=" + replay,
+                "--unixctl=" + self.ctl, "-vconsole:off",
+                "--log-file=" + os.path.join(self.workdir, "arpmgrd.log")]
+        cmd += self.args.arpmgrd_arg
+        cmd += ["unix:" + self.db_sock]
+        proc = self.spawn(cmd, "arpmgrd.out")
+        self.wait_for(self.ctl, proc, "ops-arpmgrd")
+
+    def appctl(self, *command):
+        return self.run_cmd([self.args.appctl, "-t", self.ctl] +
+                            list(command))
+
+    def stats(self):
+        text = self.appctl("arpmgrd/stats")
+        st = parse_stats(text)
+        missing = [k for k in STATS_KEYS if k not in st]
+        if missing:
+            raise RuntimeError("%s missing from arpmgrd/stats output:\n%s"
+                               % (", ".join(missing), text))
+        return {"done": st["done"] == "yes",
+                "replay_ms": int(st["elapsed_ms"]),
+                "pending": int(st["dirty"]) + int(st["pending_deletes"]),
+                "commits": int(st["commits"]),
+                "commit_failures": int(st["commit_failures"])}
+
+    def wait_drained(self, start):
+        """Poll until the stream is replayed and committed."""
+        deadline = start + self.args.timeout
+        last = None
+        while time.time() < deadline:
+            st = self.stats()
+            if st["done"] and not st["pending"]:
+                # One more poll, for a transaction still in flight
+                if last and last["commits"] == st["commits"]:
+                    return last
+                last = st
+                last["drained"] = time.time()
+            else:
+                last = None
+            time.sleep(0.01)
+        raise RuntimeError("replay not committed after %d s"
+                           % self.args.timeout)
+
+    def run(self, replay, ports, events):
+        try:
+            self.start_ovsdb()
+            self.populate(ports)
+            start = time.time()
+            self.start_arpmgrd(replay)
+            st = self.wait_drained(start)
+            lat = json.loads(self.appctl("arpmgrd/latency", "json"))
+        finally:
+            self.stop()
+
+        result = {"events": events, "replay_ms": st["replay_ms"],
+                  "drain_ms": int((st["drained"] - start) * 1000),
+                  "commits": st["commits"],
+                  "commit_failures": st["commit_failures"]}
+        result["replay_events_per_s"] = (
+            int(events * 1000 / st["replay_ms"]) if st["replay_ms"] else None)
+        result["events_per_s"] = (
+            int(events * 1000 / result["drain_ms"])
+            if result["drain_ms"] else None)
+        for t in ("new", "del"):
+            hist = merge_hists([v[t] for v in lat.values()])
+            result["%s_p50_usec" % t] = percentile(hist, 0.50)
+            result["%s_p99_usec" % t] = percentile(hist, 0.99)
+        return result
+
+
+COLUMNS = ("neighbors", "events", "replay_ms", "replay_events_per_s",
+           "drain_ms", "events_per_s", "commits", "commit_failures",
+           "new_p50_usec", "new_p99_usec", "del_p50_usec", "del_p99_usec")
+
+
+def print_table(results):
+    widths = [max(len(c), 10) for c in COLUMNS]
+    print("  ".join(c.rjust(w) for c, w in zip(COLUMNS, widths)))
+    for r in results:
+        print("  ".join(("-" if r[c] is None else str(r[c])).rjust(w)
+                        for c, w in zip(COLUMNS, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay netlink neighbor events into ops-arpmgrd "
+                    "against a local ovsdb-server.")
+    parser.add_argument("--schema",
+                        help="OVSDB schema with the Neighbor table")
+    parser.add_argument("--neighbors", default="1000,10000,100000",
+                        help="comma separated neighbor counts of synthetic "
+                             "runs (default: %(default)s)")
+    parser.add_argument("--ports", type=int, default=48,
+                        help="ports neighbors are spread on "
+                             "(default: %(default)s)")
+    parser.add_argument("--flaps", type=int, default=1,
+                        help="reachable/stale flaps of each neighbor "
+                             "before it is deleted (default: %(default)s)")
+    parser.add_argument("--per-dgram", type=int, default=1,
+                        help="messages per netlink datagram "
+                             "(default: %(default)s)")
+    parser.add_argument("--pcap",
+                        help="replay this nlmon capture instead of "
+                             "synthetic streams")
+    parser.add_argument("--arpmgrd", default="ops-arpmgrd")
+    parser.add_argument("--arpmgrd-arg", action="append", default=[],
+                        help="extra ops-arpmgrd option, may be repeated")
+    parser.add_argument("--ovsdb-server", default="ovsdb-server")
+    parser.add_argument("--ovsdb-tool", default="ovsdb-tool")
+    parser.add_argument("--ovsdb-client", default="ovsdb-client")
+    parser.add_argument("--appctl", default="ovs-appctl")
+    parser.add_argument("--no-netns", dest="netns", action="store_false",
+                        help="do not run ops-arpmgrd in its own network "
+                             "namespace, host neighbors are then synced "
+                             "too")
+    parser.add_argument("--timeout", type=int, default=600,
+                        help="seconds to wait for each run "
+                             "(default: %(default)s)")
+    parser.add_argument("--workdir",
+                        help="keep databases, replay files and logs here")
+    parser.add_argument("--json", action="store_true",
+                        help="print results as JSON")
+    parser.add_argument("--self-test", action="store_true",
+                        help="check framing of generated replay files and "
+                             "exit")
+    args = parser.parse_args()
+    if not args.schema and not args.self_test:
+        parser.error("--schema is required")
+    max_per_dgram = RECV_BUFFER_SIZE_MAX // NEIGH_MSG_LEN
+    if not 1 <= args.per_dgram <= max_per_dgram:
+        parser.error("--per-dgram must be between 1 and %d" % max_per_dgram)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="arpmgrd-bench-")
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+
+    results = []
+    try:
+        if args.self_test:
+            self_test(workdir)
+            print("self-test passed", file=sys.stderr)
+            return
+        if args.pcap:
+            runs = [("pcap", None)]
+        else:
+            runs = [("n%s" % n, int(n)) for n in args.neighbors.split(",")]
+        for name, n in runs:
+            rundir = os.path.join(workdir, name)
+            os.makedirs(rundir)
+            replay = os.path.join(rundir, "replay.bin")
+            if n is None:
+                ports, events = pcap_stream(args.pcap, replay)
+            else:
+                ports, events = synthetic_stream(replay, n, args.ports,
+                                                 args.flaps, args.per_dgram)
+            result = Bench(args, rundir).run(replay, ports, events)
+            result["neighbors"] = n if n is not None else "-"
+            results.append(result)
+            if not args.json:
+                print("%s: %d events, %s events/s, %d commits"
+                      % (name, events, result["events_per_s"],
+                         result["commits"]), file=sys.stderr)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,7 +26,38 @@
 #define ARPMGR_POLL_INTERVAL 5
 #define LOOPBACK_INTERFACE_NAME "lo"
 #define RECV_BUFFER_SIZE 8192
+#define RECV_BUFFER_SIZE_MIN 4096
+#define RECV_BUFFER_SIZE_MAX (1024 * 1024)
+#define NL_RECV_BATCH_DEFAULT 32
+#define NL_RECV_BATCH_MAX 1024
+#define OVSDB_COMMIT_BATCH_DEFAULT 500
+#define OVSDB_COMMIT_BATCH_MAX 100000
+#define OVSDB_COMMIT_HOLD_MS_DEFAULT 50
+#define OVSDB_COMMIT_HOLD_MS_MAX 10000
+#define RESYNC_CHUNK_DEFAULT 1000
+#define RESYNC_CHUNK_MAX 1000000
+#define TXN_RETRY_MAX 5
+#define TXN_RETRY_BACKOFF_MIN_MS 10
+#define TXN_RETRY_BACKOFF_MAX_MS 2000
+#define NL_DUMP_COALESCE_MAX 16
+#define NL_READER_RING_DEFAULT 8192
+#define NL_READER_RING_MAX (1 << 20)
+#define NBR_PROBE_WINDOW 64
+#define PROBE_RATE_DEFAULT 1000
+#define PROBE_PORT_RATE_DEFAULT 100
+#define PROBE_RATE_MAX 1000000
+#define PROBE_BURST_MS 10
+#define NH_RETRY_BACKOFF_MIN_MS 500
+#define NH_RETRY_BACKOFF_MAX_MS 30000
+#define NBR_LAT_BUCKETS 32
+#ifndef SOL_NETLINK
+#define SOL_NETLINK 270
+#endif
+#ifndef NETLINK_GET_STRICT_CHK
+#define NETLINK_GET_STRICT_CHK 12
+#endif
 #define IS_IPV4MULTICAST(address) ((address >> 28) == 14)
 #define MAC_ADDRSTRLEN 18
+#define MAC_ADDRLEN 6
 
 #endif /* ARPMGRD_H_ */
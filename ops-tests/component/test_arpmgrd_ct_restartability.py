@@ -44,6 +44,12 @@ mac2 = None
 column_count = 4
 
 
+def arpmgrd_counter(sw1, name):
+    output = sw1("ovs-appctl -t ops-arpmgrd arpmgrd/stats", shell='bash')
+    words = output.replace(",", " ").split()
+    return int(words[words.index(name) + 1])
+
+
 def test_arp_manager_configure_and_setup(topology, step):
     sw1 = topology.get('sw1')
     h1 = topology.get('h1')
@@ -399,3 +405,56 @@ def test_arp_manager_configure_and_setup(topology, step):
         if '192.168.2.2' in row:
             host2v4 = row
     assert 'failed' in host2v4
+
+
+def test_arp_manager_restart_chunked_resync(topology, step):
+    sw1 = topology.get('sw1')
+    assert sw1 is not None
+
+    sw1p3 = sw1.ports['if03']
+
+    step("\n########## Test to verify a resync larger than --resync-chunk "
+         "converges without spurious deletes ##########\n")
+    step("Adding 20 static arp entries with arpmgrd running\n")
+    for i in range(101, 121):
+        sw1("ip netns exec swns ip neigh add 192.168.3.{i} "
+            "lladdr 00:bb:cc:dd:ee:ff dev {sw1p3}".format(**locals()),
+            shell='bash')
+    sleep(5)
+    output = sw1("show arp")
+    for i in range(101, 121):
+        assert '192.168.3.{i}'.format(**locals()) in output
+
+    # kill arpmgrd
+    step("\nKilling arpmgrd\n")
+    sw1("ip netns exec swns killall ops-arpmgrd", shell='bash')
+
+    step("Adding 30 static arp entries and deleting 2 with arpmgrd "
+         "stopped\n")
+    for i in range(121, 151):
+        sw1("ip netns exec swns ip neigh add 192.168.3.{i} "
+            "lladdr 00:bb:cc:dd:ee:ff dev {sw1p3}".format(**locals()),
+            shell='bash')
+    sw1("ip netns exec swns ip neigh del 192.168.3.101 "
+        "dev {sw1p3}".format(**locals()), shell='bash')
+    sw1("ip netns exec swns ip neigh del 192.168.3.102 "
+        "dev {sw1p3}".format(**locals()), shell='bash')
+
+    # Restart arpmgrd, resync is written 8 neighbors at a time
+    step("Restarting arpmgrd with --resync-chunk=8\n")
+    sw1("ip netns exec swns ops-arpmgrd --pidfile --detach "
+        "--resync-chunk=8", shell='bash')
+
+    sleep(10)
+    output = sw1("show arp")
+    step(output + "\n\n")
+    assert '192.168.3.101' not in output
+    assert '192.168.3.102' not in output
+    for i in range(103, 151):
+        assert '192.168.3.{i}'.format(**locals()) in output
+
+    step("Verifying resync was done in chunks with only stale rows "
+         "deleted\n")
+    assert arpmgrd_counter(sw1, "resync_active") == 0
+    assert arpmgrd_counter(sw1, "resync_chunks") > 1
+    assert arpmgrd_counter(sw1, "resync_deletes") == 2
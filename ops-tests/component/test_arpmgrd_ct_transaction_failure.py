@@ -46,6 +46,12 @@ mac2 = None
 column_count = 4
 
 
+def arpmgrd_counter(sw1, name):
+    output = sw1("ovs-appctl -t ops-arpmgrd arpmgrd/stats", shell='bash')
+    words = output.replace(",", " ").split()
+    return int(words[words.index(name) + 1])
+
+
 def arp_manager_configure_and_setup(sw1, hs1, hs2, step):
     global mac1
     global mac2
@@ -227,6 +233,47 @@ def arp_manager_ovsdb_failure_check_new_updates(sw1, hs1, hs2, step):
     assert host2v4 is None
 
 
+def arp_manager_ovsdb_txn_retry(sw1, hs1, hs2, step):
+    step("Test to verify a transaction aborted by an ovsdb-server "
+         "restart is retried without a resync with kernel")
+    retry_cnt = arpmgrd_counter(sw1, "txn_retries")
+    resync_cnt = arpmgrd_counter(sw1, "txn_resyncs")
+    force_ins_cnt = arpmgrd_counter(sw1, "resync_inserts")
+    # Kill l3 portd so it does not add new ip address
+    # on restart which will clear neighbors
+    sw1("ip netns exec swns killall ops-portd", shell='bash')
+    # Stop ovsdb-server, so the transaction adding new entries
+    # is still in progress when the server is killed
+    step("\nStopping ovsdb server\n")
+    sw1("ip netns exec swns killall -STOP ovsdb-server", shell='bash')
+    step("Adding 5 static arp entries with ovsdb-server stopped\n")
+    for i in range(111, 116):
+        sw1("ip netns exec swns ip neigh add 192.168.1.{i} "
+            "lladdr 00:bb:cc:dd:ee:ff dev 1".format(**locals()),
+            shell='bash')
+    sleep(2)
+    # Transaction in progress is aborted with TRY_AGAIN
+    step("\nKilling ovsdb server\n")
+    sw1("ip netns exec swns killall -KILL ovsdb-server", shell='bash')
+    step("Restarting ovsdb-server\n")
+    sw1("ip netns exec swns /usr/sbin/ovsdb-server "
+        "--remote=punix:/var/run/openvswitch/db.sock "
+        "--detach --no-chdir --pidfile -vSYSLOG:INFO "
+        "/var/run/openvswitch/ovsdb.db /var/local/openvswitch/config.db",
+        shell='bash')
+    sleep(16)
+    output = sw1("do show arp")
+    step("Verifying new static neighbors in ovsdb after retry\n")
+    for i in range(111, 116):
+        assert '192.168.1.{i}'.format(**locals()) in output
+    step("Verifying transaction was retried without a resync\n")
+    assert arpmgrd_counter(sw1, "txn_retries") > retry_cnt
+    assert arpmgrd_counter(sw1, "txn_resyncs") == resync_cnt
+    assert arpmgrd_counter(sw1, "resync_inserts") == force_ins_cnt
+    # Restart l3 portd killed above
+    sw1("ip netns exec swns ops-portd --pidfile --detach", shell='bash')
+
+
 @mark.skipif(True, reason="Arp issue after restarting ovsdb server")
 def test_arpmgrd_ct_transaction_failure(topology, step):
     sw1 = topology.get("sw1")
@@ -241,3 +288,19 @@ def test_arpmgrd_ct_transaction_failure(topology, step):
     arp_manager_ovsdb_update(sw1, hs1, hs2, step)
     # Test for verifying arpmgr updates to db from kernel
     arp_manager_ovsdb_failure_check_new_updates(sw1, hs1, hs2, step)
+
+
+@mark.skipif(True, reason="Arp issue after restarting ovsdb server")
+def test_arpmgrd_ct_transaction_retry(topology, step):
+    sw1 = topology.get("sw1")
+    assert sw1 is not None
+    hs1 = topology.get("hs1")
+    assert hs1 is not None
+    hs2 = topology.get("hs2")
+    assert hs2 is not None
+    # Configure and setup to run test cases
+    arp_manager_configure_and_setup(sw1, hs1, hs2, step)
+    # Test for verifying arpmgr updates to db from kernel
+    arp_manager_ovsdb_update(sw1, hs1, hs2, step)
+    # Test for verifying arpmgr retries a transaction aborted by ovsdb
+    arp_manager_ovsdb_txn_retry(sw1, hs1, hs2, step)
@@ -17,6 +17,7 @@
  */
 #define _GNU_SOURCE
 #include <getopt.h>
+#include <inttypes.h>
 #include <limits.h>
 #include <signal.h>
 #include <stdlib.h>
@@ -31,6 +32,7 @@
 #include <netinet/in.h>
 #include <linux/netlink.h>
 #include <linux/rtnetlink.h>
+#include <linux/filter.h>
 #include <fcntl.h>
 #include <net/if.h>
 #include <sched.h>
@@ -41,6 +43,7 @@
 #include "daemon.h"
 #include "dirs.h"
 #include "poll-loop.h"
+#include "random.h"
 #include "unixctl.h"
 #include "openvswitch/vconn.h"
 #include "openvswitch/vlog.h"
@@ -49,6 +52,15 @@
 #include "fatal-signal.h"
 #include "stream.h"
 #include "dynamic-string.h"
+#include "hash.h"
+#include "hmap.h"
+#include "json.h"
+#include "ovs-atomic.h"
+#include "ovs-thread.h"
+#include "seq.h"
+#include "timeval.h"
+#include "token-bucket.h"
+#include "uuid.h"
 #include "arpmgrd.h"
 #include "ops-utils.h"
 
@@ -59,6 +71,8 @@ COVERAGE_DEFINE(arpmgr);
 static struct ovsdb_idl *idl;
 static unsigned int idl_seqno;
 static unixctl_cb_func arpmgrd_unixctl_debug_cnt;
+static unixctl_cb_func arpmgrd_unixctl_latency;
+static unixctl_cb_func arpmgrd_unixctl_stats;
 static int system_configured = false;
 static unixctl_cb_func arpmgrd_exit_cb;
 static char *parse_options(int argc, char *argv[], char **unixctl_path);
@@ -66,8 +80,6 @@ OVS_NO_RETURN static void usage(void);
 static struct ovsdb_idl_txn *txn = NULL;
 static enum ovsdb_idl_txn_status txn_status = TXN_SUCCESS;
 static bool ovsdb_commit_required = false;
-static bool reinstal_nh_port_up = false;
-static bool reinstal_nh = false;
 static int port_data_alloc = 0;
 static int nbr_alloc_cnt=0;
 static int ovsrec_neighbor_alloc_cnt = 0;
@@ -91,6 +103,28 @@ typedef enum sync_mode {
 static sync_mode_e sync_mode = SYNC_WITHOUT_CACHE_RESET;
 static sync_state_e sync_state = SYNC_REQUESTED;
 static int gbl_nl_pkt_process_cnt_per_iter = 100;
+static int gbl_nl_recv_batch = NL_RECV_BATCH_DEFAULT;
+static int gbl_nl_recv_buf_size = RECV_BUFFER_SIZE;
+static int gbl_commit_batch = OVSDB_COMMIT_BATCH_DEFAULT;
+static int gbl_commit_hold_ms = OVSDB_COMMIT_HOLD_MS_DEFAULT;
+static int gbl_resync_chunk = RESYNC_CHUNK_DEFAULT;
+static bool gbl_nl_bpf_filter = false;
+static int nl_bpf_filter_cnt, nl_bpf_filter_err_cnt;
+
+/* What to do when a netlink socket overruns (ENOBUFS) */
+typedef enum nl_overrun_recovery {
+    NL_OVERRUN_RESET,           /* Drop cache, full dump and resync */
+    NL_OVERRUN_INCREMENTAL,     /* Keep cache, dump and sweep the rest */
+} nl_overrun_recovery_e;
+static nl_overrun_recovery_e gbl_nl_overrun_recovery = NL_OVERRUN_RESET;
+static uint32_t nl_dump_seq;
+static bool nl_dump_filter = true;  /* Kernel filters dumps by ifindex */
+static int nl_strict_chk_cnt, nl_strict_chk_err_cnt;
+static bool gbl_nl_reader_thread = false;
+static int gbl_probe_rate = PROBE_RATE_DEFAULT;
+static int gbl_probe_port_rate = PROBE_PORT_RATE_DEFAULT;
+static int gbl_nl_reader_ring = NL_READER_RING_DEFAULT;
+static char *gbl_nl_replay_file;        /* --nl-replay, or NULL. */
 static bool dbg_stop_nh_probe = 0;
 /*This change is to for testing only. stop reprobing nh_entry when it goes to stale.
 */
@@ -101,6 +135,112 @@ struct nl_req {
     char            buf[256];
 };
 
+/* Socket overrun, in place of a netlink message type */
+#define NL_EVENT_OVERRUN (NLMSG_MIN_TYPE - 1)
+
+/*
+ * Netlink message decoded by nl_event_decode(), with what
+ * nl_event_apply() needs of it. Neighbor messages fill the nda_*
+ * fields, link messages 'ifindex' and 'ifname', NLMSG_ERROR 'error'.
+ */
+struct nl_event {
+    int64_t table_id;           /* Vrf of socket it was received on. */
+    long long int time_usec;    /* When it was received. */
+    uint16_t type;              /* nlmsg_type, or NL_EVENT_OVERRUN. */
+    uint32_t seq;               /* nlmsg_seq. */
+    int error;                  /* Negative errno. */
+    int ifindex;
+    uint8_t family;
+    uint16_t state;             /* ndm_state. */
+    uint8_t dst_len;            /* Length of 'dst', 0 if no NDA_DST. */
+    uint8_t dst[16];
+    bool has_lladdr;
+    uint8_t lladdr[MAC_ADDRLEN];
+    char ifname[IF_NAMESIZE];   /* "" if no IFLA_IFNAME. */
+};
+
+/*
+ * Statistics kept per VRF and per port, and for the whole process in
+ * 'nbr_stats_total'. Counters are bumped where the event happens and
+ * reported by arpmgrd/stats. Per port, only neighbor events, probes,
+ * pings and rows of neighbors on that port are counted.
+ */
+enum nbr_stats_event {
+    NBR_STATS_EV_NEWNEIGH,
+    NBR_STATS_EV_DELNEIGH,
+    NBR_STATS_EV_NEWLINK,
+    NBR_STATS_EV_DELLINK,
+    NBR_STATS_EV_OTHER,         /* NLMSG_DONE, NLMSG_ERROR. */
+    NBR_STATS_EV_N
+};
+
+static const char *nbr_stats_event_names[NBR_STATS_EV_N] = {
+    "newneigh", "delneigh", "newlink", "dellink", "other"
+};
+
+struct nbr_stats {
+    uint64_t events[NBR_STATS_EV_N]; /* Netlink messages applied. */
+    uint64_t probes;            /* Stale neighbors set to delay. */
+    uint64_t pings;             /* Next hop probes sent. */
+    uint64_t ping_failures;     /* Next hop probes with no route or
+                                   refused. */
+    uint64_t rows_updated;      /* Neighbor rows written to a transaction. */
+    uint64_t rows_deleted;      /* Neighbor rows deleted in a transaction. */
+    uint64_t rows_committed;    /* Rows written or deleted, committed. */
+    uint64_t rows_failed;       /* Rows written or deleted, failed. */
+    uint64_t overruns;          /* Netlink socket overruns. */
+    uint64_t recovery_dumps;    /* Neighbor dumps after an overrun. */
+};
+static struct nbr_stats nbr_stats_total;
+
+/* Process wide, see arpmgrd/stats */
+static struct proc_stats {
+    uint64_t commits;           /* Transactions committed. */
+    uint64_t commit_failures;   /* Transactions failed. */
+    uint64_t resyncs;           /* Resyncs of the db with the kernel. */
+    uint64_t nl_recv_syscalls;  /* recvmmsg() calls on netlink sockets. */
+    uint64_t nl_recv_dgrams;    /* Datagrams they returned. */
+    uint64_t nl_recv_full_batches; /* Calls that filled the batch. */
+    uint64_t nl_recv_batch_max; /* Most datagrams in one call. */
+    uint64_t nl_recv_truncated; /* Datagrams truncated. */
+    uint64_t ifname_misses;     /* Interface names not cached. */
+    uint64_t ifname_updates;    /* Link events applied to the cache. */
+    uint64_t recovery_swept;    /* Neighbors swept after a recovery dump. */
+    uint64_t recovery_busy;     /* Recovery dumps refused, EBUSY. */
+    uint64_t dumps_queued;      /* Per port dumps queued. */
+    uint64_t dumps_coalesced;   /* Dumps merged with a queued one. */
+    uint64_t dumps_sent;        /* Dump requests sent. */
+    uint64_t nbr_rows_tracked;  /* Tracked Neighbor rows handled. */
+    uint64_t port_rows_tracked; /* Tracked Port rows handled. */
+    uint64_t reader_applied;    /* Reader thread events applied. */
+    uint64_t reader_dropped;    /* Reader thread events dropped. */
+    uint64_t reader_pending_max; /* Most reader events waiting. */
+    uint64_t dirty_marked;      /* Neighbors marked dirty. */
+    uint64_t dirty_flushed;     /* Dirty neighbors written. */
+    uint64_t commit_batches;    /* Batches written. */
+    uint64_t commit_batch_rows; /* Rows in those batches. */
+    uint64_t commit_batch_last; /* Rows in the last batch. */
+    uint64_t commit_batch_max;  /* Most rows in a batch. */
+    uint64_t resync_chunks;     /* Resync chunks written. */
+    uint64_t resync_chunk_retries; /* Resync chunks written again. */
+    uint64_t txn_retries;       /* Failed transactions written again. */
+    uint64_t txn_retry_rows;    /* Rows in those transactions. */
+    uint64_t txn_resyncs;       /* Failed transactions that resynced. */
+    uint64_t nbr_probes_queued; /* Next hop probes queued. */
+    uint64_t nbr_probes_sent;   /* Next hop probes sent. */
+    uint64_t nbr_probes_gw;     /* Probes sent to a gateway's address. */
+    uint64_t nbr_probes_noroute; /* Probes with no route. */
+    uint64_t nbr_probes_failed; /* Probes that could not be sent. */
+    uint64_t nh_retries_armed;  /* Next hop retry timers armed. */
+    uint64_t nh_retries_fired;  /* Next hop retry timers expired. */
+    uint64_t nh_retry_pings;    /* Pings sent by expired timers. */
+    uint64_t probes_queued;     /* Stale neighbor probes queued. */
+    uint64_t probes_sent;       /* Stale neighbor probes sent. */
+    uint64_t probes_deferred;   /* Probes left for a later pass. */
+    uint64_t probes_dropped;    /* Probes dropped, no neighbor or socket. */
+    uint64_t probe_queue_max;   /* Most probes queued. */
+} proc_stats;
+
 struct vrf {
     char *name;                 /* User-specified arbitrary name. */
     const struct ovsrec_vrf *cfg;
@@ -108,10 +248,64 @@ struct vrf {
     struct shash ports;          /* "struct port"s indexed by name. */
     int nl_sock;
     int64_t table_id;
+    struct hmap_node table_id_node; /* In all_vrfs_by_table_id. */
+    struct hmap ifnames;        /* "struct ifname_node"s by ifindex. */
+    /* Recovery dump after an overrun, see nl_overrun_recover() */
+    uint32_t dump_gen;          /* Generation neighbors seen are marked. */
+    uint32_t dump_seq;          /* nlmsg_seq of recovery dump, or 0. */
+    bool dump_started;          /* First reply of recovery dump seen. */
+    bool dump_restart;          /* Overrun again while dump in progress. */
+    bool dump_busy;             /* Refused, another dump was running. */
+    /* Queued dumps, see nl_dump_queue_add() */
+    struct hmap dump_reqs;      /* "struct nl_dump_req"s. */
+    uint32_t dump_req_seq;      /* nlmsg_seq of queued dump sent, or 0. */
+    int dump_req_ifindex;       /* Its device, or 0. */
+    uint8_t dump_req_family;    /* Its family. */
+    bool dump_req_busy;         /* Refused, another dump was running. */
+    int probe_sock;             /* For next hop probes, or 0. */
+    struct token_bucket probe_tb;   /* Rate of STALE probes. */
+    unsigned int probe_pass;    /* Last probe_sched_run() pass 'probe_tb'
+                                   refused a probe in. */
+    struct nbr_stats stats;
 };
 
 static int nl_neighbor_sock;
 static void netlink_request_neighbor_dump(int sock);
+static void nl_reader_sock_remove(int sock);
+static struct vrf *arpmgrd_vrf_find_by_table_id(int64_t table_id);
+
+/*
+ * Netlink socket of a vrf. The default vrf shares nl_neighbor_sock,
+ * which is closed and reopened during resync, so it is always read
+ * from there rather than from the copy taken when the vrf was added.
+ */
+static inline bool
+arpmgrd_vrf_is_default(const struct vrf *vrf)
+{
+    return !strcmp(vrf->name, DEFAULT_VRF_NAME);
+}
+
+static inline int
+arpmgrd_vrf_nl_sock(const struct vrf *vrf)
+{
+    return arpmgrd_vrf_is_default(vrf) ? nl_neighbor_sock : vrf->nl_sock;
+}
+
+/*
+ * Receive ring used by receive_neighbor_update().
+ * 'batch' datagrams of 'buf_size' bytes each are pulled from the
+ * socket with a single recvmmsg() call. The ring is allocated once
+ * and reused for every socket and every iteration.
+ */
+struct nl_recv_ring {
+    struct mmsghdr *msgs;
+    struct iovec *iovs;
+    struct sockaddr_nl *addrs;
+    char *bufs;
+    int batch;
+    int buf_size;
+};
+static struct nl_recv_ring nl_recv_ring;
 
 
 #define NDA_RTA(r) \
@@ -125,316 +319,1978 @@ const struct ovsrec_port * find_port(const char *port_name);
 const struct ovsrec_vrf * find_port_vrf(const char *port_name);
 static struct vrf *find_port_vrf_in_cache(const char *port_name);
 
-struct nh_reinstall_port_up {
-    char name[IF_NAMESIZE];
-    bool ipv4;
-};
 /* Port cache structure */
 struct port_data {
+    struct hmap_node uuid_node; /* In all_ports_by_uuid. */
+    struct uuid uuid;           /* Port row uuid. */
+    struct shash_node *sh_node; /* In all_ports. */
     const struct ovsrec_port *port;
-    struct nh_reinstall_port_up port_up_reinstal;
     char ipv4_address[INET_ADDRSTRLEN];
     char admin[32];
+    struct hmap neighbors;      /* "struct neighbor_data"s on this port. */
+    bool del_pending;           /* Row deleted, unless inserted again in
+                                   the same run, see
+                                   arpmgrd_reconfigure_port(). */
+    struct token_bucket probe_tb;   /* Rate of STALE probes. */
+    unsigned int probe_pass;    /* Last probe_sched_run() pass 'probe_tb'
+                                   refused a probe in. */
+    struct nbr_stats stats;
 };
 
+static void port_cache_update(struct port_data *port_cache,
+                              const struct ovsrec_port *ovs_port);
+
 /* Mapping of all ports */
 static struct shash all_ports = SHASH_INITIALIZER(&all_ports);
-#define ARP_STATE_LEN 32
+/* Same ports keyed on their row uuid, all a deleted tracked row has */
+static struct hmap all_ports_by_uuid = HMAP_INITIALIZER(&all_ports_by_uuid);
 
 /* Mapping of all vrfs */
 static struct shash all_vrfs = SHASH_INITIALIZER(&all_vrfs);
+/* Same vrfs keyed on table id, for events and neighbor keys */
+static struct hmap all_vrfs_by_table_id =
+    HMAP_INITIALIZER(&all_vrfs_by_table_id);
+
+/* Mapping of port name to the vrf it is part of */
+static struct shash all_port_vrfs = SHASH_INITIALIZER(&all_port_vrfs);
+
+/* Add 'N' to counter 'FIELD' of the process, of 'VRF' and of port 'PD' */
+#define NBR_STATS_ADD(VRF, PD, FIELD, N)        \
+    do {                                        \
+        struct vrf *vrf__ = (VRF);              \
+        struct port_data *pd__ = (PD);          \
+                                                \
+        nbr_stats_total.FIELD += (N);           \
+        if (vrf__) {                            \
+            vrf__->stats.FIELD += (N);          \
+        }                                       \
+        if (pd__) {                             \
+            pd__->stats.FIELD += (N);           \
+        }                                       \
+    } while (0)
+
+static void
+nbr_stats_event(struct vrf *vrf, struct port_data *pd, uint16_t type)
+{
+    enum nbr_stats_event ev;
+
+    switch (type) {
+    case RTM_NEWNEIGH:
+        ev = NBR_STATS_EV_NEWNEIGH;
+        break;
+    case RTM_DELNEIGH:
+        ev = NBR_STATS_EV_DELNEIGH;
+        break;
+    case RTM_NEWLINK:
+        ev = NBR_STATS_EV_NEWLINK;
+        break;
+    case RTM_DELLINK:
+        ev = NBR_STATS_EV_DELLINK;
+        break;
+    default:
+        ev = NBR_STATS_EV_OTHER;
+        break;
+    }
+    NBR_STATS_ADD(vrf, pd, events[ev], 1);
+} /* nbr_stats_event */
+
+/*
+ * Neighbor cache key.
+ * Always zero filled before use, so that it can be hashed
+ * and compared as bytes.
+ */
+struct nbr_key {
+    uint32_t vrf_id;                    /* VRF table id, 0 for default */
+    uint8_t family;                     /* AF_INET or AF_INET6 */
+    uint8_t pad[3];
+    uint8_t addr[16];                   /* Address in network order */
+};
+
+/* Neighbor states, mapped to OVSDB Neighbor state strings */
+enum nbr_state {
+    NBR_STATE_NONE,
+    NBR_STATE_REACHABLE,
+    NBR_STATE_STALE,
+    NBR_STATE_INCOMPLETE,
+    NBR_STATE_FAILED,
+    NBR_STATE_PERMANENT,
+    NBR_STATE_MAX
+};
+
+static const char *const nbr_state_names[NBR_STATE_MAX] = {
+    [NBR_STATE_NONE] = "",
+    [NBR_STATE_REACHABLE] = OVSREC_NEIGHBOR_STATE_REACHABLE,
+    [NBR_STATE_STALE] = OVSREC_NEIGHBOR_STATE_STALE,
+    [NBR_STATE_INCOMPLETE] = OVSREC_NEIGHBOR_STATE_INCOMPLETE,
+    [NBR_STATE_FAILED] = OVSREC_NEIGHBOR_STATE_FAILED,
+    [NBR_STATE_PERMANENT] = OVSREC_NEIGHBOR_STATE_PERMANENT,
+};
+
+/* Retry deadline of a next hop, see nh_retry_arm() */
+struct nh_timer {
+    struct nh_timer *prev, *next;   /* In a timer wheel slot, or NULL. */
+    long long int tick;             /* Deadline, in NH_TIMER_TICK_MS. */
+};
 
-/* Neighbor cache structure */
+/*
+ * Neighbor cache structure.
+ * Address and family are in 'key', vrf name is in 'vrf'.
+ * String forms are built on demand with nbr_*_to_string().
+ */
 struct neighbor_data {
+    struct hmap_node node;       /* In all_neighbors. */
+    struct nbr_key key;          /* Cache key */
+    struct hmap_node port_node;  /* In port_data->neighbors or
+                                    unattached_neighbors. */
+    struct port_data *port_data; /* Port cache of 'device', if any */
+    struct hmap_node dirty_node; /* In dirty_neighbors, if 'dirty'. */
     const struct vrf *vrf;       /* pointer to vrf */
     const struct ovsrec_port *port;     /* pointer to port */
     const struct ovsrec_neighbor *nbr;  /* pointer to nbr */
-    char ip_address[INET6_ADDRSTRLEN];  /* Always nonnull. */
-    char network_family[5];             /* 'ipv4' or 'ipv6' */
-    char mac[MAC_ADDRSTRLEN];           /* Resolved Mac address */
-    char state[ARP_STATE_LEN];          /* ARP state */
-    char device[IF_NAMESIZE];           /* device */
     int  ifindex;                       /* if index of device in kernel */
+    unsigned int ping_retry_cnt;        /* retry ping cnt for routes_nh */
+    struct nh_timer retry_timer;        /* Ping again if not resolved */
+    long long int event_usec;           /* Receive time of oldest kernel
+                                           event not yet written, or 0 */
+    uint32_t gen;                       /* vrf->dump_gen when last seen */
+    uint8_t mac[MAC_ADDRLEN];           /* Resolved Mac address */
+    uint8_t state;                      /* enum nbr_state */
+    bool has_mac;                       /* 'mac' is valid */
+    bool dirty;                         /* OVSDB row needs update */
     bool dp_hit;                        /* dp_hit value */
     bool nbr_unresolved;   /* the neighbor entry is a next hop */
     bool routes_nh;
-    unsigned int ping_retry_cnt;         /* retry ping cnt for routes_nh */
-    unsigned int revalidate_del;         /*to avoid db update for nbr entry referenced by route(s) if kernel deletes it
-    */
-    char vrf_name[OVSDB_VRF_NAME_MAXLEN];/* VRF name */
+    bool revalidate_del;   /* to avoid db update for nbr entry referenced
+                              by route(s) if kernel deletes it */
+    char device[IF_NAMESIZE];           /* device */
 };
-/* Mapping of all the neighbors. */
-static struct shash all_neighbors = SHASH_INITIALIZER(&all_neighbors);
-#define VRF_IP_KEY_MAX_LEN \
-    (OVSDB_VRF_NAME_MAXLEN + INET6_ADDRSTRLEN + 2) /* includes delimiter */
+/* Mapping of all the neighbors, keyed on struct nbr_key. */
+static struct hmap all_neighbors = HMAP_INITIALIZER(&all_neighbors);
+/* Neighbors updated from kernel, not yet written to OVSDB */
+static struct hmap dirty_neighbors = HMAP_INITIALIZER(&dirty_neighbors);
 
-/* Build hash key for a given vrf name and ip address */
-static int
-get_hash_key(char* vrf_name, char *ip, char *key)
+/*
+ * Commit scheduler.
+ * When idle, neighbor updates and deletes from kernel are written right
+ * away. While busy, that is while a transaction is in flight, the last
+ * batch was full, or a batch was written less than 'gbl_commit_hold_ms'
+ * ago, they are held until 'gbl_commit_hold_ms' has passed since the
+ * oldest one was queued, 'gbl_commit_batch' of them are pending, or a
+ * commit is required anyway. They are written to a transaction of at
+ * most 'gbl_commit_batch' changes.
+ */
+static long long int commit_hold_start; /* Oldest pending change, or 0. */
+static long long int commit_last_flush; /* Last batch written, or 0. */
+static bool commit_backlog;     /* Last batch was full, more pending. */
+
+/* Neighbor row deleted in kernel, to be deleted from OVSDB */
+struct nbr_pending_del {
+    struct hmap_node node;      /* In pending_nbr_deletes. */
+    struct uuid uuid;           /* Neighbor row uuid. */
+    long long int event_usec;   /* Receive time of kernel delete, or 0. */
+    uint32_t vrf_id;            /* VRF table id of kernel delete. */
+};
+static struct hmap pending_nbr_deletes =
+    HMAP_INITIALIZER(&pending_nbr_deletes);
+
+/*
+ * Journal of neighbors written and rows deleted in the transaction
+ * being built or committed. If it fails, only these are retried.
+ */
+static struct nbr_key *txn_journal_keys;
+static size_t txn_journal_n_keys, txn_journal_allocated_keys;
+struct txn_journal_del {
+    struct uuid uuid;           /* Deleted row. */
+    uint32_t vrf_id;            /* Its VRF table id. */
+};
+static struct txn_journal_del *txn_journal_dels;
+static size_t txn_journal_n_dels, txn_journal_allocated_dels;
+/* Journal entries written by a resync chunk, which retries them itself */
+static size_t txn_journal_chunk_keys[2], txn_journal_chunk_dels[2];
+
+static int txn_fail_streak;           /* Consecutive failed commits. */
+static long long int txn_retry_until; /* Backoff before retry, or 0. */
+
+static void
+txn_journal_add_nbr(const struct nbr_key *key)
 {
-    snprintf(key, VRF_IP_KEY_MAX_LEN, "%s-%s", vrf_name, ip);
-    return strlen(key);
-} /* get_hash_key */
+    if (txn_journal_n_keys >= txn_journal_allocated_keys) {
+        txn_journal_keys = x2nrealloc(txn_journal_keys,
+                                      &txn_journal_allocated_keys,
+                                      sizeof *txn_journal_keys);
+    }
+    txn_journal_keys[txn_journal_n_keys++] = *key;
+} /* txn_journal_add_nbr */
+
+static void
+txn_journal_add_delete(const struct uuid *uuid, uint32_t vrf_id)
+{
+    struct txn_journal_del *del;
+
+    if (txn_journal_n_dels >= txn_journal_allocated_dels) {
+        txn_journal_dels = x2nrealloc(txn_journal_dels,
+                                      &txn_journal_allocated_dels,
+                                      sizeof *txn_journal_dels);
+    }
+    del = &txn_journal_dels[txn_journal_n_dels++];
+    del->uuid = *uuid;
+    del->vrf_id = vrf_id;
+} /* txn_journal_add_delete */
 
-/* Neighbor cache functions */
 /*
- * Add a neighbor entry in cache keyed on
- * vrf name and ip address
- * If it exists already return existing entry
- * */
-static struct neighbor_data*
-add_neighbor_to_cache(char *vrf, char *ip_address)
+ * Latency from kernel event receipt to OVSDB commit.
+ * Neighbor updates and deletes are stamped with the receive time of
+ * their netlink event, the stamp follows them into the transaction
+ * journal and latency is recorded once the transaction commits, in
+ * log2 microsecond buckets per VRF and event type.
+ */
+enum nbr_lat_type {
+    NBR_LAT_NEW,                /* RTM_NEWNEIGH, row inserted/updated. */
+    NBR_LAT_DEL,                /* RTM_DELNEIGH, row deleted. */
+    NBR_LAT_N_TYPES
+};
+
+static const char *nbr_lat_type_names[NBR_LAT_N_TYPES] = {
+    "new", "del"
+};
+
+struct nbr_lat_hist {
+    uint64_t buckets[NBR_LAT_BUCKETS]; /* [2^i, 2^(i+1)) usec, last one
+                                          open ended. */
+    uint64_t count;
+    uint64_t sum_usec;
+    uint64_t max_usec;
+};
+
+struct nbr_lat_vrf {
+    struct hmap_node node;      /* In nbr_lat_vrfs. */
+    uint32_t vrf_id;            /* VRF table id. */
+    struct nbr_lat_hist hists[NBR_LAT_N_TYPES];
+};
+static struct hmap nbr_lat_vrfs = HMAP_INITIALIZER(&nbr_lat_vrfs);
+
+/* Stamped change written to the transaction being built or committed */
+struct nbr_lat_sample {
+    enum nbr_lat_type type;
+    uint32_t vrf_id;
+    long long int event_usec;
+    struct nbr_key key;         /* Neighbor, if NBR_LAT_NEW. */
+    struct uuid uuid;           /* Deleted row, if NBR_LAT_DEL. */
+};
+static struct nbr_lat_sample *txn_journal_lats;
+static size_t txn_journal_n_lats, txn_journal_allocated_lats;
+
+/* Event being applied by nl_event_apply(), stamps queued deletes */
+static const struct nl_event *nl_event_cur;
+
+static void
+txn_journal_add_lat(enum nbr_lat_type type, uint32_t vrf_id,
+                    long long int event_usec, const struct nbr_key *key,
+                    const struct uuid *uuid)
 {
-    struct neighbor_data *new_nbr = NULL;
-    VLOG_DBG("Neighbor update from kernel. %s being added\n", ip_address);
-    if (ip_address && vrf) {
-        struct shash_node *sh_node;
-        char key[VRF_IP_KEY_MAX_LEN];
+    struct nbr_lat_sample *s;
 
-        if (!get_hash_key(vrf, ip_address, key)) {
-            return new_nbr;
-        }
+    if (txn_journal_n_lats >= txn_journal_allocated_lats) {
+        txn_journal_lats = x2nrealloc(txn_journal_lats,
+                                      &txn_journal_allocated_lats,
+                                      sizeof *txn_journal_lats);
+    }
+    s = &txn_journal_lats[txn_journal_n_lats++];
+    memset(s, 0, sizeof *s);
+    s->type = type;
+    s->vrf_id = vrf_id;
+    s->event_usec = event_usec;
+    if (key) {
+        s->key = *key;
+    }
+    if (uuid) {
+        s->uuid = *uuid;
+    }
+} /* txn_journal_add_lat */
 
-        sh_node = shash_find(&all_neighbors, key);
+static struct nbr_lat_vrf *
+nbr_lat_vrf_get(uint32_t vrf_id)
+{
+    struct nbr_lat_vrf *lv;
 
-        if (!sh_node) {
-            /* Allocate structure to save state information for this interface. */
-            new_nbr = (struct neighbor_data *) xcalloc(1, sizeof *new_nbr);
-            nbr_alloc_cnt++;
-            if (!shash_add(&all_neighbors, key, new_nbr)) {
-                free(new_nbr);
-                nbr_alloc_cnt--;
-                new_nbr = NULL;
-                VLOG_WARN("vrf %s Neighbor %s : Unable to add neighbor", vrf, ip_address);
-            }
-        } else {
-            VLOG_WARN("vrf %s Neighbor %s specified twice", vrf, ip_address);
-            new_nbr = sh_node->data;
+    HMAP_FOR_EACH_WITH_HASH (lv, node, hash_int(vrf_id, 0), &nbr_lat_vrfs) {
+        if (lv->vrf_id == vrf_id) {
+            return lv;
         }
     }
-    return new_nbr;
-} /* add_neighbor_to_cache */
+    lv = xzalloc(sizeof *lv);
+    lv->vrf_id = vrf_id;
+    hmap_insert(&nbr_lat_vrfs, &lv->node, hash_int(vrf_id, 0));
+    return lv;
+} /* nbr_lat_vrf_get */
 
-/* Delete neighbor from local cache */
 static void
-delete_neighbor_from_cache(char *vrf_name, char *ip_address)
+nbr_lat_record(const struct nbr_lat_sample *s, long long int now)
 {
-    char key[VRF_IP_KEY_MAX_LEN];
-    struct shash_node *sh_node;
+    struct nbr_lat_hist *h = &nbr_lat_vrf_get(s->vrf_id)->hists[s->type];
+    uint64_t usec = now > s->event_usec ? now - s->event_usec : 0;
+    uint64_t v = usec;
+    int i = 0;
 
-    if (!get_hash_key(vrf_name, ip_address, key)) {
-        VLOG_ERR("Unable to get key for entry");
-        return;
+    while (v >>= 1) {
+        i++;
     }
+    h->buckets[MIN(i, NBR_LAT_BUCKETS - 1)]++;
+    h->count++;
+    h->sum_usec += usec;
+    h->max_usec = MAX(h->max_usec, usec);
+} /* nbr_lat_record */
 
-    sh_node = shash_find(&all_neighbors, key);
+/* Transaction committed, record latency of the events it carried */
+static void
+nbr_lat_commit_done(void)
+{
+    long long int now;
+    size_t i;
 
-    if (!sh_node) {
-        VLOG_ERR("Unable to delete a neighbor %s, vrf %s that has entry "
-                "in hash", ip_address, vrf_name);
+    if (!txn_journal_n_lats) {
         return;
     }
+    now = time_usec();
+    for (i = 0; i < txn_journal_n_lats; i++) {
+        nbr_lat_record(&txn_journal_lats[i], now);
+    }
+    txn_journal_n_lats = 0;
+} /* nbr_lat_commit_done */
 
-    free(sh_node->data);
-    nbr_alloc_cnt--;
-    shash_delete(&all_neighbors, sh_node);
-} /* delete_neighbor_from_cache */
-
-/* Find a neighbor in local cache */
-static struct neighbor_data*
-find_neighbor_in_cache(char *vrf_name, char *ip_address)
+static void
+nbr_lat_reset(void)
 {
-    char key[VRF_IP_KEY_MAX_LEN];
-    struct shash_node *sh_node;
-    struct neighbor_data *nbr = NULL;
+    struct nbr_lat_vrf *lv;
 
-    if (!get_hash_key(vrf_name, ip_address, key)) {
-        VLOG_ERR("Unable to get key for entry");
-        return nbr;
+    HMAP_FOR_EACH_POP (lv, node, &nbr_lat_vrfs) {
+        free(lv);
     }
+} /* nbr_lat_reset */
 
-    sh_node = shash_find(&all_neighbors, key);
+static void
+txn_journal_clear(void)
+{
+    txn_journal_n_keys = 0;
+    txn_journal_n_dels = 0;
+    txn_journal_n_lats = 0;
+    memset(txn_journal_chunk_keys, 0, sizeof txn_journal_chunk_keys);
+    memset(txn_journal_chunk_dels, 0, sizeof txn_journal_chunk_dels);
+} /* txn_journal_clear */
 
-    if (!sh_node) {
-        VLOG_DBG("Unable to find a neighbor %s, vrf %s that has entry "
-                "in hash", ip_address, vrf_name);
-        return nbr;
+static void
+commit_sched_note(void)
+{
+    if (!commit_hold_start) {
+        commit_hold_start = time_msec();
     }
+} /* commit_sched_note */
+/* Neighbors whose device has no entry in all_ports */
+static struct hmap unattached_neighbors =
+    HMAP_INITIALIZER(&unattached_neighbors);
 
-    nbr = sh_node->data;
-    return nbr;
-} /* find_neighbor_in_cache */
+static uint32_t
+nbr_key_hash(const struct nbr_key *key)
+{
+    return hash_bytes(key, sizeof *key, 0);
+} /* nbr_key_hash */
 
-/* Netlink functions */
+static bool
+nbr_key_equals(const struct nbr_key *a, const struct nbr_key *b)
+{
+    return !memcmp(a, b, sizeof *a);
+} /* nbr_key_equals */
 
 /*
- * Open a netlink socket registering for group
- * by entering corresponding namespace.
- * Send a neighbor dump request on socket
- * for both the namespace.
- * */
-static void
-netlink_socket_open(const char *vrf_name, int *sock, int protocol, int group)
+ * Build key from a binary address as found in netlink attributes.
+ * Returns false if family is not supported or address is too short.
+ */
+static bool
+nbr_key_init(struct nbr_key *key, uint32_t vrf_id, int family,
+             const void *addr, size_t len)
 {
-    struct sockaddr_nl s_addr;
-    struct vrf_sock_params vrf_params;
+    size_t addr_len;
 
-    if (*sock > 0)
-        return;
+    memset(key, 0, sizeof *key);
+    if (family == AF_INET) {
+        addr_len = sizeof(struct in_addr);
+    } else if (family == AF_INET6) {
+        addr_len = sizeof(struct in6_addr);
+    } else {
+        return false;
+    }
+    if (!addr || len < addr_len) {
+        return false;
+    }
 
-    vrf_params.nl_params.family = AF_NETLINK;
-    vrf_params.nl_params.type = SOCK_RAW;
-    vrf_params.nl_params.protocol = protocol;
+    key->vrf_id = vrf_id;
+    key->family = family;
+    memcpy(key->addr, addr, addr_len);
+    return true;
+} /* nbr_key_init */
 
-    *sock = vrf_create_socket((char *)vrf_name, &vrf_params);
+/* Build key from an ip address string as found in OVSDB */
+static bool
+nbr_key_from_string(struct nbr_key *key, uint32_t vrf_id, const char *ip)
+{
+    struct in6_addr addr;
+    int family;
 
-    if (*sock < 0) {
-        VLOG_ERR("Netlink socket creation failed (%s)",strerror(errno));
-        goto label;
-    }
-    uint32_t rxbufsize = 2097152; // 2 Mb
-    int err = setsockopt(*sock, SOL_SOCKET, SO_RCVBUFFORCE,&rxbufsize, sizeof(rxbufsize));
-    if(err){
-        VLOG_ERR("setsockopt: SO_RCVBUFFORCE err %d",errno);
-        close(*sock);
-        return;
+    memset(key, 0, sizeof *key);
+    if (!ip) {
+        return false;
     }
-    memset((void *) &s_addr, 0, sizeof(s_addr));
-    s_addr.nl_family = AF_NETLINK;
-    s_addr.nl_pid = getpid();
-    s_addr.nl_groups = group;
-    if (bind(*sock, (struct sockaddr *) &s_addr, sizeof(s_addr)) < 0) {
-      if (errno != EADDRINUSE) {
-        VLOG_ERR("netlink socket bind failed (%s)", strerror(errno));
-        goto label;
-      }
+    family = strchr(ip, ':') ? AF_INET6 : AF_INET;
+    if (inet_pton(family, ip, &addr) != 1) {
+        return false;
     }
+    return nbr_key_init(key, vrf_id, family, &addr, sizeof addr);
+} /* nbr_key_from_string */
 
-    netlink_request_neighbor_dump(*sock);
-    if(sync_state == SYNC_REQUESTED)
-       sync_state = SYNC_IN_PROGRESS;
-
-label:
-    return;
-} /* netlink_socket_open */
-
-/* close the netlink socket */
-static void
-close_netlink_socket(int socket)
+/* String forms of cache entry fields */
+static const char *
+nbr_state_to_string(const struct neighbor_data *nbr)
 {
-    close(socket);
-} /* close_netlink_socket */
+    return nbr->state < NBR_STATE_MAX ? nbr_state_names[nbr->state] : "";
+} /* nbr_state_to_string */
 
-/* Function to Send netlink message requesting Neighbor dump */
-static void
-netlink_request_neighbor_dump(int sock)
+static enum nbr_state
+nbr_state_from_string(const char *state)
 {
-    struct rtattr *rta;
-    struct nl_req req;
+    int i;
 
-    memset(&req, 0, sizeof(req));
-    req.nlh.nlmsg_len = NLMSG_LENGTH(sizeof(struct ndmsg));
-    req.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+    for (i = 0; state && i < NBR_STATE_MAX; i++) {
+        if (!strcmp(nbr_state_names[i], state)) {
+            return i;
+        }
+    }
+    return NBR_STATE_NONE;
+} /* nbr_state_from_string */
 
-    req.nlh.nlmsg_type = RTM_GETNEIGH;
-    req.ndm.ndm_family = AF_UNSPEC;
-    req.nlh.nlmsg_pid = 0;
+static const char *
+nbr_family_to_string(const struct neighbor_data *nbr)
+{
+    return nbr->key.family == AF_INET6 ? OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6
+                                       : OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4;
+} /* nbr_family_to_string */
 
-    rta = (struct rtattr *)(((char *)&req) + NLMSG_ALIGN(req.nlh.nlmsg_len));
-    rta->rta_len = RTA_LENGTH(4);
+/* 'buf' must hold INET6_ADDRSTRLEN bytes */
+static const char *
+nbr_ip_to_string(const struct neighbor_data *nbr, char *buf)
+{
+    if (!inet_ntop(nbr->key.family, nbr->key.addr, buf, INET6_ADDRSTRLEN)) {
+        buf[0] = '\0';
+    }
+    return buf;
+} /* nbr_ip_to_string */
 
-    if (send(sock, &req, req.nlh.nlmsg_len, 0) == -1) {
-        VLOG_ERR("Failed to send netlink request for neighbor dump");
-        return;
+/* 'buf' must hold MAC_ADDRSTRLEN bytes, empty string if mac is unknown */
+static const char *
+nbr_mac_to_string(const struct neighbor_data *nbr, char *buf)
+{
+    if (!nbr->has_mac) {
+        buf[0] = '\0';
+    } else {
+        snprintf(buf, MAC_ADDRSTRLEN, "%02x:%02x:%02x:%02x:%02x:%02x",
+                 nbr->mac[0], nbr->mac[1], nbr->mac[2],
+                 nbr->mac[3], nbr->mac[4], nbr->mac[5]);
     }
-    nl_dump_req_cnt++;
-    return;
-} /* netlink_request_neighbor_dump */
+    return buf;
+} /* nbr_mac_to_string */
+
+static void
+nbr_clear_mac(struct neighbor_data *nbr)
+{
+    memset(nbr->mac, 0, sizeof nbr->mac);
+    nbr->has_mac = false;
+} /* nbr_clear_mac */
 
 /*
- * Function to set state of a Neighbor to Delay
- * and kernel will trigger a probe
+ * Next hop retry timers.
+ * A next hop that is pinged gets a retry deadline, with exponential
+ * backoff on its ping_retry_cnt and some jitter. If it is not resolved
+ * by then, it is pinged again, up to MAX_NH_PING_CNT times. Deadlines
+ * are kept in a hierarchical timer wheel of NH_TIMER_LEVELS levels of
+ * NH_TIMER_SLOTS slots: level 0 slots are one tick each, and a slot of
+ * a higher level is spread over the level below when its turn comes.
+ * Retry work is then proportional to due next hops.
  */
+#define NH_TIMER_TICK_MS 10
+#define NH_TIMER_BITS 6
+#define NH_TIMER_SLOTS (1 << NH_TIMER_BITS)
+#define NH_TIMER_LEVELS 4
+#define NH_TIMER_SPAN (1LL << (NH_TIMER_LEVELS * NH_TIMER_BITS))
+
+static struct nh_timer_wheel {
+    struct nh_timer slots[NH_TIMER_LEVELS][NH_TIMER_SLOTS]; /* List heads. */
+    long long int tick;         /* Last tick run. */
+    size_t n;                   /* Timers armed. */
+} nh_timers;
+
+/* Empty timer wheel, timers in it are forgotten */
 static void
-send_neighbor_probe(int sock, int ifindex, int family, void* ip, int plen)
+nh_timer_wheel_init(void)
 {
-    int len = RTA_LENGTH(plen);
-    struct rtattr *rta;
-    struct nl_req req;
-
-    memset(&req, 0, sizeof(req));
+    int level, i;
 
-    req.nlh.nlmsg_len = NLMSG_LENGTH(sizeof(struct ndmsg));
-    req.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_REPLACE;
-    req.nlh.nlmsg_type = RTM_NEWNEIGH;
-    req.ndm.ndm_family = AF_UNSPEC;
-    req.ndm.ndm_state = NUD_DELAY;
-    req.ndm.ndm_family = family;
-    req.ndm.ndm_ifindex = ifindex;
+    for (level = 0; level < NH_TIMER_LEVELS; level++) {
+        for (i = 0; i < NH_TIMER_SLOTS; i++) {
+            struct nh_timer *head = &nh_timers.slots[level][i];
 
-    if (NLMSG_ALIGN(req.nlh.nlmsg_len) + RTA_ALIGN(len) > sizeof(req)) {
-        VLOG_ERR("Message length exceeded sizeof request");
-        return;
+            head->prev = head->next = head;
+        }
     }
+    nh_timers.tick = time_msec() / NH_TIMER_TICK_MS;
+    nh_timers.n = 0;
+} /* nh_timer_wheel_init */
 
-    rta = NLMSG_TAIL(&req.nlh);
-    rta->rta_type = NDA_DST;
-    rta->rta_len = len;
-    memcpy(RTA_DATA(rta), ip, plen);
-    req.nlh.nlmsg_len = NLMSG_ALIGN(req.nlh.nlmsg_len) + RTA_ALIGN(len);
-
-    if (send(sock, &req, req.nlh.nlmsg_len, MSG_DONTWAIT) == -1) {
-        VLOG_ERR("Failed to send netlink request for neighbor probe");
-        return;
+static void
+nh_timer_remove(struct nh_timer *t)
+{
+    if (t->next) {
+        t->prev->next = t->next;
+        t->next->prev = t->prev;
+        t->prev = t->next = NULL;
+        nh_timers.n--;
     }
-    nl_probe_req_cnt++;
-    return;
-} /* send_neighbor_probe */
+} /* nh_timer_remove */
 
-/* Functions for parsing nlmsg, populating cache and updating OVSDB */
+static void
+nh_timer_list_push(struct nh_timer *head, struct nh_timer *t)
+{
+    t->next = head;
+    t->prev = head->prev;
+    head->prev->next = t;
+    head->prev = t;
+} /* nh_timer_list_push */
 
-/* Update/Insert ovsdb row from cache entry */
-static int
-update_neighbor_to_ovsdb(struct neighbor_data *cache_nbr,
-                         bool insert_row_without_checking)
+/* Put 't' in its slot, 'base' being the first tick not yet run */
+static void
+nh_timer_insert(struct nh_timer *t, long long int base)
 {
-    const struct ovsrec_neighbor *ovs_nbr;
-    bool found = false;
-    /* Some of the fields are not yet populated for the externally generated neighbor. Lets do them here*/
-    if(cache_nbr->nbr_unresolved){
-        cache_nbr->nbr_unresolved = false;
-        ovs_nbr = cache_nbr->nbr;
-        ovsrec_neighbor_set_address_family(ovs_nbr, cache_nbr->network_family);
-        ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
-        /* I assumeexternal module may not know proper mac, so lets' add it */
-        if(cache_nbr->mac)
-            ovsrec_neighbor_set_mac(ovs_nbr, cache_nbr->mac);
-        /* The state information may have created but might be updated by kernel */
-        if(cache_nbr->state) {
-            ovsrec_neighbor_set_state(ovs_nbr, cache_nbr->state);
-        }
-        ovsdb_commit_required = true;
-        return 1;
+    long long int delta;
+    int level;
+
+    if (t->tick < base) {
+        t->tick = base;
+    } else if (t->tick - base >= NH_TIMER_SPAN) {
+        t->tick = base + NH_TIMER_SPAN - 1;
     }
-    if (!insert_row_without_checking) {
-        /*
-         * Check of cache entry has pointer to ovsrec, else search in idl
-         * and if row is found update in row pointer to cache entry for
-         * subsequent use
-         * */
-        if (cache_nbr->nbr) {
-            ovs_nbr = cache_nbr->nbr;
-            found = true;
-        } else {
-            OVSREC_NEIGHBOR_FOR_EACH (ovs_nbr, idl) {
-                if (!strcmp((ovs_nbr)->ip_address, cache_nbr->ip_address) &&
-                        ovs_nbr->vrf == cache_nbr->vrf->cfg) {
-                    /* Update cache with pointer to ovsrec */
-                    cache_nbr->nbr = ovs_nbr;
-                    found = true;
-                    break;
-                }
-            }
+    delta = t->tick - base;
+    for (level = 0; level < NH_TIMER_LEVELS - 1; level++) {
+        if (delta < 1LL << ((level + 1) * NH_TIMER_BITS)) {
+            break;
+        }
+    }
+    nh_timer_list_push(&nh_timers.slots[level][(t->tick >> (level * NH_TIMER_BITS))
+                                               & (NH_TIMER_SLOTS - 1)], t);
+    nh_timers.n++;
+} /* nh_timer_insert */
+
+/* Next tick with an expiry or cascade, LLONG_MAX if no timer is armed */
+static long long int
+nh_timer_wheel_next_tick(void)
+{
+    const struct nh_timer_wheel *tw = &nh_timers;
+    long long int next = LLONG_MAX;
+    int level, i;
+
+    if (!tw->n) {
+        return next;
+    }
+    for (level = 0; level < NH_TIMER_LEVELS; level++) {
+        int shift = level * NH_TIMER_BITS;
+
+        for (i = 1; i <= NH_TIMER_SLOTS; i++) {
+            long long int tick = ((tw->tick >> shift) + i) << shift;
+            const struct nh_timer *head;
+
+            head = &tw->slots[level][(tick >> shift) & (NH_TIMER_SLOTS - 1)];
+            if (head->next != head) {
+                next = MIN(next, tick);
+                break;
+            }
+        }
+    }
+    return next;
+} /* nh_timer_wheel_next_tick */
+
+/* Run wheel up to tick 'now', moving expired timers to list 'due' */
+static void
+nh_timer_wheel_run(long long int now, struct nh_timer *due)
+{
+    struct nh_timer_wheel *tw = &nh_timers;
+
+    while (tw->tick < now) {
+        /* Ticks with nothing to expire or cascade are skipped */
+        long long int tick = nh_timer_wheel_next_tick();
+        struct nh_timer *head;
+        int level;
+
+        if (tick > now) {
+            tw->tick = now;
+            break;
+        }
+
+        /* Spread higher level slots starting at 'tick', highest first */
+        for (level = 1; level < NH_TIMER_LEVELS; level++) {
+            if (tick & ((1LL << (level * NH_TIMER_BITS)) - 1)) {
+                break;
+            }
+        }
+        while (--level > 0) {
+            struct nh_timer cascade;
+
+            head = &tw->slots[level][(tick >> (level * NH_TIMER_BITS))
+                                     & (NH_TIMER_SLOTS - 1)];
+            if (head->next == head) {
+                continue;
+            }
+            cascade.next = head->next;
+            cascade.prev = head->prev;
+            cascade.next->prev = cascade.prev->next = &cascade;
+            head->prev = head->next = head;
+            while (cascade.next != &cascade) {
+                struct nh_timer *t = cascade.next;
+
+                nh_timer_remove(t);
+                nh_timer_insert(t, tick);
+            }
+        }
+
+        tw->tick = tick;
+        head = &tw->slots[0][tick & (NH_TIMER_SLOTS - 1)];
+        while (head->next != head) {
+            struct nh_timer *t = head->next;
+
+            nh_timer_remove(t);
+            nh_timer_list_push(due, t);
+        }
+    }
+} /* nh_timer_wheel_run */
+
+/* Time of next expiry or cascade, LLONG_MAX if no timer is armed */
+static long long int
+nh_timer_wheel_next(void)
+{
+    long long int tick = nh_timer_wheel_next_tick();
+
+    return tick == LLONG_MAX ? LLONG_MAX : tick * NH_TIMER_TICK_MS;
+} /* nh_timer_wheel_next */
+
+/* Ping next hop 'nbr' again after a backoff, unless it gets resolved */
+static void
+nh_retry_arm(struct neighbor_data *nbr)
+{
+    int shift = MIN(nbr->ping_retry_cnt, 16);
+    int backoff = MIN((long long int) NH_RETRY_BACKOFF_MIN_MS << shift,
+                      NH_RETRY_BACKOFF_MAX_MS);
+
+    /* Jitter of +/- 25%, so that next hops pinged together spread out */
+    backoff += (int) random_range(backoff / 2 + 1) - backoff / 4;
+
+    nh_timer_remove(&nbr->retry_timer);
+    nbr->retry_timer.tick = (time_msec() + backoff + NH_TIMER_TICK_MS - 1)
+                            / NH_TIMER_TICK_MS;
+    nh_timer_insert(&nbr->retry_timer, nh_timers.tick + 1);
+    proc_stats.nh_retries_armed++;
+} /* nh_retry_arm */
+
+/*
+ * Next hop probes.
+ * nbr_ping() queues a neighbor and nbr_probe_run() has kernel resolve
+ * the queued ones in the namespace of their vrf, NBR_PROBE_WINDOW at a
+ * time, the way a ping would: RTM_GETROUTE finds the egress device and
+ * gateway, and RTM_NEWNEIGH with NTF_USE creates the entry if needed
+ * and sends an ARP request or neighbor solicitation.
+ */
+struct nbr_probe {
+    struct hmap_node node;      /* In nbr_probes. */
+    struct nbr_key key;
+};
+static struct hmap nbr_probes = HMAP_INITIALIZER(&nbr_probes);
+static uint32_t nbr_probe_seq;
+
+/*
+ * Queue neighbor address for kernel to resolve it. A next hop is
+ * pinged again if it is not resolved after a backoff.
+ */
+static void
+nbr_ping(struct neighbor_data *nbr)
+{
+    uint32_t hash = nbr_key_hash(&nbr->key);
+    struct nbr_probe *probe;
+
+    if (nbr->routes_nh) {
+        nh_retry_arm(nbr);
+    }
+    HMAP_FOR_EACH_WITH_HASH (probe, node, hash, &nbr_probes) {
+        if (nbr_key_equals(&probe->key, &nbr->key)) {
+            return;
+        }
+    }
+    probe = xmalloc(sizeof *probe);
+    probe->key = nbr->key;
+    hmap_insert(&nbr_probes, &probe->node, hash);
+    proc_stats.nbr_probes_queued++;
+} /* nbr_ping */
+
+/* Retry deadline of next hop 'nbr' passed, and it is not resolved */
+static void
+nh_retry_fire(struct neighbor_data *nbr)
+{
+    proc_stats.nh_retries_fired++;
+    if(nbr->routes_nh && (nbr->ping_retry_cnt < MAX_NH_PING_CNT)) {
+        char ip[INET6_ADDRSTRLEN];
+
+        VLOG_INFO("pinging %s to restore nh in port %s again",
+                  nbr_ip_to_string(nbr, ip), nbr->device);
+        nbr_ping(nbr);
+        /*The state is changed to unresolved nbr*/
+        nbr->state = NBR_STATE_INCOMPLETE;
+        proc_stats.nh_retry_pings++;
+    }
+    nbr->ping_retry_cnt ++;
+} /* nh_retry_fire */
+
+/* Ping next hops whose retry deadline passed */
+static void
+nh_retry_run(void)
+{
+    struct nh_timer due;
+
+    due.prev = due.next = &due;
+    nh_timer_wheel_run(time_msec() / NH_TIMER_TICK_MS, &due);
+    while (due.next != &due) {
+        struct nh_timer *t = due.next;
+
+        t->prev->next = t->next;
+        t->next->prev = t->prev;
+        t->prev = t->next = NULL;
+        nh_retry_fire(CONTAINER_OF(t, struct neighbor_data, retry_timer));
+    }
+} /* nh_retry_run */
+
+static void
+nh_retry_wait(void)
+{
+    long long int next = nh_timer_wheel_next();
+
+    if (next != LLONG_MAX) {
+        poll_timer_wait_until(next);
+    }
+} /* nh_retry_wait */
+
+/*
+ * Port came up or got its IPv4 address back. Ping its next hops, and
+ * the unresolved ones with no device, from the main loop after a short
+ * delay, since pings sent right away were failing for lack of network.
+ */
+static void
+nh_retry_port_up(struct port_data *port_cache)
+{
+    struct neighbor_data *nbr;
+
+    HMAP_FOR_EACH (nbr, port_node, &unattached_neighbors) {
+        if (nbr->routes_nh && !strcmp(nbr->device, "")) {
+            nbr->ping_retry_cnt = 0;
+            nh_retry_arm(nbr);
+        }
+    }
+    HMAP_FOR_EACH (nbr, port_node, &port_cache->neighbors) {
+        if (nbr->routes_nh && nbr->ping_retry_cnt < MAX_NH_PING_CNT) {
+            nh_retry_arm(nbr);
+        }
+    }
+} /* nh_retry_port_up */
+
+/*
+ * Probe scheduler.
+ * STALE neighbors with dp_hit or routes_nh set are probed by setting
+ * them to DELAY in kernel. Requests are queued, next hops first, and
+ * sent by probe_sched_run() as the token buckets of the neighbor's vrf
+ * and port allow, so a batch of neighbors going stale together is
+ * probed over time rather than all at once.
+ */
+enum probe_prio {
+    PROBE_PRIO_NH,              /* routes_nh set. */
+    PROBE_PRIO_DP_HIT,
+    PROBE_N_PRIOS
+};
+
+struct probe_req {
+    struct hmap_node node;      /* In probe_reqs. */
+    struct nbr_key key;
+    enum probe_prio prio;       /* Queue it is in, */
+    size_t pos;                 /* and its index there. */
+};
+
+struct probe_queue {
+    struct probe_req **reqs;    /* In order, NULL if sent or moved to
+                                   other queue. */
+    size_t n, allocated;
+    size_t n_reqs;              /* Non-NULL entries in 'reqs'. */
+};
+
+static struct hmap probe_reqs = HMAP_INITIALIZER(&probe_reqs);
+static struct probe_queue probe_queues[PROBE_N_PRIOS];
+/* Token cost of a probe, so that rates in token_bucket are per second */
+#define PROBE_TOKENS 1000
+static long long int probe_sched_next = LLONG_MAX; /* Tokens for a deferred
+                                                     probe, if any. */
+static unsigned int probe_pass;     /* Serial of probe_sched_run() pass. */
+static size_t probe_vrfs_refused;   /* VRFs refused a probe in this pass. */
+
+/* Probe rate limit of 'rate' per second, 0 for none */
+static void
+probe_tb_init(struct token_bucket *tb, int rate)
+{
+    int burst = MAX(1, rate * PROBE_BURST_MS / 1000);
+
+    token_bucket_init(tb, rate, burst * PROBE_TOKENS);
+} /* probe_tb_init */
+
+/* Squeeze NULL entries out of 'q', keeping requests in order */
+static void
+probe_queue_compact(struct probe_queue *q)
+{
+    size_t i, n = 0;
+
+    for (i = 0; i < q->n; i++) {
+        struct probe_req *req = q->reqs[i];
+
+        if (req) {
+            req->pos = n;
+            q->reqs[n++] = req;
+        }
+    }
+    q->n = n;
+} /* probe_queue_compact */
+
+static void
+probe_queue_push(enum probe_prio prio, struct probe_req *req)
+{
+    struct probe_queue *q = &probe_queues[prio];
+
+    if (q->n >= q->allocated) {
+        if (q->n_reqs < q->n / 2) {
+            probe_queue_compact(q);
+        } else {
+            q->reqs = x2nrealloc(q->reqs, &q->allocated, sizeof *q->reqs);
+        }
+    }
+    req->prio = prio;
+    req->pos = q->n;
+    q->reqs[q->n++] = req;
+    q->n_reqs++;
+} /* probe_queue_push */
+
+static void
+probe_queue_remove(struct probe_req *req)
+{
+    struct probe_queue *q = &probe_queues[req->prio];
+
+    q->reqs[req->pos] = NULL;
+    q->n_reqs--;
+} /* probe_queue_remove */
+
+/* Queue probe of STALE neighbor 'nbr' */
+static void
+probe_sched_add(const struct neighbor_data *nbr)
+{
+    enum probe_prio prio = nbr->routes_nh ? PROBE_PRIO_NH : PROBE_PRIO_DP_HIT;
+    uint32_t hash = nbr_key_hash(&nbr->key);
+    struct probe_req *req;
+
+    HMAP_FOR_EACH_WITH_HASH (req, node, hash, &probe_reqs) {
+        if (nbr_key_equals(&req->key, &nbr->key)) {
+            if (prio < req->prio) {
+                probe_queue_remove(req);
+                probe_queue_push(prio, req);
+            }
+            return;
+        }
+    }
+
+    req = xmalloc(sizeof *req);
+    req->key = nbr->key;
+    hmap_insert(&probe_reqs, &req->node, hash);
+    probe_queue_push(prio, req);
+    proc_stats.probes_queued++;
+    proc_stats.probe_queue_max = MAX(proc_stats.probe_queue_max,
+                                     hmap_count(&probe_reqs));
+} /* probe_sched_add */
+
+/* VRF id used in cache keys for a VRF row, 0 for default vrf */
+static uint32_t
+nbr_key_vrf_id(const struct ovsrec_vrf *vrf_row)
+{
+    if (!strcmp(vrf_row->name, DEFAULT_VRF_NAME) || !vrf_row->n_table_id) {
+        return 0;
+    }
+    return *vrf_row->table_id;
+} /* nbr_key_vrf_id */
+
+/*
+ * Per port neighbor lists.
+ * Each neighbor is on the list of the port cache of its device,
+ * or on unattached_neighbors if there is no such port.
+ */
+static void
+neighbor_port_link(struct neighbor_data *nbr)
+{
+    struct port_data *port_cache = NULL;
+
+    if (nbr->device[0]) {
+        port_cache = shash_find_data(&all_ports, nbr->device);
+    }
+    nbr->port_data = port_cache;
+    hmap_insert(port_cache ? &port_cache->neighbors : &unattached_neighbors,
+                &nbr->port_node, hash_pointer(nbr, 0));
+} /* neighbor_port_link */
+
+static void
+neighbor_port_unlink(struct neighbor_data *nbr)
+{
+    hmap_remove(nbr->port_data ? &nbr->port_data->neighbors
+                               : &unattached_neighbors,
+                &nbr->port_node);
+    nbr->port_data = NULL;
+} /* neighbor_port_unlink */
+
+/* Set neighbor device, moving it to the list of the new port */
+static void
+neighbor_set_device(struct neighbor_data *nbr, const char *dev)
+{
+    if (strcmp(nbr->device, dev)) {
+        neighbor_port_unlink(nbr);
+        strcpy(nbr->device, dev);
+        neighbor_port_link(nbr);
+    }
+} /* neighbor_set_device */
+
+/* Attach unattached neighbors on a new port cache entry */
+static void
+neighbor_port_adopt(struct port_data *port_cache, const char *name)
+{
+    struct neighbor_data *nbr, *next;
+
+    HMAP_FOR_EACH_SAFE (nbr, next, port_node, &unattached_neighbors) {
+        if (nbr->device[0] && !strcmp(nbr->device, name)) {
+            hmap_remove(&unattached_neighbors, &nbr->port_node);
+            nbr->port_data = port_cache;
+            hmap_insert(&port_cache->neighbors, &nbr->port_node,
+                        hash_pointer(nbr, 0));
+        }
+    }
+} /* neighbor_port_adopt */
+
+/* Drop all the per port lists, when the whole cache is freed */
+static void
+neighbor_port_lists_clear(void)
+{
+    struct shash_node *sh_port;
+
+    SHASH_FOR_EACH (sh_port, &all_ports) {
+        struct port_data *port_cache = sh_port->data;
+        hmap_clear(&port_cache->neighbors);
+    }
+    hmap_clear(&unattached_neighbors);
+} /* neighbor_port_lists_clear */
+
+/* Neighbor cache functions */
+/* Find a neighbor in local cache */
+static struct neighbor_data*
+find_neighbor_in_cache(const struct nbr_key *key)
+{
+    struct neighbor_data *nbr;
+
+    HMAP_FOR_EACH_WITH_HASH (nbr, node, nbr_key_hash(key), &all_neighbors) {
+        if (nbr_key_equals(&nbr->key, key)) {
+            return nbr;
+        }
+    }
+    return NULL;
+} /* find_neighbor_in_cache */
+
+/*
+ * Add a neighbor entry in cache keyed on
+ * vrf id, family and ip address
+ * If it exists already return existing entry
+ * */
+static struct neighbor_data*
+add_neighbor_to_cache(const struct nbr_key *key)
+{
+    struct neighbor_data *new_nbr;
+
+    new_nbr = find_neighbor_in_cache(key);
+    if (new_nbr) {
+        char ip[INET6_ADDRSTRLEN];
+
+        VLOG_WARN("vrf %s Neighbor %s specified twice",
+                  new_nbr->vrf ? new_nbr->vrf->name : "",
+                  nbr_ip_to_string(new_nbr, ip));
+        return new_nbr;
+    }
+
+    /* Allocate structure to save state information for this interface. */
+    new_nbr = (struct neighbor_data *) xcalloc(1, sizeof *new_nbr);
+    nbr_alloc_cnt++;
+    new_nbr->key = *key;
+    hmap_insert(&all_neighbors, &new_nbr->node, nbr_key_hash(key));
+    neighbor_port_link(new_nbr);
+    return new_nbr;
+} /* add_neighbor_to_cache */
+
+/*
+ * Mark neighbor for update of its OVSDB row.
+ * Several kernel events for a neighbor within one run iteration
+ * result in a single update with its final state.
+ */
+static void
+neighbor_mark_dirty(struct neighbor_data *nbr)
+{
+    proc_stats.dirty_marked++;
+    if (!nbr->dirty) {
+        nbr->dirty = true;
+        hmap_insert(&dirty_neighbors, &nbr->dirty_node, hash_pointer(nbr, 0));
+        commit_sched_note();
+    }
+} /* neighbor_mark_dirty */
+
+static void
+neighbor_clear_dirty(struct neighbor_data *nbr)
+{
+    if (nbr->dirty) {
+        nbr->dirty = false;
+        hmap_remove(&dirty_neighbors, &nbr->dirty_node);
+    }
+} /* neighbor_clear_dirty */
+
+/* Delete neighbor from local cache and free it */
+static void
+delete_neighbor_from_cache(struct neighbor_data *nbr)
+{
+    neighbor_clear_dirty(nbr);
+    neighbor_port_unlink(nbr);
+    nh_timer_remove(&nbr->retry_timer);
+    hmap_remove(&all_neighbors, &nbr->node);
+    free(nbr);
+    nbr_alloc_cnt--;
+} /* delete_neighbor_from_cache */
+
+/*
+ * Index of IDL Neighbor rows keyed on struct nbr_key.
+ * Kept in sync with rows inserted and deleted by ovsdb-server
+ * (through IDL change tracking) and with rows inserted or deleted
+ * in our own transaction, so that a row can be found without
+ * walking the Neighbor table.
+ * The key is copied into the node since the columns of a deleted
+ * row are no longer readable.
+ */
+struct idl_nbr_node {
+    struct hmap_node key_node;      /* In idl_nbr_by_key. */
+    struct hmap_node uuid_node;     /* In idl_nbr_by_uuid. */
+    struct uuid uuid;               /* Row uuid. */
+    struct nbr_key key;
+    const struct ovsrec_neighbor *nbr;
+};
+static struct hmap idl_nbr_by_key = HMAP_INITIALIZER(&idl_nbr_by_key);
+static struct hmap idl_nbr_by_uuid = HMAP_INITIALIZER(&idl_nbr_by_uuid);
+
+/* Uuids of rows inserted in the current transaction */
+static struct uuid *idl_nbr_txn_rows;
+static size_t idl_nbr_n_txn_rows, idl_nbr_allocated_txn_rows;
+
+static struct idl_nbr_node *
+idl_nbr_index_find_uuid(const struct uuid *uuid)
+{
+    struct idl_nbr_node *node;
+
+    HMAP_FOR_EACH_WITH_HASH (node, uuid_node, uuid_hash(uuid),
+                             &idl_nbr_by_uuid) {
+        if (uuid_equals(&node->uuid, uuid)) {
+            return node;
+        }
+    }
+    return NULL;
+} /* idl_nbr_index_find_uuid */
+
+/* Find IDL Neighbor row for a cache key */
+static const struct ovsrec_neighbor *
+idl_nbr_index_find(const struct nbr_key *key)
+{
+    struct idl_nbr_node *node;
+
+    HMAP_FOR_EACH_WITH_HASH (node, key_node, nbr_key_hash(key),
+                             &idl_nbr_by_key) {
+        if (nbr_key_equals(&node->key, key)) {
+            return node->nbr;
+        }
+    }
+    return NULL;
+} /* idl_nbr_index_find */
+
+/*
+ * Remove a node from index. Cache entry pointing to the row
+ * is reset, since the row is going away.
+ */
+static void
+idl_nbr_index_remove_node(struct idl_nbr_node *node)
+{
+    struct neighbor_data *cache_nbr;
+
+    cache_nbr = find_neighbor_in_cache(&node->key);
+    if (cache_nbr && cache_nbr->nbr == node->nbr) {
+        cache_nbr->nbr = NULL;
+    }
+
+    hmap_remove(&idl_nbr_by_key, &node->key_node);
+    hmap_remove(&idl_nbr_by_uuid, &node->uuid_node);
+    free(node);
+} /* idl_nbr_index_remove_node */
+
+/*
+ * Add a IDL Neighbor row to index. A row already indexed by uuid is
+ * replaced, since after an ovsdb-server reconnect IDL inserts every row
+ * again as a new struct.
+ */
+static void
+idl_nbr_index_add(const struct ovsrec_neighbor *ovs_nbr,
+                  const struct nbr_key *key)
+{
+    struct idl_nbr_node *node;
+
+    node = idl_nbr_index_find_uuid(&ovs_nbr->header_.uuid);
+    if (node && nbr_key_equals(&node->key, key)) {
+        struct neighbor_data *cache_nbr = find_neighbor_in_cache(key);
+
+        if (cache_nbr && cache_nbr->nbr == node->nbr) {
+            cache_nbr->nbr = ovs_nbr;
+        }
+        node->nbr = ovs_nbr;
+        return;
+    } else if (node) {
+        idl_nbr_index_remove_node(node);
+    }
+
+    node = xzalloc(sizeof *node);
+    node->uuid = ovs_nbr->header_.uuid;
+    node->key = *key;
+    node->nbr = ovs_nbr;
+    hmap_insert(&idl_nbr_by_key, &node->key_node, nbr_key_hash(key));
+    hmap_insert(&idl_nbr_by_uuid, &node->uuid_node, uuid_hash(&node->uuid));
+} /* idl_nbr_index_add */
+
+static void
+idl_nbr_index_remove(const struct uuid *uuid)
+{
+    struct idl_nbr_node *node = idl_nbr_index_find_uuid(uuid);
+
+    if (node) {
+        idl_nbr_index_remove_node(node);
+    }
+} /* idl_nbr_index_remove */
+
+static void
+idl_nbr_index_clear(void)
+{
+    struct idl_nbr_node *node, *next;
+
+    HMAP_FOR_EACH_SAFE (node, next, uuid_node, &idl_nbr_by_uuid) {
+        idl_nbr_index_remove_node(node);
+    }
+    idl_nbr_n_txn_rows = 0;
+} /* idl_nbr_index_clear */
+
+/* Build cache key of an IDL Neighbor row */
+static bool
+idl_nbr_key(const struct ovsrec_neighbor *ovs_nbr, struct nbr_key *key)
+{
+    if (!ovs_nbr->vrf) {
+        return false;
+    }
+    return nbr_key_from_string(key, nbr_key_vrf_id(ovs_nbr->vrf),
+                               ovs_nbr->ip_address);
+} /* idl_nbr_key */
+
+/* Rebuild index from the IDL Neighbor table */
+static void
+idl_nbr_index_rebuild(void)
+{
+    const struct ovsrec_neighbor *ovs_nbr;
+    struct nbr_key key;
+
+    idl_nbr_index_clear();
+    OVSREC_NEIGHBOR_FOR_EACH (ovs_nbr, idl) {
+        if (!idl_nbr_key(ovs_nbr, &key)) {
+            continue;
+        }
+        if (idl_nbr_index_find(&key)) {
+            VLOG_WARN("Neighbor vrf name %s ip address %s"
+                    "specified twice", ovs_nbr->vrf->name, ovs_nbr->ip_address);
+            continue;
+        }
+        idl_nbr_index_add(ovs_nbr, &key);
+    }
+} /* idl_nbr_index_rebuild */
+
+/* Index a row inserted in the current transaction */
+static void
+idl_nbr_index_add_txn_row(const struct ovsrec_neighbor *ovs_nbr,
+                          const struct nbr_key *key)
+{
+    if (idl_nbr_n_txn_rows >= idl_nbr_allocated_txn_rows) {
+        idl_nbr_txn_rows = x2nrealloc(idl_nbr_txn_rows,
+                                      &idl_nbr_allocated_txn_rows,
+                                      sizeof *idl_nbr_txn_rows);
+    }
+    idl_nbr_txn_rows[idl_nbr_n_txn_rows++] = ovs_nbr->header_.uuid;
+    idl_nbr_index_add(ovs_nbr, key);
+} /* idl_nbr_index_add_txn_row */
+
+/*
+ * Rows inserted by a transaction are freed with the transaction.
+ * Once committed, they come back from ovsdb-server as new rows.
+ */
+static void
+idl_nbr_index_purge_txn_rows(void)
+{
+    size_t i;
+
+    for (i = 0; i < idl_nbr_n_txn_rows; i++) {
+        idl_nbr_index_remove(&idl_nbr_txn_rows[i]);
+    }
+    idl_nbr_n_txn_rows = 0;
+} /* idl_nbr_index_purge_txn_rows */
+
+/*
+ * Apply rows inserted or deleted in IDL since last run to index.
+ * Deletes go first, so that a row deleted and inserted again with the
+ * same uuid, as on an ovsdb-server reconnect, stays indexed.
+ */
+static void
+idl_nbr_index_run(void)
+{
+    const struct ovsrec_neighbor *ovs_nbr;
+    struct nbr_key key;
+
+    OVSREC_NEIGHBOR_FOR_EACH_TRACKED (ovs_nbr, idl) {
+        if (ovsrec_neighbor_is_deleted(ovs_nbr)) {
+            struct idl_nbr_node *node =
+                idl_nbr_index_find_uuid(&ovs_nbr->header_.uuid);
+
+            /* Not if the uuid was indexed again with a newer row */
+            if (node && node->nbr == ovs_nbr) {
+                idl_nbr_index_remove_node(node);
+            }
+        }
+    }
+    OVSREC_NEIGHBOR_FOR_EACH_TRACKED (ovs_nbr, idl) {
+        if (!ovsrec_neighbor_is_deleted(ovs_nbr) &&
+            ovsrec_neighbor_is_new(ovs_nbr) &&
+            idl_nbr_key(ovs_nbr, &key)) {
+            idl_nbr_index_add(ovs_nbr, &key);
+        }
+    }
+} /* idl_nbr_index_run */
+
+/* Destroy current transaction along with rows it inserted */
+static void
+arpmgrd_txn_destroy(void)
+{
+    if (txn) {
+        ovsdb_idl_txn_destroy(txn);
+        txn = NULL;
+    }
+    idl_nbr_index_purge_txn_rows();
+    txn_journal_clear();
+} /* arpmgrd_txn_destroy */
+
+/* Netlink functions */
+
+/*
+ * Attach a classic BPF filter to a neighbor netlink socket, dropping
+ * in kernel the neighbor notifications parse_nlmsg() would ignore:
+ * NOARP entries, families other than INET and INET6, entries on "lo"
+ * and IPv4 multicast entries.
+ * Only the first message of a datagram is seen by the filter, so
+ * multipart (dump) datagrams are always accepted. Netlink headers are
+ * in host byte order while BPF loads are big endian, hence the htons()
+ * and htonl() on constants. "lo" is ifindex 1 in every namespace, and
+ * kernel puts NDA_DST first, at offset 28.
+ */
+static void
+netlink_socket_attach_filter(int sock)
+{
+    enum {
+        NL_OFF_TYPE = offsetof(struct nlmsghdr, nlmsg_type),
+        NL_OFF_FLAGS = offsetof(struct nlmsghdr, nlmsg_flags),
+        NDM_OFF = NLMSG_HDRLEN,
+        NDM_OFF_FAMILY = NDM_OFF + offsetof(struct ndmsg, ndm_family),
+        NDM_OFF_IFINDEX = NDM_OFF + offsetof(struct ndmsg, ndm_ifindex),
+        NDM_OFF_STATE = NDM_OFF + offsetof(struct ndmsg, ndm_state),
+        RTA_OFF = NDM_OFF + NLMSG_ALIGN(sizeof(struct ndmsg)),
+        RTA_OFF_TYPE = RTA_OFF + offsetof(struct rtattr, rta_type),
+        RTA_OFF_DATA = RTA_OFF + RTA_LENGTH(0),
+    };
+    struct sock_filter code[] = {
+        /* 0: Accept multipart datagrams */
+        BPF_STMT(BPF_LD | BPF_H | BPF_ABS, NL_OFF_FLAGS),
+        BPF_JUMP(BPF_JMP | BPF_JSET | BPF_K, htons(NLM_F_MULTI), 15, 0),
+        /* 2: Accept anything but neighbor messages */
+        BPF_STMT(BPF_LD | BPF_H | BPF_ABS, NL_OFF_TYPE),
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, htons(RTM_NEWNEIGH), 1, 0),
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, htons(RTM_DELNEIGH), 0, 12),
+        /* 5: Drop NOARP entries */
+        BPF_STMT(BPF_LD | BPF_H | BPF_ABS, NDM_OFF_STATE),
+        BPF_JUMP(BPF_JMP | BPF_JSET | BPF_K, htons(NUD_NOARP), 11, 0),
+        /* 7: Drop families other than INET and INET6 */
+        BPF_STMT(BPF_LD | BPF_B | BPF_ABS, NDM_OFF_FAMILY),
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, AF_INET6, 6, 0),
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, AF_INET, 0, 8),
+        /* 10: Drop IPv4 multicast */
+        BPF_STMT(BPF_LD | BPF_H | BPF_ABS, RTA_OFF_TYPE),
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, htons(NDA_DST), 0, 3),
+        BPF_STMT(BPF_LD | BPF_B | BPF_ABS, RTA_OFF_DATA),
+        BPF_STMT(BPF_ALU | BPF_AND | BPF_K, 0xf0),
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, 0xe0, 3, 0),
+        /* 15: Drop entries on "lo" */
+        BPF_STMT(BPF_LD | BPF_W | BPF_ABS, NDM_OFF_IFINDEX),
+        BPF_JUMP(BPF_JMP | BPF_JEQ | BPF_K, htonl(1), 1, 0),
+        /* 17: Accept */
+        BPF_STMT(BPF_RET | BPF_K, 0xffffffff),
+        /* 18: Drop */
+        BPF_STMT(BPF_RET | BPF_K, 0),
+    };
+    struct sock_fprog prog = {
+        .len = sizeof code / sizeof code[0],
+        .filter = code,
+    };
+
+    if (setsockopt(sock, SOL_SOCKET, SO_ATTACH_FILTER,
+                   &prog, sizeof prog) < 0) {
+        VLOG_WARN("setsockopt: SO_ATTACH_FILTER failed (%s), "
+                  "filtering in userspace only", strerror(errno));
+        nl_bpf_filter_err_cnt++;
+        return;
+    }
+    nl_bpf_filter_cnt++;
+} /* netlink_socket_attach_filter */
+
+/*
+ * Open a netlink socket registering for group
+ * by entering corresponding namespace.
+ * Send a neighbor dump request on socket
+ * for both the namespace.
+ * */
+static void
+netlink_socket_open(const char *vrf_name, int *sock, int protocol, int group)
+{
+    struct sockaddr_nl s_addr;
+    struct vrf_sock_params vrf_params;
+
+    if (*sock > 0)
+        return;
+
+    vrf_params.nl_params.family = AF_NETLINK;
+    vrf_params.nl_params.type = SOCK_RAW;
+    vrf_params.nl_params.protocol = protocol;
+
+    *sock = vrf_create_socket((char *)vrf_name, &vrf_params);
+
+    if (*sock < 0) {
+        VLOG_ERR("Netlink socket creation failed (%s)",strerror(errno));
+        goto label;
+    }
+    uint32_t rxbufsize = 2097152; // 2 Mb
+    int err = setsockopt(*sock, SOL_SOCKET, SO_RCVBUFFORCE,&rxbufsize, sizeof(rxbufsize));
+    if(err){
+        VLOG_ERR("setsockopt: SO_RCVBUFFORCE err %d",errno);
+        close(*sock);
+        *sock = 0;
+        return;
+    }
+    if (gbl_nl_bpf_filter) {
+        netlink_socket_attach_filter(*sock);
+    }
+    /* Have kernel reject dump filters it does not support */
+    int one = 1;
+    if (setsockopt(*sock, SOL_NETLINK, NETLINK_GET_STRICT_CHK,
+                   &one, sizeof one) < 0) {
+        VLOG_DBG("setsockopt: NETLINK_GET_STRICT_CHK failed (%s)",
+                 strerror(errno));
+        nl_strict_chk_err_cnt++;
+    } else {
+        nl_strict_chk_cnt++;
+    }
+    memset((void *) &s_addr, 0, sizeof(s_addr));
+    s_addr.nl_family = AF_NETLINK;
+    s_addr.nl_pid = getpid();
+    s_addr.nl_groups = group;
+    if (bind(*sock, (struct sockaddr *) &s_addr, sizeof(s_addr)) < 0) {
+      if (errno != EADDRINUSE) {
+        VLOG_ERR("netlink socket bind failed (%s)", strerror(errno));
+        goto label;
+      }
+    }
+
+    netlink_request_neighbor_dump(*sock);
+    if(sync_state == SYNC_REQUESTED)
+       sync_state = SYNC_IN_PROGRESS;
+
+label:
+    return;
+} /* netlink_socket_open */
+
+/* close the netlink socket */
+static void
+close_netlink_socket(int socket)
+{
+    nl_reader_sock_remove(socket);
+    close(socket);
+} /* close_netlink_socket */
+
+/*
+ * Send netlink message requesting Neighbor dump, replies carry 'seq'
+ * as nlmsg_seq. Dump is limited to 'family', unless AF_UNSPEC, and
+ * to device 'ifindex', unless 0.
+ */
+static bool
+netlink_request_neighbor_dump__(int sock, uint32_t seq, uint8_t family,
+                                int ifindex)
+{
+    struct rtattr *rta;
+    struct nl_req req;
+
+    memset(&req, 0, sizeof(req));
+    req.nlh.nlmsg_len = NLMSG_LENGTH(sizeof(struct ndmsg));
+    req.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_DUMP;
+
+    req.nlh.nlmsg_type = RTM_GETNEIGH;
+    req.nlh.nlmsg_seq = seq;
+    req.ndm.ndm_family = family;
+    req.nlh.nlmsg_pid = 0;
+
+    if (ifindex) {
+        /* Header ifindex must stay 0 with strict checking */
+        rta = (struct rtattr *)(((char *)&req)
+                                + NLMSG_ALIGN(req.nlh.nlmsg_len));
+        rta->rta_type = NDA_IFINDEX;
+        rta->rta_len = RTA_LENGTH(sizeof(uint32_t));
+        memcpy(RTA_DATA(rta), &ifindex, sizeof(uint32_t));
+        req.nlh.nlmsg_len = NLMSG_ALIGN(req.nlh.nlmsg_len) + rta->rta_len;
+    }
+
+    if (send(sock, &req, req.nlh.nlmsg_len, 0) == -1) {
+        VLOG_ERR("Failed to send netlink request for neighbor dump");
+        return false;
+    }
+    nl_dump_req_cnt++;
+    return true;
+} /* netlink_request_neighbor_dump__ */
+
+/* Function to Send netlink message requesting Neighbor dump */
+static void
+netlink_request_neighbor_dump(int sock)
+{
+    netlink_request_neighbor_dump__(sock, 0, AF_UNSPEC, 0);
+} /* netlink_request_neighbor_dump */
+
+/*
+ * Function to set state of a Neighbor to Delay
+ * and kernel will trigger a probe
+ */
+static void
+send_neighbor_probe(int sock, int ifindex, int family, void* ip, int plen)
+{
+    int len = RTA_LENGTH(plen);
+    struct rtattr *rta;
+    struct nl_req req;
+
+    memset(&req, 0, sizeof(req));
+
+    req.nlh.nlmsg_len = NLMSG_LENGTH(sizeof(struct ndmsg));
+    req.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_REPLACE;
+    req.nlh.nlmsg_type = RTM_NEWNEIGH;
+    req.ndm.ndm_family = AF_UNSPEC;
+    req.ndm.ndm_state = NUD_DELAY;
+    req.ndm.ndm_family = family;
+    req.ndm.ndm_ifindex = ifindex;
+
+    if (NLMSG_ALIGN(req.nlh.nlmsg_len) + RTA_ALIGN(len) > sizeof(req)) {
+        VLOG_ERR("Message length exceeded sizeof request");
+        return;
+    }
+
+    rta = NLMSG_TAIL(&req.nlh);
+    rta->rta_type = NDA_DST;
+    rta->rta_len = len;
+    memcpy(RTA_DATA(rta), ip, plen);
+    req.nlh.nlmsg_len = NLMSG_ALIGN(req.nlh.nlmsg_len) + RTA_ALIGN(len);
+
+    if (send(sock, &req, req.nlh.nlmsg_len, MSG_DONTWAIT) == -1) {
+        VLOG_ERR("Failed to send netlink request for neighbor probe");
+        return;
+    }
+    nl_probe_req_cnt++;
+    return;
+} /* send_neighbor_probe */
+
+/* Request route to neighbor address of 'key' */
+static bool
+nbr_probe_route_req(int sock, uint32_t seq, const struct nbr_key *key)
+{
+    struct {
+        struct nlmsghdr nlh;
+        struct rtmsg rtm;
+        char buf[RTA_SPACE(16)];
+    } req;
+    int plen = key->family == AF_INET6 ? 16 : 4;
+    struct rtattr *rta;
+
+    memset(&req, 0, sizeof req);
+    req.nlh.nlmsg_len = NLMSG_LENGTH(sizeof req.rtm);
+    req.nlh.nlmsg_type = RTM_GETROUTE;
+    req.nlh.nlmsg_flags = NLM_F_REQUEST;
+    req.nlh.nlmsg_seq = seq;
+    req.rtm.rtm_family = key->family;
+    req.rtm.rtm_dst_len = plen * 8;
+
+    rta = NLMSG_TAIL(&req.nlh);
+    rta->rta_type = RTA_DST;
+    rta->rta_len = RTA_LENGTH(plen);
+    memcpy(RTA_DATA(rta), key->addr, plen);
+    req.nlh.nlmsg_len = NLMSG_ALIGN(req.nlh.nlmsg_len) + RTA_ALIGN(rta->rta_len);
+
+    return send(sock, &req, req.nlh.nlmsg_len, 0) >= 0;
+} /* nbr_probe_route_req */
+
+/*
+ * Have kernel resolve 'addr' on 'ifindex', creating the neighbor
+ * entry in INCOMPLETE state if it does not exist.
+ */
+static bool
+nbr_probe_neigh_req(int sock, uint32_t seq, uint8_t family,
+                    const void *addr, int plen, int ifindex)
+{
+    struct rtattr *rta;
+    struct nl_req req;
+
+    memset(&req, 0, sizeof req);
+    req.nlh.nlmsg_len = NLMSG_LENGTH(sizeof req.ndm);
+    req.nlh.nlmsg_type = RTM_NEWNEIGH;
+    req.nlh.nlmsg_flags = NLM_F_REQUEST | NLM_F_CREATE;
+    req.nlh.nlmsg_seq = seq;
+    req.ndm.ndm_family = family;
+    req.ndm.ndm_ifindex = ifindex;
+    req.ndm.ndm_state = NUD_NONE;
+    req.ndm.ndm_flags = NTF_USE;
+
+    rta = NLMSG_TAIL(&req.nlh);
+    rta->rta_type = NDA_DST;
+    rta->rta_len = RTA_LENGTH(plen);
+    memcpy(RTA_DATA(rta), addr, plen);
+    req.nlh.nlmsg_len = NLMSG_ALIGN(req.nlh.nlmsg_len) + RTA_ALIGN(rta->rta_len);
+
+    return send(sock, &req, req.nlh.nlmsg_len, 0) >= 0;
+} /* nbr_probe_neigh_req */
+
+/*
+ * Route reply to probe of 'key': probe its gateway, if any, or the
+ * neighbor itself on the egress device. Returns false if the address
+ * is not reachable over a device.
+ */
+static bool
+nbr_probe_route_reply(int sock, const struct nlmsghdr *nlh,
+                      const struct nbr_key *key)
+{
+    const struct rtmsg *rtm = NLMSG_DATA(nlh);
+    const void *addr = key->addr;
+    int plen = key->family == AF_INET6 ? 16 : 4;
+    const struct rtattr *rta;
+    int rtalen, oif = 0;
+
+    if (nlh->nlmsg_len < NLMSG_LENGTH(sizeof *rtm)
+        || rtm->rtm_type != RTN_UNICAST) {
+        return false;
+    }
+    rtalen = RTM_PAYLOAD(nlh);
+    for (rta = RTM_RTA(rtm); RTA_OK(rta, rtalen);
+         rta = RTA_NEXT(rta, rtalen)) {
+        if (rta->rta_type == RTA_OIF && RTA_PAYLOAD(rta) >= sizeof(int)) {
+            memcpy(&oif, RTA_DATA(rta), sizeof oif);
+        } else if (rta->rta_type == RTA_GATEWAY
+                   && RTA_PAYLOAD(rta) == plen) {
+            /* Not on link, resolve first hop like ping would */
+            addr = RTA_DATA(rta);
+            proc_stats.nbr_probes_gw++;
+        }
+    }
+    if (oif <= 0) {
+        return false;
+    }
+    return nbr_probe_neigh_req(sock, nlh->nlmsg_seq, key->family,
+                               addr, plen, oif);
+} /* nbr_probe_route_reply */
+
+/* Socket in namespace of 'vrf' for next hop probes */
+static int
+nbr_probe_sock(struct vrf *vrf)
+{
+    struct vrf_sock_params vrf_params;
+    char buff[UUID_LEN + 1] = {0};
+    const char *ns_name = DEFAULT_VRF_NAME;
+    int sock;
+
+    if (vrf->probe_sock > 0) {
+        return vrf->probe_sock;
+    }
+    if (!arpmgrd_vrf_is_default(vrf)) {
+        get_vrf_ns_from_table_id(idl, vrf->table_id, buff);
+        ns_name = buff;
+    }
+
+    vrf_params.nl_params.family = AF_NETLINK;
+    vrf_params.nl_params.type = SOCK_RAW;
+    vrf_params.nl_params.protocol = NETLINK_ROUTE;
+    sock = vrf_create_socket((char *) ns_name, &vrf_params);
+    if (sock < 0) {
+        VLOG_ERR("Probe socket creation failed for vrf %s (%s)",
+                 vrf->name, strerror(errno));
+        return -1;
+    }
+    vrf->probe_sock = sock;
+    return sock;
+} /* nbr_probe_sock */
+
+/*
+ * Probe 'n' neighbors of 'vrf'. Kernel answers rtnetlink requests
+ * within send(), so replies to the route requests are queued by the
+ * time they are all sent, and so are errors for the neighbor requests
+ * sent while reading them.
+ */
+static void
+nbr_probe_window(struct vrf *vrf, struct nbr_probe **probes, int n)
+{
+    bool sent[NBR_PROBE_WINDOW];
+    uint32_t base = nbr_probe_seq;
+    int sock = nbr_probe_sock(vrf);
+    int failed = 0;
+    int i;
+
+    nbr_probe_seq += n;
+    memset(sent, 0, sizeof sent);
+    for (i = 0; sock > 0 && i < n; i++) {
+        if (!nbr_probe_route_req(sock, base + i, &probes[i]->key)) {
+            VLOG_WARN("Failed to send route request for probe (%s)",
+                      strerror(errno));
+            break;
+        }
+    }
+
+    while (sock > 0) {
+        char buf[4096];
+        const struct nlmsghdr *nlh;
+        ssize_t len;
+
+        len = recv(sock, buf, sizeof buf, MSG_DONTWAIT);
+        if (len < 0) {
+            if (errno == EINTR) {
+                continue;
+            }
+            if (errno != EAGAIN && errno != EWOULDBLOCK) {
+                VLOG_WARN("Failed to receive probe replies (%s)",
+                          strerror(errno));
+            }
+            break;
+        }
+        for (nlh = (const struct nlmsghdr *) buf; NLMSG_OK(nlh, len);
+             nlh = NLMSG_NEXT(nlh, len)) {
+            uint32_t idx = nlh->nlmsg_seq - base;
+
+            if (idx >= (uint32_t) n) {
+                continue;
+            }
+            if (nlh->nlmsg_type == RTM_NEWROUTE) {
+                sent[idx] = nbr_probe_route_reply(sock, nlh,
+                                                  &probes[idx]->key);
+                if (!sent[idx]) {
+                    proc_stats.nbr_probes_noroute++;
+                }
+            } else if (nlh->nlmsg_type == NLMSG_ERROR) {
+                const struct nlmsgerr *err = NLMSG_DATA(nlh);
+
+                /* No route, or neighbor request refused */
+                if (nlh->nlmsg_len >= NLMSG_LENGTH(sizeof *err)
+                    && err->error) {
+                    sent[idx] = false;
+                }
+            }
+        }
+    }
+
+    for (i = 0; i < n; i++) {
+        struct neighbor_data *cache_nbr =
+            find_neighbor_in_cache(&probes[i]->key);
+        struct port_data *pd = cache_nbr ? cache_nbr->port_data : NULL;
+
+        if (sent[i]) {
+            proc_stats.nbr_probes_sent++;
+            NBR_STATS_ADD(vrf, pd, pings, 1);
+        } else {
+            failed++;
+            NBR_STATS_ADD(vrf, pd, ping_failures, 1);
+        }
+        free(probes[i]);
+    }
+    if (failed) {
+        /* Next hops are pinged again when their retry timer fires */
+        VLOG_DBG("%d of %d next hop probes failed in vrf %s",
+                 failed, n, vrf->name);
+        proc_stats.nbr_probes_failed += failed;
+    }
+} /* nbr_probe_window */
+
+/* Probe neighbors queued by nbr_ping() */
+static void
+nbr_probe_run(void)
+{
+    struct shash_node *vrf_node;
+    struct nbr_probe *probe, *next;
+
+    if (hmap_is_empty(&nbr_probes)) {
+        return;
+    }
+
+    SHASH_FOR_EACH (vrf_node, &all_vrfs) {
+        struct vrf *vrf = vrf_node->data;
+        struct nbr_probe *probes[NBR_PROBE_WINDOW];
+        int n = 0;
+
+        HMAP_FOR_EACH_SAFE (probe, next, node, &nbr_probes) {
+            if (probe->key.vrf_id != vrf->table_id) {
+                continue;
+            }
+            hmap_remove(&nbr_probes, &probe->node);
+            probes[n++] = probe;
+            if (n == NBR_PROBE_WINDOW) {
+                nbr_probe_window(vrf, probes, n);
+                n = 0;
+            }
+        }
+        if (n) {
+            nbr_probe_window(vrf, probes, n);
+        }
+    }
+
+    /* Vrf is gone */
+    HMAP_FOR_EACH_SAFE (probe, next, node, &nbr_probes) {
+        hmap_remove(&nbr_probes, &probe->node);
+        free(probe);
+    }
+} /* nbr_probe_run */
+
+/*
+ * Interface name cache.
+ * Names of interfaces in the namespace of a vrf, indexed by ifindex.
+ * Filled on first use and kept up to date from RTM_NEWLINK and
+ * RTM_DELLINK notifications received on the vrf netlink socket.
+ */
+struct ifname_node {
+    struct hmap_node node;      /* In vrf->ifnames. */
+    int ifindex;
+    char name[IF_NAMESIZE];
+};
+
+static struct ifname_node *
+vrf_ifname_find(const struct vrf *vrf, int ifindex)
+{
+    struct ifname_node *ifn;
+
+    HMAP_FOR_EACH_WITH_HASH (ifn, node, hash_int(ifindex, 0), &vrf->ifnames) {
+        if (ifn->ifindex == ifindex) {
+            return ifn;
+        }
+    }
+    return NULL;
+} /* vrf_ifname_find */
+
+static void
+vrf_ifname_set(struct vrf *vrf, int ifindex, const char *name)
+{
+    struct ifname_node *ifn = vrf_ifname_find(vrf, ifindex);
+
+    if (!ifn) {
+        ifn = xzalloc(sizeof *ifn);
+        ifn->ifindex = ifindex;
+        hmap_insert(&vrf->ifnames, &ifn->node, hash_int(ifindex, 0));
+    }
+    snprintf(ifn->name, sizeof ifn->name, "%s", name);
+} /* vrf_ifname_set */
+
+static void
+vrf_ifname_del(struct vrf *vrf, int ifindex)
+{
+    struct ifname_node *ifn = vrf_ifname_find(vrf, ifindex);
+
+    if (ifn) {
+        hmap_remove(&vrf->ifnames, &ifn->node);
+        free(ifn);
+    }
+} /* vrf_ifname_del */
+
+static void
+vrf_ifname_flush(struct vrf *vrf)
+{
+    struct ifname_node *ifn;
+
+    HMAP_FOR_EACH_POP (ifn, node, &vrf->ifnames) {
+        free(ifn);
+    }
+} /* vrf_ifname_flush */
+
+/* Default vrf, NULL if not configured yet */
+static struct vrf *
+arpmgrd_vrf_default(void)
+{
+    struct shash_node *node;
+
+    SHASH_FOR_EACH (node, &all_vrfs) {
+        struct vrf *vrf = node->data;
+
+        if (arpmgrd_vrf_is_default(vrf)) {
+            return vrf;
+        }
+    }
+    return NULL;
+} /* arpmgrd_vrf_default */
+
+/*
+ * Drop cached names of default vrf.
+ * Called when its socket is reopened, since link notifications
+ * may have been missed meanwhile.
+ */
+static void
+vrf_ifname_flush_default(void)
+{
+    struct vrf *vrf = arpmgrd_vrf_default();
+
+    if (vrf) {
+        vrf_ifname_flush(vrf);
+    }
+} /* vrf_ifname_flush_default */
+
+/* Get interface name of 'ifindex' in vrf namespace */
+static int
+vrf_ifindextoname(struct vrf *vrf, int ifindex, char *name)
+{
+    char buff[UUID_LEN+1] = {0};
+    struct ifname_node *ifn = vrf_ifname_find(vrf, ifindex);
+
+    if (ifn) {
+        strcpy(name, ifn->name);
+        return 0;
+    }
+
+    proc_stats.ifname_misses++;
+    get_vrf_ns_from_table_id (idl, (int64_t)vrf->table_id, buff);
+    if (nl_if_indextoname(ifindex, name, buff) != 0) {
+        return -1;
+    }
+    vrf_ifname_set(vrf, ifindex, name);
+    return 0;
+} /* vrf_ifindextoname */
+
+/* Index of device 'name' in vrf, or 0 if not known */
+static int
+vrf_ifnametoindex(const struct vrf *vrf, const char *name)
+{
+    struct ifname_node *ifn;
+
+    if (arpmgrd_vrf_is_default(vrf)) {
+        return if_nametoindex(name);
+    }
+    HMAP_FOR_EACH (ifn, node, &vrf->ifnames) {
+        if (!strcmp(ifn->name, name)) {
+            return ifn->ifindex;
+        }
+    }
+    return 0;
+} /* vrf_ifnametoindex */
+
+/* Apply a RTM_NEWLINK or RTM_DELLINK notification to name cache */
+static void
+vrf_ifname_update(struct vrf *vrf, const struct nl_event *ev)
+{
+    proc_stats.ifname_updates++;
+    if (ev->type == RTM_NEWLINK && ev->ifname[0]) {
+        vrf_ifname_set(vrf, ev->ifindex, ev->ifname);
+        return;
+    }
+    /* Deleted, or no name given. Resolved again on next use. */
+    vrf_ifname_del(vrf, ev->ifindex);
+} /* vrf_ifname_update */
+
+/* Functions for parsing nlmsg, populating cache and updating OVSDB */
+
+/* A row of 'cache_nbr' was written, journal it for a retry and count it */
+static void
+update_neighbor_written(const struct neighbor_data *cache_nbr)
+{
+    txn_journal_add_nbr(&cache_nbr->key);
+    NBR_STATS_ADD(arpmgrd_vrf_find_by_table_id(cache_nbr->key.vrf_id),
+                  cache_nbr->port_data, rows_updated, 1);
+} /* update_neighbor_written */
+
+/* Update/Insert ovsdb row from cache entry */
+static int
+update_neighbor_to_ovsdb(struct neighbor_data *cache_nbr,
+                         bool insert_row_without_checking)
+{
+    const struct ovsrec_neighbor *ovs_nbr;
+    char mac[MAC_ADDRSTRLEN];
+    const char *state = nbr_state_to_string(cache_nbr);
+    bool found = false;
+    bool written = false;
+
+    if (cache_nbr->event_usec) {
+        txn_journal_add_lat(NBR_LAT_NEW, cache_nbr->key.vrf_id,
+                            cache_nbr->event_usec, &cache_nbr->key, NULL);
+        cache_nbr->event_usec = 0;
+    }
+    nbr_mac_to_string(cache_nbr, mac);
+    /* Some of the fields are not yet populated for the externally generated neighbor. Lets do them here*/
+    if(cache_nbr->nbr_unresolved){
+        cache_nbr->nbr_unresolved = false;
+        ovs_nbr = cache_nbr->nbr;
+        ovsrec_neighbor_set_address_family(ovs_nbr,
+                                           nbr_family_to_string(cache_nbr));
+        ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
+        /* I assumeexternal module may not know proper mac, so lets' add it */
+        ovsrec_neighbor_set_mac(ovs_nbr, mac);
+        /* The state information may have created but might be updated by kernel */
+        ovsrec_neighbor_set_state(ovs_nbr, state);
+        ovsdb_commit_required = true;
+        update_neighbor_written(cache_nbr);
+        return 1;
+    }
+    if (!insert_row_without_checking) {
+        /*
+         * Check of cache entry has pointer to ovsrec, else search in idl
+         * and if row is found update in row pointer to cache entry for
+         * subsequent use
+         * */
+        if (cache_nbr->nbr) {
+            ovs_nbr = cache_nbr->nbr;
+            found = true;
+        } else {
+            ovs_nbr = idl_nbr_index_find(&cache_nbr->key);
+            if (ovs_nbr) {
+                /* Update cache with pointer to ovsrec */
+                cache_nbr->nbr = ovs_nbr;
+                found = true;
+            }
         }
     }
 
@@ -445,625 +2301,2136 @@ update_neighbor_to_ovsdb(struct neighbor_data *cache_nbr,
      * else insert a new row in ovsdb.
      */
     if (found) {
-        if(!ovs_nbr->mac && cache_nbr->mac) {
-            ovsrec_neighbor_set_mac(ovs_nbr, cache_nbr->mac);
-            ovsdb_commit_required = true;
+        if(!ovs_nbr->mac) {
+            ovsrec_neighbor_set_mac(ovs_nbr, mac);
+            written = true;
+        }
+        else if (strncmp(ovs_nbr->mac, mac, MAC_ADDRSTRLEN)) {
+            ovsrec_neighbor_set_mac(ovs_nbr, mac);
+            written = true;
+        }
+        if(!ovs_nbr->port && cache_nbr->port) {
+            ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
+            written = true;
+        }
+        else if (ovs_nbr->port != cache_nbr->port) {
+            ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
+            written = true;
+        }
+        if(!ovs_nbr->state) {
+            ovsrec_neighbor_set_state(ovs_nbr, state);
+            written = true;
+        }
+        else if (strcmp(ovs_nbr->state, state)) {
+            ovsrec_neighbor_set_state(ovs_nbr, state);
+            written = true;
+        }
+        if(!ovs_nbr->address_family) {
+            ovsrec_neighbor_set_address_family(ovs_nbr,
+                                               nbr_family_to_string(cache_nbr));
+            written = true;
+        }
+    } else {
+        ovs_nbr = ovsrec_neighbor_insert(txn);
+        ovsrec_neighbor_alloc_cnt ++;
+        if (ovs_nbr) {
+            char ip[INET6_ADDRSTRLEN];
+
+            ovsrec_neighbor_set_ip_address(ovs_nbr,
+                                           nbr_ip_to_string(cache_nbr, ip));
+            ovsrec_neighbor_set_vrf(ovs_nbr, cache_nbr->vrf->cfg);
+            ovsrec_neighbor_set_address_family(ovs_nbr,
+                                               nbr_family_to_string(cache_nbr));
+            ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
+            ovsrec_neighbor_set_mac(ovs_nbr, mac);
+            ovsrec_neighbor_set_state(ovs_nbr, state);
+            idl_nbr_index_add_txn_row(ovs_nbr, &cache_nbr->key);
+            written = true;
+        }
+    }
+    if (written) {
+        ovsdb_commit_required = true;
+        update_neighbor_written(cache_nbr);
+    }
+    return 1;
+} /* update_neighbor_to_ovsdb */
+
+/* Delete a neighbor row from ovsdb */
+static void
+delete_nbr_from_ovsdb(const struct ovsrec_neighbor *ovs_nbr)
+{
+    if (ovs_nbr) {
+        uint32_t vrf_id = ovs_nbr->vrf ? nbr_key_vrf_id(ovs_nbr->vrf) : 0;
+
+        VLOG_DBG("Deleting neighbor vrf %s ip address %s from Neighbor table",
+                ovs_nbr->vrf ? ovs_nbr->vrf->name : "none", ovs_nbr->ip_address);
+        idl_nbr_index_remove(&ovs_nbr->header_.uuid);
+        txn_journal_add_delete(&ovs_nbr->header_.uuid, vrf_id);
+        NBR_STATS_ADD(arpmgrd_vrf_find_by_table_id(vrf_id), NULL,
+                      rows_deleted, 1);
+        ovsrec_neighbor_delete(ovs_nbr);
+        ovsrec_neighbor_alloc_cnt --;
+        ovsdb_commit_required = true;
+    }
+} /* delete_nbr_from_ovsdb */
+
+/* Delete ovsdb neighbor row corresponding to a local cache entry */
+static void
+delete_cache_nbr_from_ovsdb(struct neighbor_data *cache_nbr)
+{
+    const struct ovsrec_neighbor *ovs_nbr;
+    bool found = false;
+    /*
+     * Check of cache entry has pointer to ovsrec, else search in idl
+     * and if row is found update in row pointer to cache entry for
+     * subsequent use
+     * */
+    if (cache_nbr->nbr) {
+        ovs_nbr = cache_nbr->nbr;
+        found = true;
+    } else {
+        ovs_nbr = idl_nbr_index_find(&cache_nbr->key);
+        if (ovs_nbr) {
+            /* Update cache with pointer to ovsrec */
+            cache_nbr->nbr = ovs_nbr;
+            found = true;
+        }
+    }
+    if (found) {
+        delete_nbr_from_ovsdb(ovs_nbr);
+    }
+} /* delete_cache_nbr_from_ovsdb */
+
+/*
+ * Resync of OVSDB with the cache is split in chunks of
+ * 'gbl_resync_chunk' neighbors, each committed and confirmed
+ * before next one is written.
+ * Keys of cache entries and uuids of Neighbor rows are taken when
+ * resync starts. Progress is only advanced when a chunk commits,
+ * so a failed chunk is retried, not the whole resync.
+ */
+static struct resync {
+    bool active;                /* Resync chunks remain */
+    bool delete_rows;           /* Delete rows that are not in cache */
+    bool chunk_pending;         /* Chunk written, commit not confirmed */
+    struct nbr_key *keys;       /* Cache entries to update */
+    size_t n_keys;
+    struct uuid *uuids;         /* Neighbor rows to check for delete */
+    size_t n_uuids;
+    size_t pos;                 /* First item not confirmed */
+    size_t chunk_end;           /* End of chunk pending commit */
+    uint64_t chunk_cnt;         /* Chunks written for this resync */
+} resync;
+
+static void
+resync_free(void)
+{
+    free(resync.keys);
+    free(resync.uuids);
+    memset(&resync, 0, sizeof resync);
+} /* resync_free */
+
+/* Insert or update OVSDB row of a cache entry */
+static void
+resync_nbr_to_ovsdb(struct neighbor_data *cache_nbr)
+{
+    const struct ovsrec_neighbor *idl_nbr =
+            idl_nbr_index_find(&cache_nbr->key);
+    char ip[INET6_ADDRSTRLEN];
+    char mac[MAC_ADDRSTRLEN];
+
+    nbr_ip_to_string(cache_nbr, ip);
+
+    /*
+     * Pointer to port/vrf change in case of ovsdb restart
+     * We will update these
+     */
+
+    VLOG_DBG("Updating port info for nbr cache dev %s",
+            cache_nbr->device);
+    cache_nbr->port = find_port(cache_nbr->device);
+    cache_nbr->vrf = find_port_vrf_in_cache(cache_nbr->device);
+
+    VLOG_DBG("cache %s mac %s family %s port %s vrf %s", ip,
+            nbr_mac_to_string(cache_nbr, mac),
+            nbr_family_to_string(cache_nbr),
+            cache_nbr->port->name, cache_nbr->vrf->name);
+
+    if (!idl_nbr) {
+        /* force insert here */
+        update_neighbor_to_ovsdb(cache_nbr, true);
+        idl_nbr_force_ins_cnt ++;
+    } else {
+        cache_nbr->nbr = idl_nbr;
+        if(idl_nbr->in_use_by_routes && (*(idl_nbr->in_use_by_routes) == true)) {
+            cache_nbr->routes_nh = true;
+            VLOG_INFO("routes_nh ip %s restored in cache in resync", ip);
+        }
+        update_neighbor_to_ovsdb(cache_nbr, false);
+    }
+} /* resync_nbr_to_ovsdb */
+
+/* Write next chunk of resync to transaction */
+static void
+resync_run_chunk(void)
+{
+    size_t total = resync.n_keys + resync.n_uuids;
+    size_t i, end;
+
+    end = MIN(resync.pos + gbl_resync_chunk, total);
+    txn_journal_chunk_keys[0] = txn_journal_n_keys;
+    txn_journal_chunk_dels[0] = txn_journal_n_dels;
+    for (i = resync.pos; i < end; i++) {
+        if (i < resync.n_keys) {
+            /*
+             * Go over neighbors in cache
+             * Update neighbor in ovsdb
+             * i) insert if new
+             * ii) update existing row if ovsdb rec is present
+             */
+            struct neighbor_data *cache_nbr =
+                find_neighbor_in_cache(&resync.keys[i]);
+
+            if (cache_nbr) {
+                resync_nbr_to_ovsdb(cache_nbr);
+            }
+        } else if (resync.delete_rows) {
+            /*
+             * Go over neighbors in ovsdb
+             * If neighbor is not in cache
+             * i) delete ovsdb rec
+             */
+            struct idl_nbr_node *idl_node =
+                idl_nbr_index_find_uuid(&resync.uuids[i - resync.n_keys]);
+
+            if (idl_node && !find_neighbor_in_cache(&idl_node->key)) {
+                /* delete the ovsrec */
+                idl_nbr_force_del_cnt ++;
+                delete_nbr_from_ovsdb(idl_node->nbr);
+            }
+        }
+    }
+
+    txn_journal_chunk_keys[1] = txn_journal_n_keys;
+    txn_journal_chunk_dels[1] = txn_journal_n_dels;
+    resync.chunk_end = end;
+    resync.chunk_pending = true;
+    resync.chunk_cnt++;
+    proc_stats.resync_chunks++;
+    /* Commit even an empty chunk, its status moves resync along */
+    ovsdb_commit_required = true;
+    VLOG_DBG("Resync chunk %d-%d of %d",
+             (int) resync.pos, (int) end, (int) total);
+} /* resync_run_chunk */
+
+/*
+ * Called with status of the transaction holding a resync chunk.
+ * On failure the chunk is written again, on next iteration.
+ */
+static void
+resync_commit_done(enum ovsdb_idl_txn_status status)
+{
+    if (!resync.chunk_pending) {
+        return;
+    }
+    resync.chunk_pending = false;
+
+    if (status == TXN_SUCCESS || status == TXN_UNCHANGED) {
+        resync.pos = resync.chunk_end;
+        if (resync.pos >= resync.n_keys + resync.n_uuids) {
+            VLOG_INFO("Resync of %d neighbors and %d rows done in "
+                      "%"PRIu64" chunks", (int) resync.n_keys,
+                      (int) resync.n_uuids, resync.chunk_cnt);
+            resync_free();
+        }
+    } else {
+        VLOG_INFO("Resync chunk failed %d, retrying from %d",
+                  status, (int) resync.pos);
+        proc_stats.resync_chunk_retries++;
+        /* Rows deleted in failed transaction are back */
+        idl_nbr_index_rebuild();
+    }
+} /* resync_commit_done */
+
+/*
+ * Function to resync OVSDB 'Neighbor' table entries
+ * with kernel's neighbor entries which are in local
+ * local cache (all_neighbors).
+ * Writes the first chunk, following ones are written
+ * by resync_run_chunk() as previous ones commit.
+ */
+static void
+resync_db_with_kernel()
+{
+    struct neighbor_data *cache_nbr;
+    struct idl_nbr_node *idl_node;
+
+    /* Collect all the neighbors in the dB. */
+    idl_nbr_index_rebuild();
+    ovs_idl_nbr_cnt = hmap_count(&idl_nbr_by_key);
+    all_neighbors_len = hmap_count(&all_neighbors);
+
+    resync_free();
+    resync.active = true;
+    proc_stats.resyncs++;
+
+    resync.keys = xmalloc(MAX(all_neighbors_len, 1) * sizeof *resync.keys);
+    HMAP_FOR_EACH (cache_nbr, node, &all_neighbors) {
+        resync.keys[resync.n_keys++] = cache_nbr->key;
+    }
+
+    /*
+     * If current sync process of building cache from kernel failed
+     * let's not delete rows from OVSDB, since this will be expensive.
+     * Probably the rows never got update in our cache.
+     * We commit only any modified or new rows to OVSDB
+     */
+    resync.delete_rows = sync_state != SYNC_FAILED;
+    if (resync.delete_rows) {
+        resync.uuids = xmalloc(MAX(hmap_count(&idl_nbr_by_uuid), 1)
+                               * sizeof *resync.uuids);
+        HMAP_FOR_EACH (idl_node, uuid_node, &idl_nbr_by_uuid) {
+            resync.uuids[resync.n_uuids++] = idl_node->uuid;
+        }
+    }
+
+    resync_run_chunk();
+
+    if (sync_state != SYNC_FAILED && sync_state != SYNC_REQUESTED) {
+        sync_state = SYNC_COMPLETE;
+    }
+    VLOG_DBG("%s: Sync state is %d", __func__, sync_state);
+} /* resync_db_with_kernel */
+
+/*
+ * Parse the ND message attribute and fill cache entry
+ * with IP address, family, mac, state, device
+ * If entry is a new entry add to cache
+ */
+static int
+update_neighbor_cache(int sock, const struct nl_event *ev,
+                      const struct vrf *vrf, const char *dev,
+                      struct neighbor_data **cache_nbr)
+{
+    char destip[INET6_ADDRSTRLEN];
+    bool dp_hit;
+    /* Kernel migh update first seen entry as STALE, externally added entry that are updated as stale need to be
+     * probed.so skip_dp_hit for them */
+    bool skip_dp_hit = false;
+
+    if (ev->dst_len) {
+        bool found = false;
+        struct nbr_key key;
+
+        if (ev->family == AF_INET && ev->dst_len >= sizeof(uint32_t)) {
+            uint32_t addr;
+
+            memcpy(&addr, ev->dst, sizeof addr);
+            addr = ntohl(addr);
+            /* Ignore multicast addresses */
+            if (IS_IPV4MULTICAST(addr))
+            {
+                char destip[INET_ADDRSTRLEN];
+
+                inet_ntop(AF_INET, ev->dst, destip, sizeof destip);
+                VLOG_INFO("Received multicast addr %s, Ignoring", destip);
+                return 0;
+            }
+        }
+
+        if (!nbr_key_init(&key, vrf->table_id, ev->family,
+                          ev->dst, ev->dst_len)) {
+            VLOG_DBG("Ignoring neighbor with family %d", ev->family);
+            return 0;
+        }
+
+        *cache_nbr = find_neighbor_in_cache(&key);
+        if (*cache_nbr) {
+            if((*cache_nbr)->nbr_unresolved){
+                /*ovs_nbr entry already created and some fields alreay created others are filled here */
+                (*cache_nbr)->vrf = vrf;
+                neighbor_set_device(*cache_nbr, dev);
+                (*cache_nbr)->ifindex = ev->ifindex;
+                (*cache_nbr)->port = find_port(dev);
+                skip_dp_hit = true;
+                found = true;
+                goto end_chache_nbr_init;
+            }
+            /*This entry was triggered for delete, so all the fields are populated for it. Already ping in flight,
+            no need to for dp_hit probe.*/
+            else if((*cache_nbr)->revalidate_del){
+                skip_dp_hit = true;
+                goto end_chache_nbr_init;
+            }
+            else {
+                found = true;
+            }
+        }
+
+        if (!found) {
+            *cache_nbr = add_neighbor_to_cache(&key);
+
+            (*cache_nbr)->vrf = vrf;
+            (*cache_nbr)->nbr = NULL;
+            VLOG_DBG("Adding new neighbor %s dev %s",
+                     nbr_ip_to_string(*cache_nbr, destip), dev);
+            neighbor_set_device(*cache_nbr, dev);
+            (*cache_nbr)->ifindex = ev->ifindex;
+            (*cache_nbr)->port = find_port(dev);
+            nbr_clear_mac(*cache_nbr);
+        }
+end_chache_nbr_init:
+        switch (ev->state) {
+
+        case NUD_REACHABLE:
+            (*cache_nbr)->state = NBR_STATE_REACHABLE;
+            (*cache_nbr)->ping_retry_cnt = 0;
+            /*revalidatation is complete, db can be update after that*/
+            (*cache_nbr)->revalidate_del = false;
+            break;
+
+        case NUD_STALE:
+            /* Send probe request to STALE neighbor and dp_hit set */
+            /* Set dp_hit default to be false */
+            dp_hit = false;
+            (*cache_nbr)->ping_retry_cnt = 0; // may be after ping from switch host entry cannot be stale.
+            (*cache_nbr)->revalidate_del = false;
+            if ((!skip_dp_hit) && ((*cache_nbr)->nbr)) {
+                dp_hit = smap_get_bool(&(*cache_nbr)->nbr->status ,
+                         OVSDB_NEIGHBOR_STATUS_DP_HIT,
+                         OVSDB_NEIGHBOR_STATUS_MAP_DP_HIT_DEFAULT);
+            }
+
+            VLOG_DBG("dp hit state = %d ip %s", dp_hit,
+                     nbr_ip_to_string(*cache_nbr, destip));
+            (*cache_nbr)->dp_hit = dp_hit;
+            if (sock &&
+               (dp_hit ||(!dbg_stop_nh_probe && (*cache_nbr)->routes_nh))) {
+                probe_sched_add(*cache_nbr);
+                /*
+                 * FIXME: Set state to reachable. Currently we are not receiving
+                 * Reachable state from Stale state. (Bug)
+)                 * If kernel is unable to resolve, we will get an explicit
+                 * notification for FAILED state
+                 */
+                (*cache_nbr)->state = NBR_STATE_REACHABLE;
+            } else
+            {
+                (*cache_nbr)->state = NBR_STATE_STALE;
+            }
+            break;
+
+        case NUD_FAILED:
+            VLOG_DBG("Neighbor resolution failed %s",
+                     nbr_ip_to_string(*cache_nbr, destip));
+            (*cache_nbr)->revalidate_del = false;
+            /*ping if the nbe is nh. no matter how it land up in this state.*/
+            if((*cache_nbr)->routes_nh && ((*cache_nbr)->ping_retry_cnt < MAX_NH_PING_CNT)) {
+                VLOG_ERR("pinging again for the in_use_by_route %s",
+                         nbr_ip_to_string(*cache_nbr, destip));
+                nbr_ping(*cache_nbr);
+                (*cache_nbr)->state = NBR_STATE_INCOMPLETE;
+                nbr_clear_mac(*cache_nbr);
+                (*cache_nbr)->ping_retry_cnt ++;
+                break;
+            }
+            (*cache_nbr)->state = NBR_STATE_FAILED;
+            nbr_clear_mac(*cache_nbr);
+            break;
+
+        case NUD_INCOMPLETE:
+            VLOG_DBG("Neighbor resolution incomplete %s",
+                     nbr_ip_to_string(*cache_nbr, destip));
+            /* Don't change mac and state for entries that are being revalidated before deleting from DB. */
+            if(!(*cache_nbr)->revalidate_del){
+                (*cache_nbr)->state = NBR_STATE_INCOMPLETE;
+                nbr_clear_mac(*cache_nbr);
+            }
+            else {
+                VLOG_INFO("nbr %s is routes_nh, revalidating before deleting from DB",
+                          nbr_ip_to_string(*cache_nbr, destip));
+            }
+            break;
+
+        case NUD_PERMANENT:
+            (*cache_nbr)->state = NBR_STATE_PERMANENT;
+            break;
+
+        case NUD_DELAY:
+        case NUD_PROBE:
+        default:
+            (*cache_nbr)->revalidate_del = false;
+            (*cache_nbr)->state = NBR_STATE_REACHABLE;
+            break;
+
         }
-        else if (strncmp(ovs_nbr->mac, cache_nbr->mac, MAC_ADDRSTRLEN)) {
-            ovsrec_neighbor_set_mac(ovs_nbr, cache_nbr->mac);
-            ovsdb_commit_required = true;
+    }
+    if (ev->has_lladdr) {
+        /* Set MAC */
+        if (*cache_nbr) {
+            memcpy((*cache_nbr)->mac, ev->lladdr, MAC_ADDRLEN);
+            (*cache_nbr)->has_mac = true;
         }
-        if(!ovs_nbr->port && cache_nbr->port) {
-            ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
-            ovsdb_commit_required = true;
+    }
+    /* Resolved, no need to ping it again */
+    if (*cache_nbr && ((*cache_nbr)->state == NBR_STATE_REACHABLE
+                       || (*cache_nbr)->state == NBR_STATE_STALE
+                       || (*cache_nbr)->state == NBR_STATE_PERMANENT)) {
+        nh_timer_remove(&(*cache_nbr)->retry_timer);
+    }
+    return 1;
+} /* update_neighbor_cache */
+
+/*
+ * Queue delete of a Neighbor row.
+ * Row is removed from index right away, so that a neighbor learnt
+ * again meanwhile gets a new row.
+ */
+static struct nbr_pending_del *
+find_pending_nbr_delete(const struct uuid *uuid)
+{
+    struct nbr_pending_del *del;
+
+    HMAP_FOR_EACH_WITH_HASH (del, node, uuid_hash(uuid),
+                             &pending_nbr_deletes) {
+        if (uuid_equals(&del->uuid, uuid)) {
+            return del;
         }
-        else if (ovs_nbr->port != cache_nbr->port) {
-            ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
-            ovsdb_commit_required = true;
+    }
+    return NULL;
+} /* find_pending_nbr_delete */
+
+static void
+queue_nbr_delete(const struct ovsrec_neighbor *ovs_nbr)
+{
+    const struct uuid *uuid = &ovs_nbr->header_.uuid;
+    struct nbr_pending_del *del;
+
+    if (find_pending_nbr_delete(uuid)) {
+        return;
+    }
+
+    idl_nbr_index_remove(uuid);
+    del = xmalloc(sizeof *del);
+    del->uuid = *uuid;
+    del->event_usec = nl_event_cur ? nl_event_cur->time_usec : 0;
+    del->vrf_id = nl_event_cur ? nl_event_cur->table_id : 0;
+    hmap_insert(&pending_nbr_deletes, &del->node, uuid_hash(uuid));
+    commit_sched_note();
+} /* queue_nbr_delete */
+
+/* Delete up to 'max' queued rows still present in IDL */
+static int
+flush_pending_deletes(int max)
+{
+    int n = 0;
+
+    while (n < max && !hmap_is_empty(&pending_nbr_deletes)) {
+        struct nbr_pending_del *del =
+            CONTAINER_OF(hmap_first(&pending_nbr_deletes),
+                         struct nbr_pending_del, node);
+        const struct ovsrec_neighbor *ovs_nbr =
+            ovsrec_neighbor_get_for_uuid(idl, &del->uuid);
+
+        hmap_remove(&pending_nbr_deletes, &del->node);
+        if (ovs_nbr) {
+            delete_nbr_from_ovsdb(ovs_nbr);
+            if (del->event_usec) {
+                txn_journal_add_lat(NBR_LAT_DEL, del->vrf_id, del->event_usec,
+                                    NULL, &del->uuid);
+            }
+            n++;
         }
-        if(!ovs_nbr->state && cache_nbr->state) {
-            ovsrec_neighbor_set_state(ovs_nbr, cache_nbr->state);
-            ovsdb_commit_required = true;
+        free(del);
+    }
+    return n;
+} /* flush_pending_deletes */
+
+/* Write final state of up to 'max' neighbors updated by kernel to OVSDB */
+static int
+flush_dirty_neighbors(int max)
+{
+    int n = 0;
+
+    while (n < max && !hmap_is_empty(&dirty_neighbors)) {
+        struct neighbor_data *cache_nbr =
+            CONTAINER_OF(hmap_first(&dirty_neighbors), struct neighbor_data,
+                         dirty_node);
+
+        neighbor_clear_dirty(cache_nbr);
+        /* Entries being revalidated are updated once kernel answers */
+        if (!cache_nbr->revalidate_del) {
+            update_neighbor_to_ovsdb(cache_nbr, false);
+            proc_stats.dirty_flushed++;
+            n++;
         }
-        else if (strncmp(ovs_nbr->state, cache_nbr->state,ARP_STATE_LEN)) {
-            ovsrec_neighbor_set_state(ovs_nbr, cache_nbr->state);
-            ovsdb_commit_required = true;
+    }
+    return n;
+} /* flush_dirty_neighbors */
+
+static size_t
+commit_sched_pending(void)
+{
+    return hmap_count(&dirty_neighbors) + hmap_count(&pending_nbr_deletes);
+} /* commit_sched_pending */
+
+/* True while changes arrive faster than they are committed */
+static bool
+commit_sched_busy(long long int now)
+{
+    return (commit_backlog
+            || (txn && txn_status == TXN_INCOMPLETE)
+            || (commit_last_flush
+                && now < commit_last_flush + gbl_commit_hold_ms));
+} /* commit_sched_busy */
+
+static bool
+commit_sched_due(long long int now)
+{
+    /* Changes held during resync would be lost with a failed chunk */
+    if (!commit_sched_pending() || resync.active) {
+        return false;
+    }
+    if (now < txn_retry_until) {
+        return false;
+    }
+    if (!commit_sched_busy(now)) {
+        return true;
+    }
+    return (ovsdb_commit_required || commit_backlog
+            || commit_sched_pending() >= (size_t) gbl_commit_batch
+            || now >= commit_hold_start + gbl_commit_hold_ms);
+} /* commit_sched_due */
+
+/* Write pending changes to transaction, if it is time to */
+static void
+commit_sched_run(void)
+{
+    int batch;
+
+    if (!commit_sched_due(time_msec())) {
+        return;
+    }
+
+    batch = flush_pending_deletes(gbl_commit_batch);
+    batch += flush_dirty_neighbors(MAX(gbl_commit_batch - batch, 0));
+
+    commit_backlog = (!hmap_is_empty(&dirty_neighbors)
+                      || !hmap_is_empty(&pending_nbr_deletes));
+    if (!commit_backlog) {
+        commit_hold_start = 0;
+    }
+    if (batch) {
+        commit_last_flush = time_msec();
+        proc_stats.commit_batches++;
+        proc_stats.commit_batch_rows += batch;
+        proc_stats.commit_batch_last = batch;
+        proc_stats.commit_batch_max = MAX(proc_stats.commit_batch_max,
+                                          batch);
+    }
+} /* commit_sched_run */
+
+static void
+commit_sched_wait(void)
+{
+    if (!commit_sched_pending() || resync.active) {
+        return;
+    }
+    if (commit_backlog || !commit_sched_busy(time_msec())) {
+        poll_timer_wait_until(txn_retry_until);
+    } else {
+        /* Held until the hold timer expires or the scheduler is idle */
+        poll_timer_wait_until(MAX(MIN(commit_hold_start, commit_last_flush)
+                                  + gbl_commit_hold_ms, txn_retry_until));
+    }
+} /* commit_sched_wait */
+
+/* Drop pending changes. Resync writes the whole cache anyway */
+static void
+commit_sched_clear(void)
+{
+    struct nbr_pending_del *del;
+    struct neighbor_data *nbr;
+
+    HMAP_FOR_EACH_POP (del, node, &pending_nbr_deletes) {
+        free(del);
+    }
+    HMAP_FOR_EACH_POP (nbr, dirty_node, &dirty_neighbors) {
+        nbr->dirty = false;
+    }
+    commit_hold_start = 0;
+    commit_last_flush = 0;
+    commit_backlog = false;
+    txn_retry_until = 0;
+} /* commit_sched_clear */
+
+/* Count rows of the journaled transaction as committed or failed */
+static void
+nbr_stats_commit_done(bool committed)
+{
+    size_t i;
+
+    if (committed) {
+        proc_stats.commits++;
+    } else {
+        proc_stats.commit_failures++;
+    }
+    for (i = 0; i < txn_journal_n_keys; i++) {
+        struct vrf *vrf =
+            arpmgrd_vrf_find_by_table_id(txn_journal_keys[i].vrf_id);
+        struct neighbor_data *cache_nbr =
+            find_neighbor_in_cache(&txn_journal_keys[i]);
+        struct port_data *pd = cache_nbr ? cache_nbr->port_data : NULL;
+
+        if (committed) {
+            NBR_STATS_ADD(vrf, pd, rows_committed, 1);
+        } else {
+            NBR_STATS_ADD(vrf, pd, rows_failed, 1);
         }
-        if(!ovs_nbr->address_family && cache_nbr->network_family) {
-            ovsrec_neighbor_set_address_family(ovs_nbr, cache_nbr->network_family);
+    }
+    for (i = 0; i < txn_journal_n_dels; i++) {
+        struct vrf *vrf =
+            arpmgrd_vrf_find_by_table_id(txn_journal_dels[i].vrf_id);
+
+        if (committed) {
+            NBR_STATS_ADD(vrf, NULL, rows_committed, 1);
+        } else {
+            NBR_STATS_ADD(vrf, NULL, rows_failed, 1);
         }
-    } else {
-        ovs_nbr = ovsrec_neighbor_insert(txn);
-        ovsrec_neighbor_alloc_cnt ++;
+    }
+} /* nbr_stats_commit_done */
+
+/*
+ * Called with status of a failed transaction, before it is destroyed.
+ * Neighbors written by it are marked dirty and its deletes queued
+ * again, to be retried after an exponential backoff. Entries of a
+ * resync chunk are left out, the chunk is written again as a whole.
+ * Other writes to the same transaction are retried as usual, dirty
+ * neighbors and queued deletes wait for the resync. Returns false
+ * if the failure is not transient, or has repeated too often, and a
+ * full resync with kernel is needed instead.
+ */
+static bool
+txn_retry_failed(enum ovsdb_idl_txn_status status)
+{
+    size_t i;
+    int backoff;
+
+    nbr_stats_commit_done(false);
+    txn_fail_streak++;
+    if ((status != TXN_TRY_AGAIN && status != TXN_NOT_LOCKED)
+        || txn_fail_streak > TXN_RETRY_MAX) {
+        VLOG_INFO("Transaction failed %d, %d in a row, resync with kernel",
+                  status, txn_fail_streak);
+        txn_fail_streak = 0;
+        proc_stats.txn_resyncs++;
+        return false;
+    }
+
+    for (i = 0; i < txn_journal_n_keys; i++) {
+        struct neighbor_data *cache_nbr;
+
+        if (i >= txn_journal_chunk_keys[0] && i < txn_journal_chunk_keys[1]) {
+            continue;
+        }
+        cache_nbr = find_neighbor_in_cache(&txn_journal_keys[i]);
+        if (cache_nbr) {
+            neighbor_mark_dirty(cache_nbr);
+        }
+    }
+    for (i = 0; i < txn_journal_n_dels; i++) {
+        const struct ovsrec_neighbor *ovs_nbr;
+
+        if (i >= txn_journal_chunk_dels[0] && i < txn_journal_chunk_dels[1]) {
+            continue;
+        }
+        ovs_nbr = ovsrec_neighbor_get_for_uuid(idl,
+                                               &txn_journal_dels[i].uuid);
         if (ovs_nbr) {
-            ovsrec_neighbor_set_ip_address(ovs_nbr, cache_nbr->ip_address);
-            ovsrec_neighbor_set_vrf(ovs_nbr, cache_nbr->vrf->cfg);
-            ovsrec_neighbor_set_address_family(ovs_nbr, cache_nbr->network_family);
-            ovsrec_neighbor_set_port(ovs_nbr, cache_nbr->port);
-            ovsrec_neighbor_set_mac(ovs_nbr, cache_nbr->mac);
-            ovsrec_neighbor_set_state(ovs_nbr, cache_nbr->state);
-            ovsdb_commit_required = true;
+            queue_nbr_delete(ovs_nbr);
+        }
+    }
+    /* Keep event stamps, latency is measured up to the retry commit */
+    for (i = 0; i < txn_journal_n_lats; i++) {
+        const struct nbr_lat_sample *s = &txn_journal_lats[i];
+
+        if (s->type == NBR_LAT_NEW) {
+            struct neighbor_data *cache_nbr = find_neighbor_in_cache(&s->key);
+
+            if (cache_nbr && cache_nbr->dirty
+                && (!cache_nbr->event_usec
+                    || cache_nbr->event_usec > s->event_usec)) {
+                cache_nbr->event_usec = s->event_usec;
+            }
+        } else {
+            struct nbr_pending_del *del = find_pending_nbr_delete(&s->uuid);
+
+            if (del) {
+                del->event_usec = s->event_usec;
+                del->vrf_id = s->vrf_id;
+            }
         }
     }
+
+    backoff = MIN(TXN_RETRY_BACKOFF_MIN_MS << MIN(txn_fail_streak - 1, 16),
+                  TXN_RETRY_BACKOFF_MAX_MS);
+    txn_retry_until = time_msec() + backoff;
+    proc_stats.txn_retries++;
+    proc_stats.txn_retry_rows += txn_journal_n_keys + txn_journal_n_dels;
+    VLOG_INFO("Transaction failed %d, retrying %d neighbors and %d deletes "
+              "in %d ms", status, (int) txn_journal_n_keys,
+              (int) txn_journal_n_dels, backoff);
+    return true;
+} /* txn_retry_failed */
+
+/*
+ * Neighbor deleted from kernel. Next hops used by routes are pinged
+ * again a few times, others are deleted from cache and ovsdb.
+ */
+static void
+neighbor_kernel_gone(struct neighbor_data *cache_nbr)
+{
+    const struct ovsrec_neighbor *ovs_nbr;
+    char destip[INET6_ADDRSTRLEN];
+
+    nbr_ip_to_string(cache_nbr, destip);
+    if(cache_nbr->routes_nh && (cache_nbr->ping_retry_cnt< MAX_NH_PING_CNT)) {
+        VLOG_INFO("Del notified for %s, but pinging again to keep it refreshed... ",destip);
+        nbr_ping(cache_nbr);
+        cache_nbr->revalidate_del = true;
+        cache_nbr->state = NBR_STATE_INCOMPLETE;
+        cache_nbr->ping_retry_cnt++;
+        return;
+    }
+
+    ovs_nbr = idl_nbr_index_find(&cache_nbr->key);
+    if(ovs_nbr) {
+        queue_nbr_delete(ovs_nbr);
+        VLOG_DBG("Neighbor delete: %s\n",
+               destip);
+    } else {
+        VLOG_ERR("Unable to find neighbor entry for %s in vrf %s. Cannot delete.", destip, cache_nbr->vrf->name);
+    }
+
+    delete_neighbor_from_cache(cache_nbr);
+} /* neighbor_kernel_gone */
+
+/* Delete neighbor from cache and ovsdb */
+static int
+del_neighbor(const struct nl_event *ev, const struct vrf *vrf)
+{
+    if (ev->family != AF_INET && ev->family != AF_INET6) {
+        return -1;
+    }
+
+    if (ev->dst_len) {
+            struct neighbor_data *cache_nbr;
+            struct nbr_key key;
+
+            if (!nbr_key_init(&key, vrf->table_id, ev->family,
+                              ev->dst, ev->dst_len)) {
+                return -1;
+            }
+            cache_nbr = find_neighbor_in_cache(&key);
+            if(!cache_nbr){
+                VLOG_INFO("Unable to delete a neighbor, vrf %s that has no entry in hash", vrf->name);
+                return -1;
+            }
+            neighbor_kernel_gone(cache_nbr);
+    }
     return 1;
-} /* update_neighbor_to_ovsdb */
+} /* del_neighbor */
+
+/*
+ * Overrun recovery.
+ * Notifications lost in an overrun (ENOBUFS) are recovered by dumping
+ * the vrf neighbors into the cache as it is. Neighbors seen in the dump,
+ * or updated by a notification queued after it started, are marked with
+ * a new generation, and once the dump is done the vrf neighbors left
+ * with an older one are handled as deleted by kernel. Only differences
+ * reach OVSDB, as update_neighbor_to_ovsdb() skips unchanged rows.
+ */
+/* Sequence number for a dump whose replies need to be told apart */
+static uint32_t
+nl_dump_seq_next(void)
+{
+    if (!++nl_dump_seq) {
+        nl_dump_seq++;
+    }
+    return nl_dump_seq;
+} /* nl_dump_seq_next */
+
+static void
+nl_recovery_dump_start(struct vrf *vrf, int sock)
+{
+    vrf->dump_gen++;
+    vrf->dump_seq = nl_dump_seq_next();
+    vrf->dump_started = false;
+    vrf->dump_restart = false;
+    vrf->dump_busy = false;
+    NBR_STATS_ADD(vrf, NULL, recovery_dumps, 1);
+    if (!netlink_request_neighbor_dump__(sock, vrf->dump_seq, AF_UNSPEC, 0)
+        && sync_state == SYNC_NONE) {
+        vrf->dump_seq = 0;
+        sync_mode = SYNC_WITH_CACHE_RESET;
+        sync_state = SYNC_REQUESTED;
+    }
+} /* nl_recovery_dump_start */
+
+/* Overrun on netlink socket of a vrf, lost notifications are dumped again */
+static void
+nl_overrun_recover(struct vrf *vrf, int sock)
+{
+    VLOG_INFO("Netlink overrun on vrf %s, recovering with a neighbor dump",
+              vrf->name);
+    /* Link notifications may be lost too */
+    vrf_ifname_flush(vrf);
+    if (vrf->dump_seq) {
+        /* Dump in progress missed updates, start over once it is done */
+        vrf->dump_restart = true;
+        return;
+    }
+    nl_recovery_dump_start(vrf, sock);
+} /* nl_overrun_recover */
+
+/*
+ * Forget dumps in progress, their socket is reopened and the whole
+ * cache dumped again anyway.
+ */
+static void
+nl_recovery_cancel_all(void)
+{
+    struct shash_node *node;
+
+    SHASH_FOR_EACH (node, &all_vrfs) {
+        struct vrf *vrf = node->data;
+
+        vrf->dump_seq = 0;
+        vrf->dump_req_seq = 0;
+        vrf->dump_req_busy = false;
+    }
+} /* nl_recovery_cancel_all */
+
+/* Neighbors of vrf not seen by recovery dump are gone from kernel */
+static void
+nl_recovery_sweep(struct vrf *vrf)
+{
+    struct neighbor_data *nbr, *next;
+    int swept = 0;
+
+    HMAP_FOR_EACH_SAFE (nbr, next, node, &all_neighbors) {
+        /* Next hops added from OVSDB may not be in kernel yet */
+        if (nbr->vrf != vrf || nbr->gen == vrf->dump_gen
+            || nbr->nbr_unresolved || nbr->revalidate_del) {
+            continue;
+        }
+        neighbor_kernel_gone(nbr);
+        swept++;
+    }
+    proc_stats.recovery_swept += swept;
+    VLOG_INFO("Netlink overrun recovery on vrf %s done, %d neighbors gone",
+              vrf->name, swept);
+} /* nl_recovery_sweep */
+
+/* NLMSG_DONE or NLMSG_ERROR received on netlink socket of a vrf */
+static void
+nl_recovery_dump_msg(struct vrf *vrf, int sock, const struct nl_event *ev)
+{
+    if (!vrf->dump_seq) {
+        return;
+    }
+    if (ev->seq != vrf->dump_seq) {
+        /* Dump that refused ours is done, ask again */
+        if (ev->type == NLMSG_DONE && vrf->dump_busy) {
+            nl_recovery_dump_start(vrf, sock);
+        }
+        return;
+    }
+
+    if (ev->type == NLMSG_ERROR) {
+        if (ev->error == -EBUSY) {
+            proc_stats.recovery_busy++;
+            vrf->dump_busy = true;
+            return;
+        }
+        VLOG_ERR("Neighbor dump for overrun recovery failed (%s), "
+                 "resync with kernel", strerror(-ev->error));
+        vrf->dump_seq = 0;
+        if (sync_state == SYNC_NONE) {
+            sync_mode = SYNC_WITH_CACHE_RESET;
+            sync_state = SYNC_REQUESTED;
+        }
+        return;
+    }
+
+    vrf->dump_seq = 0;
+    if (vrf->dump_restart) {
+        nl_recovery_dump_start(vrf, sock);
+    } else {
+        nl_recovery_sweep(vrf);
+    }
+} /* nl_recovery_dump_msg */
+
+/*
+ * Queue of neighbor dumps of a vrf.
+ * Dumps asked within an iteration are de-duplicated, and those of more
+ * than NL_DUMP_COALESCE_MAX devices of a family are merged into a dump
+ * of the whole family. Dumps are sent one at a time, the next one once
+ * the previous is done, as kernel refuses a dump while another one is
+ * running on the socket.
+ */
+struct nl_dump_req {
+    struct hmap_node node;      /* In vrf->dump_reqs. */
+    int ifindex;                /* Device, or 0 for all. */
+    uint8_t family;             /* AF_INET or AF_INET6. */
+};
+
+static struct nl_dump_req *
+nl_dump_queue_find(const struct vrf *vrf, int ifindex, uint8_t family)
+{
+    struct nl_dump_req *req;
+
+    HMAP_FOR_EACH_WITH_HASH (req, node, hash_int(ifindex, family),
+                             &vrf->dump_reqs) {
+        if (req->ifindex == ifindex && req->family == family) {
+            return req;
+        }
+    }
+    return NULL;
+} /* nl_dump_queue_find */
+
+/* Queue a dump of 'family' neighbors on device 'ifindex', or all if 0 */
+static void
+nl_dump_queue_add(struct vrf *vrf, int ifindex, uint8_t family)
+{
+    struct nl_dump_req *req, *next;
+    int n = 0;
+
+    if (!nl_dump_filter) {
+        ifindex = 0;
+    }
+    if (nl_dump_queue_find(vrf, 0, family)
+        || nl_dump_queue_find(vrf, ifindex, family)) {
+        proc_stats.dumps_coalesced++;
+        return;
+    }
+
+    HMAP_FOR_EACH (req, node, &vrf->dump_reqs) {
+        n += req->family == family;
+    }
+    if (n >= NL_DUMP_COALESCE_MAX) {
+        ifindex = 0;
+    }
+    if (!ifindex) {
+        HMAP_FOR_EACH_SAFE (req, next, node, &vrf->dump_reqs) {
+            if (req->family == family) {
+                hmap_remove(&vrf->dump_reqs, &req->node);
+                free(req);
+                proc_stats.dumps_coalesced++;
+            }
+        }
+    }
+
+    req = xmalloc(sizeof *req);
+    req->ifindex = ifindex;
+    req->family = family;
+    hmap_insert(&vrf->dump_reqs, &req->node, hash_int(ifindex, family));
+    proc_stats.dumps_queued++;
+} /* nl_dump_queue_add */
 
-/* Delete a neighbor row from ovsdb */
 static void
-delete_nbr_from_ovsdb(const struct ovsrec_neighbor *ovs_nbr)
+nl_dump_queue_clear(struct vrf *vrf)
 {
-    if (ovs_nbr) {
-        VLOG_DBG("Deleting neighbor vrf %s ip address %s from Neighbor table",
-                ovs_nbr->vrf ? ovs_nbr->vrf->name : "none", ovs_nbr->ip_address);
-        ovsrec_neighbor_delete(ovs_nbr);
-        ovsrec_neighbor_alloc_cnt --;
-        ovsdb_commit_required = true;
+    struct nl_dump_req *req;
+
+    HMAP_FOR_EACH_POP (req, node, &vrf->dump_reqs) {
+        free(req);
     }
-} /* delete_nbr_from_ovsdb */
+} /* nl_dump_queue_clear */
 
-/* Delete ovsdb neighbor row corresponding to a local cache entry */
+/* Send next queued dump, unless one is in progress */
 static void
-delete_cache_nbr_from_ovsdb(struct neighbor_data *cache_nbr)
+nl_dump_queue_run(struct vrf *vrf, int sock)
 {
-    const struct ovsrec_neighbor *ovs_nbr;
-    bool found = false;
-    /*
-     * Check of cache entry has pointer to ovsrec, else search in idl
-     * and if row is found update in row pointer to cache entry for
-     * subsequent use
-     * */
-    if (cache_nbr->nbr) {
-        ovs_nbr = cache_nbr->nbr;
-        found = true;
-    } else {
-        OVSREC_NEIGHBOR_FOR_EACH (ovs_nbr, idl) {
-            if (!strcmp((ovs_nbr)->ip_address, cache_nbr->ip_address) &&
-                    ovs_nbr->vrf == cache_nbr->vrf->cfg) {
-                /* Update cache with pointer to ovsrec */
-                cache_nbr->nbr = ovs_nbr;
-                found = true;
-                break;
-            }
-        }
+    struct nl_dump_req *req;
+    uint32_t seq;
+
+    if (sock <= 0 || vrf->dump_req_seq || vrf->dump_req_busy
+        || hmap_is_empty(&vrf->dump_reqs)) {
+        return;
     }
-    if (found) {
-        delete_nbr_from_ovsdb(ovs_nbr);
+
+    req = CONTAINER_OF(hmap_first(&vrf->dump_reqs), struct nl_dump_req,
+                       node);
+    hmap_remove(&vrf->dump_reqs, &req->node);
+    seq = nl_dump_seq_next();
+    if (netlink_request_neighbor_dump__(sock, seq, req->family,
+                                        req->ifindex)) {
+        vrf->dump_req_seq = seq;
+        vrf->dump_req_ifindex = req->ifindex;
+        vrf->dump_req_family = req->family;
+        proc_stats.dumps_sent++;
     }
-} /* delete_cache_nbr_from_ovsdb */
+    free(req);
+} /* nl_dump_queue_run */
 
-/*
- * Function to resync OVSDB 'Neighbor' table entries
- * with kernel's neighbor entries which are in local
- * local cache (all_neighbors).
- */
+/* NLMSG_DONE or NLMSG_ERROR received, go on with next queued dump */
 static void
-resync_db_with_kernel()
+nl_dump_queue_msg(struct vrf *vrf, int sock, const struct nl_event *ev)
 {
-    struct shash idl_neighbors;
-    const struct ovsrec_neighbor *ovs_nbr;
-    struct shash_node *sh_node, *sh_next;
-    ovs_idl_nbr_cnt = 0;
-    all_neighbors_len = 0;
-    /* Collect all the interfaces in the dB. */
-    shash_init(&idl_neighbors);
-    OVSREC_NEIGHBOR_FOR_EACH(ovs_nbr, idl) {
-        char key[VRF_IP_KEY_MAX_LEN];
-        get_hash_key(ovs_nbr->vrf->name, ovs_nbr->ip_address, key);
-        if (!shash_add_once(&idl_neighbors, key, ovs_nbr)) {
-            VLOG_WARN("Neighbor vrf name %s ip address %s"
-                    "specified twice", ovs_nbr->vrf->name, ovs_nbr->ip_address);
+    if (!vrf->dump_req_seq || ev->seq != vrf->dump_req_seq) {
+        /* Dump that refused ours is done */
+        if (ev->type == NLMSG_DONE && vrf->dump_req_busy) {
+            vrf->dump_req_busy = false;
+            nl_dump_queue_run(vrf, sock);
         }
-        else{
-            ovs_idl_nbr_cnt ++;
+        return;
+    }
+
+    vrf->dump_req_seq = 0;
+    if (ev->type == NLMSG_ERROR) {
+        if (ev->error == -EBUSY) {
+            vrf->dump_req_busy = true;
+            nl_dump_queue_add(vrf, vrf->dump_req_ifindex,
+                              vrf->dump_req_family);
+            return;
+        } else if (ev->error && vrf->dump_req_ifindex) {
+            VLOG_WARN("Neighbor dump filtered by device failed (%s), "
+                      "dumping all devices from now on",
+                      strerror(-ev->error));
+            nl_dump_filter = false;
+            nl_dump_queue_add(vrf, 0, vrf->dump_req_family);
+        } else if (ev->error) {
+            VLOG_ERR("Neighbor dump failed (%s)", strerror(-ev->error));
         }
     }
+    nl_dump_queue_run(vrf, sock);
+} /* nl_dump_queue_msg */
 
-    /*
-     * Go over neighbors in cache
-     * Update neighbor in ovsdb
-     * i) insert if new
-     * ii) update existing row if ovsdb rec is present
-     */
-    SHASH_FOR_EACH_SAFE(sh_node, sh_next, &all_neighbors) {
-        struct neighbor_data *cache_nbr = sh_node->data;
-        struct ovsrec_neighbor *idl_nbr =
-                shash_find_data(&idl_neighbors, sh_node->name);
+/* NLMSG_DONE or NLMSG_ERROR received on netlink socket of a vrf */
+static void
+nl_dump_done_msg(struct vrf *vrf, int sock, const struct nl_event *ev)
+{
+    nl_recovery_dump_msg(vrf, sock, ev);
+    nl_dump_queue_msg(vrf, sock, ev);
+} /* nl_dump_done_msg */
+
+/* Receive on netlink socket of vrf failed with 'err', other than EAGAIN */
+static void
+nl_socket_overrun(struct vrf *vrf, int sock, int err)
+{
+    VLOG_ERR("err = %s ,sync_state %d, nbr_alloc_cnt %d, port_data_alloc %d, \n \
+    ovsrec_neighbor_alloc_cnt %d, force_ins_cnt %d force_del_cnt %d, ovs_idl_nbr_cnt %d,all_neighbors_len %d \n",
+    strerror(err),sync_state,nbr_alloc_cnt,
+    port_data_alloc,ovsrec_neighbor_alloc_cnt,
+    idl_nbr_force_ins_cnt,idl_nbr_force_del_cnt,ovs_idl_nbr_cnt,
+    all_neighbors_len);
+    VLOG_ERR("nl_dump_req_cnt %d, nl_dump_res_cnt %d, not_multi_part_dump_res_cnt %d \n\
+    nl_probe_req_cnt %d, nl_dump_res_size %d, ovsdb_tr_trigger_cnt %d",
+    nl_dump_req_cnt,nl_dump_res_cnt, nl_dump_res_nof_multi_cnt,
+    nl_probe_req_cnt, nl_dump_res_size,
+    ovsdb_tr_trigger_cnt);
+    NBR_STATS_ADD(vrf, NULL, overruns, 1);
+    /* Kernel messages could be overwhelming,
+       suspend receive temporarily */
+    if (err == ENOBUFS && sync_state == SYNC_NONE &&
+        gbl_nl_overrun_recovery == NL_OVERRUN_INCREMENTAL) {
+        nl_overrun_recover(vrf, sock);
+    }
+    else if(sync_state == SYNC_NONE) {
+        sync_mode = SYNC_WITH_CACHE_RESET;
+        sync_state = SYNC_REQUESTED;
+    }
+    else {
+        sync_state = SYNC_FAILED;
+    }
+} /* nl_socket_overrun */
+
+/*
+ * Decode a netlink message received on socket of vrf 'table_id'.
+ * Returns false for messages of no interest.
+ */
+static bool
+nl_event_decode(const struct nlmsghdr *nlh, int64_t table_id,
+                struct nl_event *ev)
+{
+    const struct rtattr *rta;
+    int rtalen;
+
+    memset(ev, 0, sizeof *ev);
+    ev->table_id = table_id;
+    ev->type = nlh->nlmsg_type;
+    ev->seq = nlh->nlmsg_seq;
+
+    switch (nlh->nlmsg_type) {
+    case RTM_NEWNEIGH:
+    case RTM_DELNEIGH: {
+        const struct ndmsg *ndm = NLMSG_DATA(nlh);
+
+        if (nlh->nlmsg_len < NLMSG_LENGTH(sizeof *ndm)) {
+            return false;
+        }
+        ev->family = ndm->ndm_family;
+        ev->ifindex = ndm->ndm_ifindex;
+        ev->state = ndm->ndm_state;
 
         /*
-         * Pointer to port/vrf change in case of ovsdb restart
-         * We will update these
+         * We will extract info from NDA_DST (ip address),
+         * and NDA_LLADDR (MAC address) attributes.
          */
+        rtalen = NDA_PAYLOAD(nlh);
+        for (rta = NDA_RTA(ndm); RTA_OK(rta, rtalen);
+             rta = RTA_NEXT(rta, rtalen)) {
+            if (rta->rta_type == NDA_DST
+                && RTA_PAYLOAD(rta) <= sizeof ev->dst) {
+                ev->dst_len = RTA_PAYLOAD(rta);
+                memcpy(ev->dst, RTA_DATA(rta), ev->dst_len);
+            } else if (rta->rta_type == NDA_LLADDR
+                       && RTA_PAYLOAD(rta) >= MAC_ADDRLEN) {
+                ev->has_lladdr = true;
+                memcpy(ev->lladdr, RTA_DATA(rta), MAC_ADDRLEN);
+            }
+        }
+        return true;
+    }
 
-        VLOG_DBG("Updating port info for nbr cache dev %s",
-                cache_nbr->device);
-        cache_nbr->port = find_port(cache_nbr->device);
-        cache_nbr->vrf = find_port_vrf_in_cache(cache_nbr->device);
-
-        VLOG_DBG("cache %s mac %s family %s port %s vrf %s", cache_nbr->ip_address,
-                cache_nbr->mac, cache_nbr->network_family, cache_nbr->port->name, cache_nbr->vrf->name);
+    case RTM_NEWLINK:
+    case RTM_DELLINK: {
+        const struct ifinfomsg *ifi = NLMSG_DATA(nlh);
 
-        if (!idl_nbr) {
-            /* force insert here */
-            update_neighbor_to_ovsdb(cache_nbr, true);
-            idl_nbr_force_ins_cnt ++;
-        } else {
-            cache_nbr->nbr = idl_nbr;
-            if(idl_nbr->in_use_by_routes && (*(idl_nbr->in_use_by_routes) == true)) {
-                cache_nbr->routes_nh = true;
-                VLOG_INFO("routes_nh ip %s restored in cache in resync", cache_nbr->ip_address);
+        if (nlh->nlmsg_len < NLMSG_LENGTH(sizeof *ifi)) {
+            return false;
+        }
+        ev->ifindex = ifi->ifi_index;
+        rtalen = IFLA_PAYLOAD(nlh);
+        for (rta = IFLA_RTA(ifi); RTA_OK(rta, rtalen);
+             rta = RTA_NEXT(rta, rtalen)) {
+            if (rta->rta_type == IFLA_IFNAME) {
+                snprintf(ev->ifname, sizeof ev->ifname, "%.*s",
+                         (int) RTA_PAYLOAD(rta), (const char *) RTA_DATA(rta));
+                break;
             }
-            update_neighbor_to_ovsdb(cache_nbr, false);
         }
-        all_neighbors_len ++;
+        return true;
+    }
+
+    case NLMSG_ERROR: {
+        const struct nlmsgerr *err = NLMSG_DATA(nlh);
+
+        if (nlh->nlmsg_len < NLMSG_LENGTH(sizeof *err)) {
+            return false;
+        }
+        ev->error = err->error;
+        return true;
+    }
+
+    case NLMSG_DONE:
+        return true;
+
+    default:
+        return false;
+    }
+} /* nl_event_decode */
+
+/*
+ * Apply a decoded netlink message received on socket 'sock' of 'vrf'
+ * to the neighbor cache.
+ */
+static int
+nl_event_apply(struct vrf *vrf, int sock, const struct nl_event *ev)
+{
+    struct neighbor_data *cache_nbr = NULL;
+    char ifname[IF_NAMESIZE];
+
+    switch (ev->type) {
+    case RTM_NEWLINK:
+    case RTM_DELLINK:
+        nbr_stats_event(vrf, NULL, ev->type);
+        vrf_ifname_update(vrf, ev);
+        return 1;
+
+    case NLMSG_DONE:
+    case NLMSG_ERROR:
+        nbr_stats_event(vrf, NULL, ev->type);
+        nl_dump_done_msg(vrf, sock, ev);
+        return 1;
+
+    case NL_EVENT_OVERRUN:
+        nl_socket_overrun(vrf, sock, -ev->error);
+        return 1;
+    }
+
+    /* Anything queued after recovery dump replies is up to date */
+    if (vrf->dump_seq && ev->seq == vrf->dump_seq) {
+        vrf->dump_started = true;
+    }
+    if (ev->state & NUD_NOARP) {
+        return 1;
+    }
+    if (ev->family != AF_INET && ev->family != AF_INET6) {
+        return 1;
+    }
+
+    if (vrf_ifindextoname(vrf, ev->ifindex, ifname) != 0)
+      {
+        VLOG_ERR("Failed to get ifname");
+        return -1;
+      }
+    nbr_stats_event(vrf, shash_find_data(&all_ports, ifname), ev->type);
+
+    /* Ignore updates on "lo" interface */
+    if(!strcmp(ifname, LOOPBACK_INTERFACE_NAME)) {
+        return 1;
     }
 
     /*
-     * If current sync process of building cache from kernel failed
-     * let's not delete rows from OVSDB, since this will be expensive.
-     * Probably the rows never got update in our cache.
-     * We commit only any modified or new rows to OVSDB
+     * State, ifindex, family, ip and mac address populate
+     * neighbor cache.
      */
-    if (sync_state != SYNC_FAILED) {
-        /*
-         * Go over neighbors in ovsdb
-         * If neighbor is not in cache
-         * i) delete ovsdb rec
-         */
-        SHASH_FOR_EACH_SAFE(sh_node, sh_next, &idl_neighbors) {
-            struct neighbor_data *cache_nbr =
-                    shash_find_data(&all_neighbors, sh_node->name);
-            if (!cache_nbr) {
-                /* delete the ovsrec */
-                idl_nbr_force_del_cnt ++;
-                const struct ovsrec_neighbor *ovs_nbr = sh_node->data;
-                delete_nbr_from_ovsdb(ovs_nbr);
+    nl_event_cur = ev;
+    if (ev->type == RTM_NEWNEIGH) {
+        update_neighbor_cache(sock, ev, vrf, ifname, &cache_nbr);
+    } else if (ev->type == RTM_DELNEIGH) {
+        /* delete cache and ovsdb */
+        del_neighbor(ev, vrf);
+    }
+    nl_event_cur = NULL;
+
+    /*
+     * If a new neighbor was added/modified, OVSDB is updated
+     * once per iteration by flush_dirty_neighbors()
+     * */
+    if (cache_nbr) {
+        neighbor_mark_dirty(cache_nbr);
+        if (!cache_nbr->event_usec) {
+            cache_nbr->event_usec = ev->time_usec;
+        }
+        if (vrf->dump_started) {
+            cache_nbr->gen = vrf->dump_gen;
+        }
+    }
+    return 1;
+} /* nl_event_apply */
+
+/* Parse Netlink message */
+static int
+parse_nlmsg(struct vrf *vrf, int sock, struct nlmsghdr *nlh, int msglen,
+            long long int recv_usec)
+{
+    while (NLMSG_OK(nlh, msglen)) {
+        struct nl_event ev;
+
+        if (nl_event_decode(nlh, vrf->table_id, &ev)) {
+            ev.time_usec = recv_usec;
+            if (nl_event_apply(vrf, sock, &ev) < 0) {
+                return -1;
             }
         }
+        nlh = NLMSG_NEXT(nlh, msglen);
     }
-    shash_destroy(&idl_neighbors);
-    if (sync_state != SYNC_FAILED && sync_state != SYNC_REQUESTED) {
-        sync_state = SYNC_COMPLETE;
+    return 1;
+} /* parse_nlmsg */
+
+/* Allocate the receive ring on first use */
+static void
+nl_recv_ring_init(void)
+{
+    struct nl_recv_ring *ring = &nl_recv_ring;
+    int i;
+
+    if (ring->msgs) {
+        return;
     }
-    VLOG_DBG("%s: Sync state is %d", __func__, sync_state);
-} /* resync_db_with_kernel */
+
+    ring->batch = gbl_nl_recv_batch;
+    ring->buf_size = gbl_nl_recv_buf_size;
+    ring->msgs = xcalloc(ring->batch, sizeof *ring->msgs);
+    ring->iovs = xcalloc(ring->batch, sizeof *ring->iovs);
+    ring->addrs = xcalloc(ring->batch, sizeof *ring->addrs);
+    ring->bufs = xmalloc((size_t) ring->batch * ring->buf_size);
+
+    for (i = 0; i < ring->batch; i++) {
+        ring->iovs[i].iov_base = ring->bufs + (size_t) i * ring->buf_size;
+        ring->iovs[i].iov_len = ring->buf_size;
+        ring->msgs[i].msg_hdr.msg_iov = &ring->iovs[i];
+        ring->msgs[i].msg_hdr.msg_iovlen = 1;
+        ring->msgs[i].msg_hdr.msg_name = &ring->addrs[i];
+    }
+    VLOG_INFO("netlink receive ring: batch %d, buffer size %d",
+              ring->batch, ring->buf_size);
+} /* nl_recv_ring_init */
 
 /*
- * Parse the ND message attribute and fill cache entry
- * with IP address, family, mac, state, device
- * If entry is a new entry add to cache
+ * Receive messages on netlink socket.
+ * Datagrams are pulled in batches of up to 'gbl_nl_recv_batch' per
+ * recvmmsg() call, and at most 'gbl_nl_pkt_process_cnt_per_iter'
+ * datagrams are processed per call, except while resyncing with a
+ * reset cache, where the dump is read until its NLMSG_DONE.
  */
 static int
-update_neighbor_cache(int sock, struct ndmsg* ndm, struct rtattr* rta,
-                      const struct vrf *vrf, struct neighbor_data **cache_nbr)
+receive_neighbor_update(struct vrf *vrf, int sock)
 {
-    char destip[INET6_ADDRSTRLEN];
-    char destmac[MAC_ADDRSTRLEN];
-    struct shash_node *sh_node = NULL;
-    char buff[UUID_LEN+1] = {0};
-    bool dp_hit;
-    /* Kernel migh update first seen entry as STALE, externally added entry that are updated as stale need to be
-     * probed.so skip_dp_hit for them */
-    bool skip_dp_hit = false;
+    struct nl_recv_ring *ring = &nl_recv_ring;
+    int pkt_cnt = 0;
+    int lcl_nl_dump_res_size = 0;
+    int multipart_msg_end = 0;
+    long long int recv_usec;
 
-    if (rta->rta_type == NDA_DST) {
-        bool found = false;
-        char key[VRF_IP_KEY_MAX_LEN];
-        char dev[IF_NAMESIZE];
+    nl_recv_ring_init();
 
-        get_vrf_ns_from_table_id (idl, (int64_t)vrf->table_id, buff);
-        nl_if_indextoname(ndm->ndm_ifindex, dev, buff);
-        memset(destip, 0, sizeof(destip));
+    /*
+     * While resyncing with a reset cache the whole dump is read, up to
+     * NLMSG_DONE, before the cache is reconciled with OVSDB.
+     */
+    while (!multipart_msg_end
+           && (sync_mode == SYNC_WITH_CACHE_RESET
+               || pkt_cnt < gbl_nl_pkt_process_cnt_per_iter)) {
+        int vlen = ring->batch;
+        int flags;
+        int ret, i;
+
+        if (sync_mode != SYNC_WITH_CACHE_RESET) {
+            vlen = MIN(vlen, gbl_nl_pkt_process_cnt_per_iter - pkt_cnt);
+        }
 
-        if (ndm->ndm_family == AF_INET) {
-            uint32_t addr = ntohl(*(uint32_t *)RTA_DATA(rta));
+        for (i = 0; i < vlen; i++) {
+            ring->msgs[i].msg_hdr.msg_namelen = sizeof(struct sockaddr_nl);
+            ring->msgs[i].msg_hdr.msg_flags = 0;
+            ring->msgs[i].msg_len = 0;
+        }
 
-            /* Ignore multicast addresses */
-            if (IS_IPV4MULTICAST(addr))
-            {
-                VLOG_INFO("Received multicast addr %s, Ignoring", destip);
-                return 0;
+        /*
+         * While resyncing with a reset cache we wait for the dump,
+         * but only for the first datagram of each batch.
+         */
+        if(sync_mode == SYNC_WITH_CACHE_RESET) {
+            flags = MSG_WAITFORONE;
+        } else {
+            flags = MSG_DONTWAIT;
+        }
+        ret = recvmmsg(sock, ring->msgs, vlen, flags, NULL);
+        recv_usec = time_usec();
+        proc_stats.nl_recv_syscalls++;
+        VLOG_DBG("recvmmsg returned %d, nbr_alloc_cnt %d, port_data_alloc %d,",
+            ret,nbr_alloc_cnt, port_data_alloc);
+
+        if (ret < 0) {
+            if (errno != EAGAIN && errno != EWOULDBLOCK) {
+                nl_socket_overrun(vrf, sock, errno);
             }
+            return ret;
+        }
 
-            inet_ntop(AF_INET, RTA_DATA(rta), destip, INET_ADDRSTRLEN);
-        } else if (ndm->ndm_family == AF_INET6)   {
-            inet_ntop(AF_INET6, RTA_DATA(rta), destip, INET6_ADDRSTRLEN);
+        proc_stats.nl_recv_dgrams += ret;
+        proc_stats.nl_recv_batch_max = MAX(proc_stats.nl_recv_batch_max, ret);
+        if (ret == ring->batch) {
+            proc_stats.nl_recv_full_batches++;
         }
 
-        get_hash_key(vrf->name, destip, key);
-        sh_node = shash_find(&all_neighbors, key);
-        if (sh_node) {
-            *cache_nbr = sh_node->data;
-            if((*cache_nbr)->nbr_unresolved){
-                /*ovs_nbr entry already created and some fields alreay created others are filled here */
-                if(strcmp((*cache_nbr)->vrf_name, vrf->name)){
-                    VLOG_ERR("Configured VRF name %s is not matching with received %s.",
-                        (*cache_nbr)->vrf_name, vrf->name);
+        for (i = 0; i < ret; i++) {
+            struct nlmsghdr *nlh = ring->msgs[i].msg_hdr.msg_iov->iov_base;
+            int len = ring->msgs[i].msg_len;
+
+            if (ring->msgs[i].msg_hdr.msg_flags & MSG_TRUNC) {
+                static struct vlog_rate_limit rl = VLOG_RATE_LIMIT_INIT(1, 5);
+
+                VLOG_WARN_RL(&rl, "netlink datagram truncated to %d bytes, "
+                             "increase --nl-recv-buffer-size", len);
+                proc_stats.nl_recv_truncated++;
+            }
+            lcl_nl_dump_res_size += len;
+
+            switch (nlh->nlmsg_type) {
+
+            case RTM_NEWNEIGH:
+            case RTM_DELNEIGH:
+            case RTM_NEWLINK:
+            case RTM_DELLINK:
+                parse_nlmsg(vrf, sock, nlh, len, recv_usec);
+                break;
+
+            case NLMSG_ERROR: {
+                const struct nlmsgerr *err = NLMSG_DATA(nlh);
+
+                parse_nlmsg(vrf, sock, nlh, len, recv_usec);
+                /* Refused dump ends without NLMSG_DONE, keep OVSDB rows */
+                if (sync_mode == SYNC_WITH_CACHE_RESET
+                    && nlh->nlmsg_len >= NLMSG_LENGTH(sizeof *err)
+                    && err->error) {
+                    VLOG_ERR("Neighbor dump failed (%s)",
+                             strerror(-err->error));
+                    sync_state = SYNC_FAILED;
+                    multipart_msg_end++;
                 }
-                (*cache_nbr)->vrf = vrf;
-                strcpy((*cache_nbr)->device, dev);
-                (*cache_nbr)->ifindex = ndm->ndm_ifindex;
-                (*cache_nbr)->port = find_port(dev);
-                skip_dp_hit = true;
-                found = true;
-                goto end_chache_nbr_init;
+                break;
             }
-            /*This entry was triggered for delete, so all the fields are populated for it. Already ping in flight,
-            no need to for dp_hit probe.*/
-            else if((*cache_nbr)->revalidate_del){
-                skip_dp_hit = true;
-                goto end_chache_nbr_init;
+
+            case NLMSG_DONE:
+                parse_nlmsg(vrf, sock, nlh, len, recv_usec);
+                VLOG_DBG("End of multipart message\n");
+                multipart_msg_end++;
+                nl_dump_res_cnt++;
+                nl_dump_res_size = MAX(nl_dump_res_size, lcl_nl_dump_res_size);
+                lcl_nl_dump_res_size = 0;
+                break;
+
+            default:
+                VLOG_ERR("received nl msg_type %u", nlh->nlmsg_type);
+                break;
             }
-            else {
-                found = true;
+
+            if (!(nlh->nlmsg_flags & NLM_F_MULTI)) {
+                VLOG_DBG("end of message. Not a multipart message\n");
+                nl_dump_res_nof_multi_cnt++;
             }
         }
+        pkt_cnt += ret;
+
+        /* Socket is drained, unless the rest of a dump is waited for */
+        if (ret < vlen && sync_mode != SYNC_WITH_CACHE_RESET) {
+            break;
+        }
+    }
+    nl_dump_res_size = MAX(nl_dump_res_size, lcl_nl_dump_res_size);
+    return 0;
+} /* receive_neighbor_update */
+
+/*
+ * Replay of recorded netlink datagrams, enabled with --nl-replay.
+ * The file holds datagrams received on a neighbor socket, each one
+ * preceded by its length as a 32-bit integer in host byte order. Once
+ * the initial sync is done, they are applied to the default vrf as if
+ * received from the kernel, 'gbl_nl_pkt_process_cnt_per_iter' per
+ * iteration, which lets a benchmark drive the parse, cache and commit
+ * path against a stand-in OVSDB.
+ */
+static struct nl_replay {
+    FILE *file;
+    char *buf;
+    size_t buf_size;
+    uint64_t dgram_cnt;         /* Datagrams applied. */
+    long long int start;        /* Msec of first datagram, or 0. */
+    long long int end;          /* Msec of end of file, or 0. */
+    bool done;
+} nl_replay;
+
+static bool
+nl_replay_pending(void)
+{
+    return gbl_nl_replay_file && !nl_replay.done;
+} /* nl_replay_pending */
+
+static void
+nl_replay_finish(const char *error)
+{
+    struct nl_replay *r = &nl_replay;
+
+    if (error) {
+        VLOG_ERR("Replay of %s stopped: %s", gbl_nl_replay_file, error);
+    }
+    if (r->file) {
+        fclose(r->file);
+        r->file = NULL;
+    }
+    free(r->buf);
+    r->buf = NULL;
+    r->buf_size = 0;
+    r->end = time_msec();
+    r->done = true;
+    VLOG_INFO("Replayed %"PRIu64" datagrams in %lld ms", r->dgram_cnt,
+              r->start ? r->end - r->start : 0);
+} /* nl_replay_finish */
+
+/* Apply next recorded datagrams to the default vrf */
+static void
+nl_replay_run(void)
+{
+    struct nl_replay *r = &nl_replay;
+    struct vrf *vrf;
+    int n;
+
+    if (!nl_replay_pending() || sync_state != SYNC_NONE) {
+        return;
+    }
+    vrf = arpmgrd_vrf_find_by_table_id(0);
+    if (!vrf) {
+        return;
+    }
+
+    if (!r->file) {
+        r->file = fopen(gbl_nl_replay_file, "rb");
+        if (!r->file) {
+            nl_replay_finish(strerror(errno));
+            return;
+        }
+        r->start = time_msec();
+    }
+
+    for (n = 0; n < gbl_nl_pkt_process_cnt_per_iter; n++) {
+        uint32_t len;
+
+        if (fread(&len, sizeof len, 1, r->file) != 1) {
+            nl_replay_finish(ferror(r->file) ? "read error" : NULL);
+            return;
+        }
+        /* Not a datagram the kernel would send, file is corrupt */
+        if (len < sizeof(struct nlmsghdr) || len > RECV_BUFFER_SIZE_MAX) {
+            nl_replay_finish("bad datagram length");
+            return;
+        }
+        if (len > r->buf_size) {
+            r->buf_size = len;
+            r->buf = xrealloc(r->buf, r->buf_size);
+        }
+        if (fread(r->buf, len, 1, r->file) != 1) {
+            nl_replay_finish("truncated datagram");
+            return;
+        }
+        parse_nlmsg(vrf, arpmgrd_vrf_nl_sock(vrf), (struct nlmsghdr *) r->buf,
+                    len, time_usec());
+        r->dgram_cnt++;
+    }
+} /* nl_replay_run */
+
+/*
+ * Netlink reader thread, enabled with --nl-reader-thread.
+ *
+ * The reader receives on the netlink sockets in 'socks', decodes the
+ * messages with nl_event_decode() and hands them to the main thread
+ * over a single producer, single consumer ring. The main thread applies
+ * them with nl_event_apply(), so caches and IDL are only touched there.
+ * The reader only receives while a full datagram of events fits in the
+ * ring, otherwise the kernel keeps buffering for it.
+ *
+ * The default vrf socket opened for a resync with cache reset is left
+ * to the main thread, which receives the dump synchronously.
+ */
+struct nl_reader_sock {
+    int sock;
+    int64_t table_id;
+};
 
-        if (!found) {
-            VLOG_DBG("Adding new neighbor %s dev %s", destip, dev);
+struct nl_reader {
+    /* Ring, reader pushes at 'head', main thread pops at 'tail' */
+    struct nl_event *events;
+    uint32_t mask;                  /* Ring size - 1. */
+    uint32_t per_dgram;             /* Most events decoded from a datagram. */
+    atomic_uint32_t head;
+    atomic_uint32_t tail;
+    struct seq *event_seq;          /* Changed by reader after push. */
+    struct seq *space_seq;          /* Changed by main thread after pop. */
+
+    /* Sockets to receive on, the reader receives with 'mutex' held */
+    struct ovs_mutex mutex;
+    struct nl_reader_sock *socks OVS_GUARDED;
+    int n_socks OVS_GUARDED;
+    struct seq *socks_seq;          /* Changed on 'socks' update or exit. */
+    atomic_bool exiting;
+
+    pthread_t thread;
+    bool started;
+
+    /* Written by reader only */
+    atomic_uint64_t recv_cnt;
+    atomic_uint64_t event_cnt;
+    atomic_uint64_t full_cnt;       /* Times it waited for ring space. */
+    atomic_uint64_t trunc_cnt;
+    atomic_uint64_t overrun_cnt;
+};
 
-            *cache_nbr = add_neighbor_to_cache(vrf->name, destip);
+static struct nl_reader nl_reader = {
+    .mutex = OVS_MUTEX_INITIALIZER,
+};
+static uint64_t nl_reader_event_seqno;
+/* Default vrf events before 'nl_reader_drop_head' are dropped */
+static bool nl_reader_dropping;
+static uint32_t nl_reader_drop_head;
 
-            if (!(*cache_nbr)) {
-                VLOG_ERR("Unable to allocate a new neighbor.");
-                return 0;
-            }
+/* Increment a counter written by the reader thread only */
+static inline void
+nl_reader_count(atomic_uint64_t *cnt, uint64_t n)
+{
+    uint64_t value;
 
-            strcpy((*cache_nbr)->vrf_name, vrf->name);
-            (*cache_nbr)->vrf = vrf;
-            (*cache_nbr)->nbr = NULL;
-            strcpy((*cache_nbr)->ip_address, destip);
-            strcpy((*cache_nbr)->device, dev);
-            (*cache_nbr)->ifindex = ndm->ndm_ifindex;
-            (*cache_nbr)->port = find_port(dev);
-            strcpy((*cache_nbr)->mac, "");
-            if (ndm->ndm_family == AF_INET) {
-                strcpy((*cache_nbr)->network_family, OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4);
-            } else if (ndm->ndm_family == AF_INET6)   {
-                strcpy((*cache_nbr)->network_family, OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6);
-            }
+    atomic_read_explicit(cnt, &value, memory_order_relaxed);
+    atomic_store_explicit(cnt, value + n, memory_order_relaxed);
+} /* nl_reader_count */
 
-            (*cache_nbr)->nbr = NULL;
-        }
-end_chache_nbr_init:
-        switch (ndm->ndm_state) {
+static inline uint64_t
+nl_reader_counter(atomic_uint64_t *cnt)
+{
+    uint64_t value;
 
-        case NUD_REACHABLE:
-            strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_REACHABLE);
-            (*cache_nbr)->ping_retry_cnt = 0;
-            /*revalidatation is complete, db can be update after that*/
-            (*cache_nbr)->revalidate_del = 0;
-            break;
+    atomic_read_explicit(cnt, &value, memory_order_relaxed);
+    return value;
+} /* nl_reader_counter */
 
-        case NUD_STALE:
-            /* Send probe request to STALE neighbor and dp_hit set */
-            /* Set dp_hit default to be false */
-            dp_hit = false;
-            (*cache_nbr)->ping_retry_cnt = 0; // may be after ping from switch host entry cannot be stale.
-            (*cache_nbr)->revalidate_del = 0;
-            if ((!skip_dp_hit) && ((*cache_nbr)->nbr)) {
-                dp_hit = smap_get_bool(&(*cache_nbr)->nbr->status ,
-                         OVSDB_NEIGHBOR_STATUS_DP_HIT,
-                         OVSDB_NEIGHBOR_STATUS_MAP_DP_HIT_DEFAULT);
-            }
+/* Free slots in ring, seen from the reader */
+static uint32_t
+nl_reader_space(struct nl_reader *r, uint32_t head)
+{
+    uint32_t tail;
 
-            VLOG_DBG("dp hit state = %d ip %s", dp_hit, destip);
-            (*cache_nbr)->dp_hit = dp_hit;
-            if (sock &&
-               (dp_hit ||(!dbg_stop_nh_probe && (*cache_nbr)->routes_nh))) {
-                send_neighbor_probe(sock, ndm->ndm_ifindex, ndm->ndm_family,
-                    RTA_DATA(rta), RTA_PAYLOAD(rta));
-                /*
-                 * FIXME: Set state to reachable. Currently we are not receiving
-                 * Reachable state from Stale state. (Bug)
-)                 * If kernel is unable to resolve, we will get an explicit
-                 * notification for FAILED state
-                 */
-                strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_REACHABLE);
-            } else
-            {
-                strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_STALE);
-            }
-            break;
+    atomic_read_explicit(&r->tail, &tail, memory_order_acquire);
+    return r->mask + 1 - (head - tail);
+} /* nl_reader_space */
 
-        case NUD_FAILED:
-            VLOG_DBG("Neighbor resolution failed %s", destip);
-            (*cache_nbr)->revalidate_del = 0;
-            /*ping if the nbe is nh. no matter how it land up in this state.*/
-            if((*cache_nbr)->routes_nh && ((*cache_nbr)->ping_retry_cnt < MAX_NH_PING_CNT)) {
-                VLOG_ERR("pinging again for the in_use_by_route %s, destip = %s", (*cache_nbr)->ip_address, destip);
-                 if((*cache_nbr)->network_family){
-                     if(0 == strcmp((*cache_nbr)->network_family, OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4))
-                     {
-                        ping4((*cache_nbr)->ip_address);
-                     }
-                     else if(0 == strcmp((*cache_nbr)->network_family,OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6))
-                     {
-                        ping6((*cache_nbr)->ip_address);
-                     }
-                    strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_INCOMPLETE);
-                    strcpy((*cache_nbr)->mac, "");
-                    (*cache_nbr)->ping_retry_cnt ++;
-                    break;
-                }
-                else {
-                    VLOG_ERR("Address family not valid for in_use_routes entry %s",destip);
-                }
-            }
-            strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_FAILED);
-            strcpy((*cache_nbr)->mac, "");
-            break;
+/*
+ * Receive on 'rs' until it is drained, the ring has no room for another
+ * datagram or a batch is done. Returns true if the ring is full.
+ */
+static bool
+nl_reader_recv(struct nl_reader *r, const struct nl_reader_sock *rs,
+               char *buf, bool *more)
+{
+    uint32_t head;
+    int n;
 
-        case NUD_INCOMPLETE:
-            VLOG_DBG("Neighbor resolution incomplete %s", destip);
-            /* Don't change mac and state for entries that are being revalidated before deleting from DB. */
-            if(!(*cache_nbr)->revalidate_del){
-                strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_INCOMPLETE);
-                strcpy((*cache_nbr)->mac, "");
+    atomic_read_explicit(&r->head, &head, memory_order_relaxed);
+    for (n = 0; n < gbl_nl_pkt_process_cnt_per_iter; n++) {
+        const struct nlmsghdr *nlh;
+        long long int recv_usec;
+        ssize_t len;
+
+        if (nl_reader_space(r, head) < r->per_dgram) {
+            return true;
+        }
+
+        len = recv(rs->sock, buf, gbl_nl_recv_buf_size,
+                   MSG_DONTWAIT | MSG_TRUNC);
+        if (len < 0) {
+            if (errno == EINTR) {
+                continue;
             }
-            else {
-                VLOG_INFO("nbr %s is routes_nh, revalidating before deleting from DB", destip);
+            if (errno != EAGAIN && errno != EWOULDBLOCK) {
+                /* Let main thread recover, see nl_socket_overrun() */
+                struct nl_event *ev = &r->events[head & r->mask];
+
+                memset(ev, 0, sizeof *ev);
+                ev->table_id = rs->table_id;
+                ev->type = NL_EVENT_OVERRUN;
+                ev->error = -errno;
+                atomic_store_explicit(&r->head, ++head, memory_order_release);
+                nl_reader_count(&r->overrun_cnt, 1);
             }
-            break;
+            return false;
+        }
+        recv_usec = time_usec();
+        nl_reader_count(&r->recv_cnt, 1);
+        if (len > gbl_nl_recv_buf_size) {
+            nl_reader_count(&r->trunc_cnt, 1);
+            len = gbl_nl_recv_buf_size;
+        }
 
-        case NUD_PERMANENT:
-            strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_PERMANENT);
-            break;
+        for (nlh = (const struct nlmsghdr *) buf; NLMSG_OK(nlh, len);
+             nlh = NLMSG_NEXT(nlh, len)) {
+            struct nl_event *ev = &r->events[head & r->mask];
 
-        case NUD_DELAY:
-        case NUD_PROBE:
-        default:
-            (*cache_nbr)->revalidate_del = 0;
-            strcpy((*cache_nbr)->state, OVSREC_NEIGHBOR_STATE_REACHABLE);
+            if (nl_event_decode(nlh, rs->table_id, ev)) {
+                ev->time_usec = recv_usec;
+                head++;
+                nl_reader_count(&r->event_cnt, 1);
+            }
+        }
+        atomic_store_explicit(&r->head, head, memory_order_release);
+        seq_change(r->event_seq);
+    }
+    *more = true;
+    return false;
+} /* nl_reader_recv */
+
+static void *
+nl_reader_main(void *aux OVS_UNUSED)
+{
+    struct nl_reader *r = &nl_reader;
+    char *buf = xmalloc(gbl_nl_recv_buf_size);
+
+    for (;;) {
+        uint64_t socks_seqno = seq_read(r->socks_seq);
+        uint64_t space_seqno = seq_read(r->space_seq);
+        bool exiting, full = false, more = false;
+        int i;
+
+        atomic_read_explicit(&r->exiting, &exiting, memory_order_acquire);
+        if (exiting) {
             break;
+        }
 
+        ovs_mutex_lock(&r->mutex);
+        for (i = 0; i < r->n_socks && !full; i++) {
+            full = nl_reader_recv(r, &r->socks[i], buf, &more);
         }
-    } else if (rta->rta_type == NDA_LLADDR) {
-        /* Set MAC */
-        if (*cache_nbr) {
-            unsigned char *mac = RTA_DATA(rta);
-            sprintf(destmac, "%02x:%02x:%02x:%02x:%02x:%02x", mac[0],
-                    mac[1], mac[2], mac[3], mac[4],
-                    mac[5]);
-            strcpy((*cache_nbr)->mac, destmac);
+        if (!full) {
+            for (i = 0; i < r->n_socks; i++) {
+                poll_fd_wait(r->socks[i].sock, POLLIN);
+            }
+        }
+        ovs_mutex_unlock(&r->mutex);
+
+        if (full) {
+            nl_reader_count(&r->full_cnt, 1);
+            seq_wait(r->space_seq, space_seqno);
+        } else if (more) {
+            poll_immediate_wake();
         }
+        seq_wait(r->socks_seq, socks_seqno);
+        poll_block();
     }
-    return 1;
-} /* update_neighbor_cache */
+    free(buf);
+    return NULL;
+} /* nl_reader_main */
 
-/* Delete neighbor from cache and ovsdb */
-static int
-del_neighbor(struct ndmsg* ndm, struct rtattr* rta,
-             const struct vrf *vrf)
+/* Start reader thread on first use */
+static void
+nl_reader_start(void)
 {
-    const struct ovsrec_neighbor *ovs_nbr;
+    struct nl_reader *r = &nl_reader;
+    uint32_t size = 1;
 
-    if (ndm->ndm_family != AF_INET && ndm->ndm_family != AF_INET6) {
-        return -1;
+    if (r->started || !gbl_nl_reader_thread) {
+        return;
     }
 
-    if (rta->rta_type == NDA_DST) {
-            char destip[INET6_ADDRSTRLEN];
-            bool found = false;
+    /* Ring holds at least two datagrams of the smallest messages */
+    r->per_dgram = gbl_nl_recv_buf_size / NLMSG_LENGTH(sizeof(int));
+    while (size < gbl_nl_reader_ring || size < 2 * r->per_dgram) {
+        size <<= 1;
+    }
+    r->events = xmalloc(size * sizeof *r->events);
+    r->mask = size - 1;
+    atomic_init(&r->head, 0);
+    atomic_init(&r->tail, 0);
+    atomic_init(&r->exiting, false);
+    r->event_seq = seq_create();
+    r->space_seq = seq_create();
+    r->socks_seq = seq_create();
+    nl_reader_event_seqno = seq_read(r->event_seq);
+
+    r->thread = ovs_thread_create("nl_reader", nl_reader_main, NULL);
+    r->started = true;
+    VLOG_INFO("netlink reader thread started, ring size %d", (int) size);
+} /* nl_reader_start */
+
+/* Stop reader thread, before netlink sockets are closed */
+static void
+nl_reader_stop(void)
+{
+    struct nl_reader *r = &nl_reader;
 
-            memset(destip, 0, sizeof(destip));
+    if (!r->started) {
+        return;
+    }
+    atomic_store_explicit(&r->exiting, true, memory_order_release);
+    seq_change(r->socks_seq);
+    xpthread_join(r->thread, NULL);
+    r->started = false;
+
+    ovs_mutex_lock(&r->mutex);
+    free(r->socks);
+    r->socks = NULL;
+    r->n_socks = 0;
+    ovs_mutex_unlock(&r->mutex);
+    free(r->events);
+    seq_destroy(r->event_seq);
+    seq_destroy(r->space_seq);
+    seq_destroy(r->socks_seq);
+} /* nl_reader_stop */
+
+/* Whether reader thread receives on socket of default or other vrf */
+static bool
+nl_reader_owns(bool default_vrf)
+{
+    return nl_reader.started
+           && !(default_vrf && sync_mode == SYNC_WITH_CACHE_RESET);
+} /* nl_reader_owns */
 
-            if (ndm->ndm_family == AF_INET) {
-                inet_ntop(AF_INET, RTA_DATA(rta), destip, INET_ADDRSTRLEN);
-            } else if (ndm->ndm_family == AF_INET6) {
-                inet_ntop(AF_INET6, RTA_DATA(rta), destip, INET6_ADDRSTRLEN);
-            }
-            struct neighbor_data *cache_nbr = find_neighbor_in_cache(vrf->name, destip);
-            if(!cache_nbr){
-                VLOG_INFO("Unable to delete a neighbor %s, vrf %s that has entry in hash",destip, vrf->name);
-                return -1;
-            }
-            if(cache_nbr->routes_nh && (cache_nbr->ping_retry_cnt< MAX_NH_PING_CNT)) {
-                VLOG_INFO("Del notified for %s, but pinging again to keep it refreshed... ",destip);
-                if (ndm->ndm_family == AF_INET) {
-                    ping4(destip);
-                }
-                else if(ndm->ndm_family == AF_INET6) {
-                    ping6(destip);
-                }
-                cache_nbr->revalidate_del = true;
-                strcpy(cache_nbr->state, OVSREC_NEIGHBOR_STATE_INCOMPLETE);
-                cache_nbr->ping_retry_cnt++;
-                return 1;
-            }
+/*
+ * Stop receiving on 'sock' before it is closed. Once this returns,
+ * whatever was received on it is in the ring.
+ */
+static void
+nl_reader_sock_remove(int sock)
+{
+    struct nl_reader *r = &nl_reader;
+    int i;
 
-            OVSREC_NEIGHBOR_FOR_EACH (ovs_nbr, idl) {
-                if (!strcmp((ovs_nbr)->ip_address, destip) && ovs_nbr->vrf == vrf->cfg) {
-                    found = true;
-                    break;
-                }
-            }
+    if (!r->started) {
+        return;
+    }
+    ovs_mutex_lock(&r->mutex);
+    for (i = 0; i < r->n_socks; i++) {
+        if (r->socks[i].sock == sock) {
+            r->socks[i] = r->socks[--r->n_socks];
+            seq_change(r->socks_seq);
+            break;
+        }
+    }
+    ovs_mutex_unlock(&r->mutex);
+} /* nl_reader_sock_remove */
 
-            if(found) {
-                delete_nbr_from_ovsdb(ovs_nbr);
-                VLOG_DBG("Neighbor delete: %s\n",
-                       destip);
-            } else {
-                VLOG_ERR("Unable to find neighbor entry for %s in vrf %s. Cannot delete.", destip, vrf->name);
-            }
+/* Hand reader the sockets of vrfs it owns */
+static void
+nl_reader_update_socks(void)
+{
+    struct nl_reader *r = &nl_reader;
+    struct nl_reader_sock *socks;
+    struct shash_node *vrf_node;
+    bool changed;
+    int n_socks = 0;
+    int i;
 
-            delete_neighbor_from_cache(vrf->name, destip);
+    nl_reader_start();
+    if (!r->started) {
+        return;
     }
-    return 1;
-} /* del_neighbor */
 
-/* Parse Netlink message */
-static int
-parse_nlmsg(struct vrf *vrf, int sock, struct nlmsghdr *nlh, int msglen)
-{
-    struct rtattr *rta;
-    struct ndmsg *ndm;
-    char  buff[UUID_LEN+1] = {0};
-    int rtalen;
+    socks = xmalloc(MAX(shash_count(&all_vrfs), 1) * sizeof *socks);
+    SHASH_FOR_EACH (vrf_node, &all_vrfs) {
+        struct vrf *vrf = vrf_node->data;
+        int sock = arpmgrd_vrf_nl_sock(vrf);
 
-    while (NLMSG_OK(nlh, msglen)) {
-        ndm = (struct ndmsg *) NLMSG_DATA(nlh);
-        rta = (struct rtattr *)NDA_RTA(ndm);
+        if (sock > 0 && nl_reader_owns(arpmgrd_vrf_is_default(vrf))) {
+            socks[n_socks].sock = sock;
+            socks[n_socks].table_id = vrf->table_id;
+            n_socks++;
+        }
+    }
 
-        rtalen = NDA_PAYLOAD(nlh);
-        if (!(ndm->ndm_state & NUD_NOARP)) {
-            struct neighbor_data *cache_nbr = NULL;
-            char ifname[IF_NAMESIZE];
+    ovs_mutex_lock(&r->mutex);
+    changed = n_socks != r->n_socks;
+    for (i = 0; i < n_socks && !changed; i++) {
+        changed = (socks[i].sock != r->socks[i].sock
+                   || socks[i].table_id != r->socks[i].table_id);
+    }
+    if (changed) {
+        free(r->socks);
+        r->socks = socks;
+        r->n_socks = n_socks;
+        socks = NULL;
+        seq_change(r->socks_seq);
+    }
+    ovs_mutex_unlock(&r->mutex);
+    free(socks);
+} /* nl_reader_update_socks */
 
-            if (ndm->ndm_family != AF_INET && ndm->ndm_family != AF_INET6) {
-                goto ndm_done;
-            }
+/*
+ * Neighbor cache is reset, drop what reader received from the default
+ * vrf socket until now.
+ */
+static void
+nl_reader_discard_default(void)
+{
+    if (!nl_reader.started) {
+        return;
+    }
+    /* Reader is done with default vrf socket once this returns */
+    nl_reader_update_socks();
+    atomic_read_explicit(&nl_reader.head, &nl_reader_drop_head,
+                         memory_order_acquire);
+    nl_reader_dropping = true;
+} /* nl_reader_discard_default */
+
+static struct vrf *
+arpmgrd_vrf_find_by_table_id(int64_t table_id)
+{
+    struct vrf *vrf;
 
-             get_vrf_ns_from_table_id (idl, (int64_t)vrf->table_id, buff);
+    HMAP_FOR_EACH_WITH_HASH (vrf, table_id_node, hash_int(table_id, 0),
+                             &all_vrfs_by_table_id) {
+        if (vrf->table_id == table_id) {
+            return vrf;
+        }
+    }
+    return NULL;
+} /* arpmgrd_vrf_find_by_table_id */
 
-            if (nl_if_indextoname(ndm->ndm_ifindex, ifname, buff) != 0)
-              {
-                VLOG_ERR("Failed to get ifname");
-                return -1;
-              }
+/* Apply events queued by reader thread */
+static void
+nl_reader_consume(void)
+{
+    struct nl_reader *r = &nl_reader;
+    uint32_t head, tail;
 
-            /* Ignore updates on "lo" interface */
-            if(!strcmp(ifname, LOOPBACK_INTERFACE_NAME)) {
-                goto ndm_done;
-            }
+    if (!r->started) {
+        return;
+    }
 
+    nl_reader_event_seqno = seq_read(r->event_seq);
+    atomic_read_explicit(&r->head, &head, memory_order_acquire);
+    atomic_read_explicit(&r->tail, &tail, memory_order_relaxed);
+    if (head == tail) {
+        return;
+    }
+    proc_stats.reader_pending_max = MAX(proc_stats.reader_pending_max,
+                                        head - tail);
 
-            /*
-             * State, ifindex, family is populated from 'ndm'
-             * Go through each of the Attributes in NDM and populate
-             * neighbor cache for IP addr and Mac address.
-             * We will extract info from NDA_DST (ip address),
-             * and NDA_LLADDR (MAC address) attributes.
-             *
-             */
-            for (; RTA_OK(rta, rtalen); rta = RTA_NEXT(rta, rtalen)) {
-                if (nlh->nlmsg_type == RTM_NEWNEIGH) {
-                    update_neighbor_cache(sock, ndm, rta, vrf, &cache_nbr);
-                } else if (nlh->nlmsg_type == RTM_DELNEIGH) {
-                    /* delete cache and ovsdb */
-                    del_neighbor(ndm, rta, vrf);
-                }
-            }
+    for (; tail != head; tail++) {
+        const struct nl_event *ev = &r->events[tail & r->mask];
+        struct vrf *vrf;
 
-            /*
-             * If a new neighbor was added/modified, lets update OVSDB
-             * */
-            if (cache_nbr &&
-                !(cache_nbr->revalidate_del)) {
-                update_neighbor_to_ovsdb(cache_nbr, false);
-            }
+        if (nl_reader_dropping && tail == nl_reader_drop_head) {
+            nl_reader_dropping = false;
+        }
+        vrf = arpmgrd_vrf_find_by_table_id(ev->table_id);
+        if (!vrf || (nl_reader_dropping && arpmgrd_vrf_is_default(vrf))) {
+            proc_stats.reader_dropped++;
+            continue;
         }
+        if (ev->type == NLMSG_DONE) {
+            nl_dump_res_cnt++;
+        }
+        nl_event_apply(vrf, arpmgrd_vrf_nl_sock(vrf), ev);
+        proc_stats.reader_applied++;
+    }
+    if (nl_reader_dropping && tail == nl_reader_drop_head) {
+        nl_reader_dropping = false;
+    }
+    atomic_store_explicit(&r->tail, tail, memory_order_release);
+    seq_change(r->space_seq);
+} /* nl_reader_consume */
 
-ndm_done:
-        nlh = NLMSG_NEXT(nlh, msglen);
+/* Wake up when reader queued events */
+static void
+nl_reader_wait(void)
+{
+    if (nl_reader.started) {
+        seq_wait(nl_reader.event_seq, nl_reader_event_seqno);
     }
-    return 1;
-} /* parse_nlmsg */
+} /* nl_reader_wait */
 
-/* Receive message on netlink socket */
-static int
-receive_neighbor_update(struct vrf *vrf, int sock)
+/* A probe waits for tokens of 'tb', note when they are there */
+static void
+probe_tb_defer(const struct token_bucket *tb)
 {
-    int pkt_cnt = 0;
-    int lcl_nl_dump_res_size = 0;
-    int multipart_msg_end = 0;
-    while (pkt_cnt < gbl_nl_pkt_process_cnt_per_iter){
-        lcl_nl_dump_res_size = 0;
-        while (!multipart_msg_end) {
-            struct sockaddr_nl nladdr;
-            struct msghdr msg;
-            struct iovec iov;
-            struct nlmsghdr *nlh;
-            char buffer[RECV_BUFFER_SIZE];
-            int ret;
-
-            iov.iov_base = (void *)buffer;
-            iov.iov_len = sizeof(buffer);
-            msg.msg_name = (void *)&(nladdr);
-            msg.msg_namelen = sizeof(nladdr);
-            msg.msg_iov = &iov;
-            msg.msg_iovlen = 1;
+    long long int ready = tb->last_fill
+                          + (PROBE_TOKENS - tb->tokens + tb->rate - 1)
+                            / tb->rate;
 
-            if(sync_mode == SYNC_WITH_CACHE_RESET) {
-                ret = recvmsg(sock, &msg, 0);
-            } else {
-                ret = recvmsg(sock, &msg, MSG_DONTWAIT);
-            }
-            VLOG_DBG("recvmsg returned %d, nbr_alloc_cnt %d, port_data_alloc %d,",
-                ret,nbr_alloc_cnt, port_data_alloc);
+    probe_sched_next = MIN(probe_sched_next, ready);
+} /* probe_tb_defer */
 
-            if (ret < 0) {
-                if (errno != EAGAIN && errno != EWOULDBLOCK) {
-                    VLOG_ERR("err = %s ,sync_state %d, nbr_alloc_cnt %d, port_data_alloc %d, \n \
-    ovsrec_neighbor_alloc_cnt %d, force_ins_cnt %d force_del_cnt %d, ovs_idl_nbr_cnt %d,all_neighbors_len %d \n",
-                    strerror(errno),sync_state,nbr_alloc_cnt,
-                    port_data_alloc,ovsrec_neighbor_alloc_cnt,
-                    idl_nbr_force_ins_cnt,idl_nbr_force_del_cnt,ovs_idl_nbr_cnt,
-                    all_neighbors_len);
-                    VLOG_ERR("nl_dump_req_cnt %d, nl_dump_res_cnt %d, not_multi_part_dump_res_cnt %d \n\
-    nl_probe_req_cnt %d, nl_dump_res_size %d, ovsdb_tr_trigger_cnt %d",
-    nl_dump_req_cnt,nl_dump_res_cnt, nl_dump_res_nof_multi_cnt,
-    nl_probe_req_cnt, nl_dump_res_size,
-    ovsdb_tr_trigger_cnt);
-                    /* Kernel messages could be overwhelming,
-                       suspend receive temporarily */
-                    if(sync_state == SYNC_NONE) {
-                        sync_mode = SYNC_WITH_CACHE_RESET;
-                        sync_state = SYNC_REQUESTED;
-                    }
-                    else {
-                        sync_state = SYNC_FAILED;
-                    }
-                }
-                return ret;
-            }
-            lcl_nl_dump_res_size += ret;
-            nlh = (struct nlmsghdr*) buffer;
+/*
+ * Send probe request 'req' if rate limits allow. Returns false if it
+ * has to wait for tokens.
+ */
+static bool
+probe_sched_send(const struct probe_req *req)
+{
+    struct neighbor_data *cache_nbr = find_neighbor_in_cache(&req->key);
+    struct token_bucket *port_tb = NULL;
+    struct vrf *vrf;
+    int sock;
 
-            switch (nlh->nlmsg_type) {
+    vrf = arpmgrd_vrf_find_by_table_id(req->key.vrf_id);
+    sock = vrf ? arpmgrd_vrf_nl_sock(vrf) : 0;
+    if (!cache_nbr || cache_nbr->ifindex <= 0 || sock <= 0) {
+        proc_stats.probes_dropped++;
+        return true;
+    }
 
-            case RTM_NEWNEIGH:
-            case RTM_DELNEIGH:
-                parse_nlmsg(vrf, sock, nlh, ret);
-                break;
+    /* Buckets that refused a probe in this pass are not asked again */
+    if (vrf->probe_pass == probe_pass) {
+        return false;
+    }
+    if (gbl_probe_port_rate && cache_nbr->port_data) {
+        if (cache_nbr->port_data->probe_pass == probe_pass) {
+            return false;
+        }
+        port_tb = &cache_nbr->port_data->probe_tb;
+    }
 
-            case NLMSG_DONE:
-                VLOG_DBG("End of multipart message\n");
-                multipart_msg_end++;
-                nl_dump_res_cnt++;
-                break;
+    if (gbl_probe_rate
+        && !token_bucket_withdraw(&vrf->probe_tb, PROBE_TOKENS)) {
+        probe_tb_defer(&vrf->probe_tb);
+        vrf->probe_pass = probe_pass;
+        probe_vrfs_refused++;
+        return false;
+    }
+    if (port_tb && !token_bucket_withdraw(port_tb, PROBE_TOKENS)) {
+        /* Give back vrf token, this probe is not sent */
+        vrf->probe_tb.tokens = MIN(vrf->probe_tb.tokens + PROBE_TOKENS,
+                                   vrf->probe_tb.burst);
+        probe_tb_defer(port_tb);
+        cache_nbr->port_data->probe_pass = probe_pass;
+        return false;
+    }
 
-            default:
-                VLOG_ERR("received nl msg_type %u", nlh->nlmsg_type);
-                break;
-            }
+    send_neighbor_probe(sock, cache_nbr->ifindex, req->key.family,
+                        (void *) req->key.addr,
+                        req->key.family == AF_INET6 ? 16 : 4);
+    proc_stats.probes_sent++;
+    NBR_STATS_ADD(vrf, cache_nbr->port_data, probes, 1);
+    return true;
+} /* probe_sched_send */
 
-            if (!(nlh->nlmsg_flags & NLM_F_MULTI)) {
-                VLOG_DBG("end of message. Not a multipart message\n");
-                nl_dump_res_nof_multi_cnt++;
-                break;
+/*
+ * Send queued probes, next hops first, as rate limits allow.
+ * Requests that have to wait stay where they are. The pass ends once
+ * the bucket of every vrf has refused a probe.
+ */
+static void
+probe_sched_run(void)
+{
+    size_t n_vrfs = shash_count(&all_vrfs);
+    int prio;
+
+    probe_sched_next = LLONG_MAX;
+    if (hmap_is_empty(&probe_reqs)) {
+        return;
+    }
+
+    if (!++probe_pass) {
+        probe_pass++;
+    }
+    probe_vrfs_refused = 0;
+    for (prio = 0; prio < PROBE_N_PRIOS; prio++) {
+        struct probe_queue *q = &probe_queues[prio];
+        size_t i;
+
+        for (i = 0; i < q->n && probe_vrfs_refused < n_vrfs; i++) {
+            struct probe_req *req = q->reqs[i];
+
+            if (req && probe_sched_send(req)) {
+                probe_queue_remove(req);
+                hmap_remove(&probe_reqs, &req->node);
+                free(req);
             }
         }
-        nl_dump_res_size = (nl_dump_res_size > lcl_nl_dump_res_size)? nl_dump_res_size : lcl_nl_dump_res_size;
-        pkt_cnt ++;
+        if (!q->n_reqs) {
+            q->n = 0;
+        } else if (q->n_reqs < q->n / 2) {
+            probe_queue_compact(q);
+        }
     }
-    return 0;
-} /* receive_neighbor_update */
+    proc_stats.probes_deferred += hmap_count(&probe_reqs);
+} /* probe_sched_run */
+
+static void
+probe_sched_wait(void)
+{
+    if (hmap_is_empty(&probe_reqs)) {
+        return;
+    }
+    if (probe_sched_next == LLONG_MAX) {
+        poll_immediate_wake();
+    } else {
+        poll_timer_wait_until(probe_sched_next);
+    }
+} /* probe_sched_wait */
 
 /* OVSDB Utils */
 
 /*
  * Return Port from port name.
+ * Port cache is kept in sync with IDL by arpmgrd_reconfigure_port().
  */
 const struct ovsrec_port
 *find_port(const char *port_name)
 {
-    const struct ovsrec_port *ovs_port;
-    OVSREC_PORT_FOR_EACH (ovs_port, idl) {
-        if (strcmp(ovs_port->name, port_name) == 0) {
-            return ovs_port;
-        }
-    }
-    return NULL;
+    const struct port_data *port_cache = shash_find_data(&all_ports,
+                                                         port_name);
+
+    return port_cache ? port_cache->port : NULL;
 } /* find_port */
 
 /*
@@ -1072,20 +4439,7 @@ const struct ovsrec_port
 static struct vrf
 *find_port_vrf_in_cache(const char *port_name)
 {
-  struct shash_node *vrf_node = NULL;
-  struct shash_node *port_node = NULL;
-
-  SHASH_FOR_EACH(vrf_node, &all_vrfs) {
-       struct vrf *vrf = vrf_node->data;
-       SHASH_FOR_EACH(port_node,
-                             &vrf->ports) {
-        if (!strcmp(port_node->name, port_name)) {
-            return vrf;
-        }
-     }
-  }
-
-   return NULL;
+    return shash_find_data(&all_port_vrfs, port_name);
 } /* find_port_vrf_in_cache */
 
 /*
@@ -1121,6 +4475,22 @@ arpmgrd_vrf_lookup(const char *uuid)
 }
 
 
+/* Remove ports of a vrf, and their port to vrf mapping */
+static void
+arpmgrd_vrf_del_ports(struct vrf *vrf)
+{
+    struct shash_node *node;
+
+    SHASH_FOR_EACH (node, &vrf->ports) {
+        struct shash_node *port_vrf = shash_find(&all_port_vrfs, node->name);
+
+        if (port_vrf && port_vrf->data == vrf) {
+            shash_delete(&all_port_vrfs, port_vrf);
+        }
+    }
+    shash_clear(&vrf->ports);
+} /* arpmgrd_vrf_del_ports */
+
 /* delete vrf from cache */
 static void
 arpmgrd_vrf_del(struct shash_node *sh_node)
@@ -1133,8 +4503,20 @@ arpmgrd_vrf_del(struct shash_node *sh_node)
             VLOG_DBG("Deleting vrf '%s'",vrf->name);
 
             shash_delete(&all_vrfs, sh_node);
+            hmap_remove(&all_vrfs_by_table_id, &vrf->table_id_node);
+            arpmgrd_vrf_del_ports(vrf);
             shash_destroy(&vrf->ports);
-            close(vrf->nl_sock);
+            vrf_ifname_flush(vrf);
+            hmap_destroy(&vrf->ifnames);
+            nl_dump_queue_clear(vrf);
+            hmap_destroy(&vrf->dump_reqs);
+            /* Default vrf socket is owned by nl_neighbor_sock */
+            if (!arpmgrd_vrf_is_default(vrf) && vrf->nl_sock > 0) {
+                close_netlink_socket(vrf->nl_sock);
+            }
+            if (vrf->probe_sock > 0) {
+                close(vrf->probe_sock);
+            }
             free(vrf->name);
             free(vrf);
         }
@@ -1147,11 +4529,11 @@ arpmgrd_vrf_add_ports(struct vrf *vrf, const struct ovsrec_vrf *vrf_row)
 {
     int i;
 
-    shash_destroy(&vrf->ports);
-    shash_init(&vrf->ports);
+    arpmgrd_vrf_del_ports(vrf);
     for (i = 0; i < vrf_row->n_ports; i++) {
         const char *name = vrf_row->ports[i]->name;
         shash_add_once(&vrf->ports, name, vrf_row->ports[i]);
+        shash_replace(&all_port_vrfs, name, vrf);
         VLOG_DBG("Added port '%s' in vrf '%s'", vrf_row->ports[i]->name,
                                                 vrf_row->name);
     }
@@ -1175,7 +4557,7 @@ arpmgrd_vrf_add(const struct ovsrec_vrf *vrf_row)
         vrf->table_id = *vrf->cfg->table_id;
         get_vrf_ns_from_table_id (idl, (int64_t)vrf->table_id, buff);
         netlink_socket_open((const char*)buff, &(vrf->nl_sock),
-                             NETLINK_ROUTE, RTMGRP_NEIGH);
+                             NETLINK_ROUTE, RTMGRP_NEIGH | RTMGRP_LINK);
     }
     else
     {
@@ -1184,7 +4566,12 @@ arpmgrd_vrf_add(const struct ovsrec_vrf *vrf_row)
     }
 
     shash_init(&vrf->ports);
+    hmap_init(&vrf->ifnames);
+    hmap_init(&vrf->dump_reqs);
+    probe_tb_init(&vrf->probe_tb, gbl_probe_rate);
     shash_add_once(&all_vrfs, (const char*)buff, vrf);
+    hmap_insert(&all_vrfs_by_table_id, &vrf->table_id_node,
+                hash_int(vrf->table_id, 0));
 
     VLOG_DBG("Added vrf '%s'", vrf_row->name);
      arpmgrd_vrf_add_ports(vrf, vrf_row);
@@ -1304,6 +4691,9 @@ arpmgrd_init(const char *remote)
     ovsdb_idl_omit_alert(idl, &ovsrec_neighbor_col_state);
     ovsdb_idl_add_column(idl, &ovsrec_neighbor_col_status);
     ovsdb_idl_add_column(idl, &ovsrec_neighbor_col_in_use_by_routes);
+    /* Track inserted and deleted Neighbor rows for the row index */
+    ovsdb_idl_track_add_column(idl, &ovsrec_neighbor_col_status);
+    ovsdb_idl_track_add_column(idl, &ovsrec_neighbor_col_in_use_by_routes);
 
     ovsdb_idl_add_table(idl, &ovsrec_table_vrf);
     ovsdb_idl_add_column(idl, &ovsrec_vrf_col_name);
@@ -1315,16 +4705,25 @@ arpmgrd_init(const char *remote)
     ovsdb_idl_add_column(idl, &ovsrec_port_col_name);
     ovsdb_idl_add_column(idl, &ovsrec_port_col_admin);
     ovsdb_idl_add_column(idl, &ovsrec_port_col_ip4_address);
+    /* Track Port rows for incremental port reconfiguration */
+    ovsdb_idl_track_add_column(idl, &ovsrec_port_col_admin);
+    ovsdb_idl_track_add_column(idl, &ovsrec_port_col_ip4_address);
 
     unixctl_command_register("arpmgrd/dump", "", 0, 0,
             arpmgrd_unixctl_debug_cnt, NULL);
+    unixctl_command_register("arpmgrd/latency", "[json] [reset]", 0, 2,
+                             arpmgrd_unixctl_latency, NULL);
+    unixctl_command_register("arpmgrd/stats", "", 0, 0,
+                             arpmgrd_unixctl_stats, NULL);
 
     nl_neighbor_sock = 0;
+    nh_timer_wheel_init();
 } /* arpmgrd_init */
 
 static void
 arpmgrd_exit(void)
 {
+    nl_reader_stop();
     close_netlink_socket(nl_neighbor_sock);
     ovsdb_idl_destroy(idl);
 } /* arpmgrd_exit */
@@ -1333,226 +4732,266 @@ static void
 arpmgrd_run__(void)
 {
     struct shash_node *vrf_node = NULL;
+
+    /* Apply what reader thread received, if any */
+    nl_reader_update_socks();
+    nl_reader_consume();
+
     /* Receive Neighbor updates over netlink */
     SHASH_FOR_EACH(vrf_node, &all_vrfs) {
         struct vrf *vrf = vrf_node->data;
-        if (vrf->nl_sock > 0) {
-             receive_neighbor_update(vrf, vrf->nl_sock);
+        int sock = arpmgrd_vrf_nl_sock(vrf);
+        nl_dump_queue_run(vrf, sock);
+        if (sock > 0 && !nl_reader_owns(arpmgrd_vrf_is_default(vrf))) {
+             receive_neighbor_update(vrf, sock);
         }
     }
 } /* arpmgrd_run__ */
 
-/*
- * Look for added or deleted ports
- * - For added ports see if any neighbor was found on the port, update the neighbor's
- *   ovsdb port
- * - For deleted ports, delete all neighbors on the port.
- */
-static void
-arpmgrd_reconfigure_port(struct ovsdb_idl *idl)
-{
 #define DEFAULT_IPV4_ADD "0.0.0.0"
-    struct shash sh_idl_ports;
-    const struct ovsrec_port *first_row, *row;
-    struct shash_node *sh_port, *sh_port_next;
-    struct shash_node *sh_nbr, *sh_nbr_next;
 
-    first_row = ovsrec_port_first(idl);
+static struct port_data *
+port_cache_find_by_uuid(const struct uuid *uuid)
+{
+    struct port_data *port_cache;
 
-    if (!first_row) {
-        return;
+    HMAP_FOR_EACH_WITH_HASH (port_cache, uuid_node, uuid_hash(uuid),
+                             &all_ports_by_uuid) {
+        if (uuid_equals(&port_cache->uuid, uuid)) {
+            return port_cache;
+        }
     }
+    return NULL;
+} /* port_cache_find_by_uuid */
 
-    /*
-     * Check if any port rows were added or deleted.
-     * If no change just return from here
-     */
-    if (first_row && !OVSREC_IDL_ANY_TABLE_ROWS_INSERTED(first_row, idl_seqno) &&
-        !OVSREC_IDL_ANY_TABLE_ROWS_DELETED(first_row, idl_seqno) &&
-        !OVSREC_IDL_ANY_TABLE_ROWS_MODIFIED(first_row, idl_seqno)) {
-        VLOG_DBG("No port cfg changes");
-        return;
+/* Port row deleted, remove its neighbors from DB and cache */
+static void
+port_cache_del(struct port_data *port_cache)
+{
+    struct neighbor_data *nbr_cache, *nbr_next;
+
+    VLOG_INFO("Port %s deleted r not part of VRF", port_cache->sh_node->name);
+
+    /* Go though neighbors and remove neighbors with this port from DB
+     * Cache will be updated by kernel */
+    HMAP_FOR_EACH_SAFE (nbr_cache, nbr_next, port_node,
+                        &port_cache->neighbors) {
+        delete_cache_nbr_from_ovsdb(nbr_cache);
+
+        /* Delete the neighbor from cache */
+        delete_neighbor_from_cache(nbr_cache);
     }
+    hmap_destroy(&port_cache->neighbors);
 
-    /* Collect all the ports in the DB. */
-    shash_init(&sh_idl_ports);
+    hmap_remove(&all_ports_by_uuid, &port_cache->uuid_node);
+    shash_delete(&all_ports, port_cache->sh_node);
+    free(port_cache);
+    port_data_alloc --;
+} /* port_cache_del */
 
-    OVSREC_PORT_FOR_EACH (row, idl) {
-        if (!shash_add_once(&sh_idl_ports, row->name, row)) {
-            VLOG_WARN("port %s specified twice in IDL", row->name);
-        }
+/*
+ * Port row inserted again for a cached port, as after an ovsdb-server
+ * reconnect. Point the cache and its neighbors at the new row.
+ */
+static void
+port_cache_refresh(struct port_data *port_cache,
+                   const struct ovsrec_port *port_row)
+{
+    struct neighbor_data *nbr_cache;
+
+    VLOG_DBG("Port %s row refreshed", port_row->name);
+    port_cache->del_pending = false;
+    if (!uuid_equals(&port_cache->uuid, &port_row->header_.uuid)) {
+        hmap_remove(&all_ports_by_uuid, &port_cache->uuid_node);
+        port_cache->uuid = port_row->header_.uuid;
+        hmap_insert(&all_ports_by_uuid, &port_cache->uuid_node,
+                    uuid_hash(&port_cache->uuid));
     }
+    port_cache->port = port_row;
+    HMAP_FOR_EACH (nbr_cache, port_node, &port_cache->neighbors) {
+        nbr_cache->port = port_row;
+    }
+    port_cache_update(port_cache, port_row);
+} /* port_cache_refresh */
 
-    /* Delete old ports which got deleted or got deleted and inserted */
-    if (OVSREC_IDL_ANY_TABLE_ROWS_DELETED(first_row, idl_seqno)) {
-        SHASH_FOR_EACH_SAFE (sh_port, sh_port_next, &all_ports) {
-            struct ovsrec_port *port_row = shash_find_data(&sh_idl_ports, sh_port->name);
-            struct port_data *port_cache =  sh_port->data;
+/* Port row inserted, returns false if it was not added to cache */
+static bool
+port_cache_add(const struct ovsrec_port *port_row)
+{
+    struct port_data *new_port = NULL;
 
-            if (!port_row || OVSREC_IDL_IS_ROW_INSERTED(port_row, idl_seqno)) {
-                VLOG_INFO("Port %s deleted r not part of VRF", sh_port->name);
+    new_port = port_cache_find_by_uuid(&port_row->header_.uuid);
+    if (!new_port) {
+        new_port = shash_find_data(&all_ports, port_row->name);
+    }
+    if (new_port) {
+        port_cache_refresh(new_port, port_row);
+        return false;
+    }
 
-                /* Go though neighbors and remove neighbors with this port from DB
-                 * Cache will be updated by kernel */
-                SHASH_FOR_EACH_SAFE (sh_nbr, sh_nbr_next, &all_neighbors) {
-                    struct neighbor_data *nbr_cache = sh_nbr->data;
+    /* Allocate structure to save state information for this port. */
+    new_port = xzalloc(sizeof(struct port_data));
+    port_data_alloc++;
+
+    new_port->sh_node = shash_add(&all_ports, port_row->name, new_port);
+    new_port->uuid = port_row->header_.uuid;
+    hmap_insert(&all_ports_by_uuid, &new_port->uuid_node,
+                uuid_hash(&new_port->uuid));
+    new_port->port = port_row;
+    hmap_init(&new_port->neighbors);
+    probe_tb_init(&new_port->probe_tb, gbl_probe_port_rate);
+    neighbor_port_adopt(new_port, port_row->name);
+    /*setting up default value for ipv4_address */
+    strcpy(new_port->ipv4_address, DEFAULT_IPV4_ADD);
+    strcpy(new_port->admin, PORT_CONFIG_ADMIN_DOWN);
+    /*Storing incoming ip4 info and admin for the created port */
+    if (port_row->ip4_address)
+        strncpy(new_port->ipv4_address, port_row->ip4_address, INET_ADDRSTRLEN);
+    if(port_row->admin)
+        strncpy(new_port->admin, port_row->admin, 32);
+    /* May be moved to VLOG_DBG */
+    VLOG_INFO("New port %s added. ip %s admin %s", port_row->name, new_port->ipv4_address, new_port->admin);
+    struct vrf* vrf = find_port_vrf_in_cache(port_row->name);
+    if (!vrf) {
+        vrf = arpmgrd_vrf_default();
+    }
 
-                    if (nbr_cache->device && sh_port->name
-                        && !strcmp(nbr_cache->device, sh_port->name)) {
-                        delete_cache_nbr_from_ovsdb(nbr_cache);
+    /* Ask kernel for any existing neighbors on this PORT */
+    if (vrf) {
+        int ifindex = vrf_ifnametoindex(vrf, port_row->name);
 
-                        /* Delete the neighbor from cache */
-                        shash_delete(&all_neighbors, sh_nbr);
+        nl_dump_queue_add(vrf, ifindex, AF_INET);
+        nl_dump_queue_add(vrf, ifindex, AF_INET6);
+    }
+    return true;
+} /* port_cache_add */
 
-                        free(nbr_cache);
-                        nbr_alloc_cnt --;
+/* admin or ip4_address of a port changed */
+static void
+port_cache_update(struct port_data *port_cache,
+                  const struct ovsrec_port *ovs_port)
+{
+    struct neighbor_data *nbr_cache, *nbr_next;
+    bool no_ipv4 = false;
+
+    /*IF port transitioned to down state or no ip4 state. Trigger chache & DB clean up for the associated nbr with the port. */
+    if(((strcmp(port_cache->admin, PORT_CONFIG_ADMIN_DOWN)) &&
+                (ovs_port->admin && (0 == strcmp(ovs_port->admin,PORT_CONFIG_ADMIN_DOWN)))) ||
+            (no_ipv4 = (!ovs_port->ip4_address && strcmp(DEFAULT_IPV4_ADD, port_cache->ipv4_address)))
+      ) {
+        VLOG_INFO("Port %s is admin down or %d noip4 adress.cleaning the related nbrs form db and cache: %s %s",
+                ovs_port->name,no_ipv4, port_cache->admin, port_cache->ipv4_address);
+        if(no_ipv4)
+            strncpy(port_cache->ipv4_address, DEFAULT_IPV4_ADD, INET_ADDRSTRLEN);
+        /* Go though neighbors and remove neighbors with this port from DB
+         * Cache will be updated by kernel */
+        HMAP_FOR_EACH_SAFE (nbr_cache, nbr_next, port_node,
+                            &port_cache->neighbors) {
+            if(!nbr_cache->routes_nh) {
+                if(!no_ipv4 || nbr_cache->key.family == AF_INET) {
+                    delete_cache_nbr_from_ovsdb(nbr_cache);
+                    /* Delete the neighbor from cache */
+                    delete_neighbor_from_cache(nbr_cache);
+                }
+            }
+            else {
+                if(!no_ipv4 || nbr_cache->key.family == AF_INET) {
+                    /* Don't clean. entry should present in db and cache */
+                    nbr_cache->state = NBR_STATE_INCOMPLETE;
+                    nbr_clear_mac(nbr_cache);
+                    if(!nbr_cache->nbr) {
+                        VLOG_ERR("Delete attmpted cache entry does not have ovs_nbr set.");
+                        continue;
                     }
+                    const struct ovsrec_neighbor *ovs_nbr = nbr_cache->nbr;
+                    txn_journal_add_nbr(&nbr_cache->key);
+                    ovsrec_neighbor_set_mac(ovs_nbr, "");
+                    ovsrec_neighbor_set_state(ovs_nbr,
+                            nbr_state_to_string(nbr_cache));
+                    ovsdb_commit_required = true;
                 }
-
-                shash_delete(&all_ports, sh_port);
-                free(port_cache);
-                port_data_alloc --;
             }
         }
     }
+    /* port admin state changes from DOWN -> UP, ping all the next hops
+     * ipv4 add set back Then ping the only ipv4 next hops .
+     */
+    no_ipv4 = false;
+    if((!(strcmp(port_cache->admin, PORT_CONFIG_ADMIN_DOWN)) &&
+                (ovs_port->admin && (strcmp(ovs_port->admin,PORT_CONFIG_ADMIN_DOWN)))) ||
+            (no_ipv4 = (ovs_port->ip4_address && !strcmp(DEFAULT_IPV4_ADD, port_cache->ipv4_address)))
+      ) {
+        VLOG_INFO("Port %s either came up or ip4 resotred,<%d>. cur state: %s %s",
+                ovs_port->name,no_ipv4, port_cache->admin, port_cache->ipv4_address);
+        nh_retry_port_up(port_cache);
+    }
 
-    /* Add new ports. */
-    if (OVSREC_IDL_ANY_TABLE_ROWS_INSERTED(first_row, idl_seqno)) {
-        SHASH_FOR_EACH (sh_port, &sh_idl_ports) {
-            const struct ovsrec_port *port_row = (const struct ovsrec_port *) sh_port->data;
+    /*Storing the ip4 and admin info, whichever got changed. */
+    if(ovs_port->ip4_address && (strcmp(port_cache->ipv4_address, ovs_port->ip4_address))) {
+        VLOG_INFO("port %s ip is modified: from %s to %s",ovs_port->name, port_cache->ipv4_address, ovs_port->ip4_address);
+        strncpy(port_cache->ipv4_address, ovs_port->ip4_address, INET_ADDRSTRLEN);
+    }
+    if (ovs_port->admin && (strcmp(port_cache->admin, ovs_port->admin))) {
+        VLOG_INFO("port%s admin state modified from %s to %s",ovs_port->name, port_cache->admin, ovs_port->admin);
+        strncpy(port_cache->admin, ovs_port->admin, 32);
+    }
+} /* port_cache_update */
 
-            if (OVSREC_IDL_IS_ROW_INSERTED(port_row, idl_seqno)) {
-                struct port_data *new_port = NULL;
+/*
+ * Look for added, deleted or modified ports, from tracked Port rows.
+ * Only admin and ip4_address are tracked, so other Port column changes
+ * do not show up here.
+ * - For added ports see if any neighbor was found on the port, update the neighbor's
+ *   ovsdb port
+ * - For deleted ports, delete all neighbors on the port.
+ */
+static void
+arpmgrd_reconfigure_port(struct ovsdb_idl *idl)
+{
+    const struct ovsrec_port *row;
+    struct port_data *port_cache;
 
-                /* Allocate structure to save state information for this port. */
-                new_port = xzalloc(sizeof(struct port_data));
-                port_data_alloc++;
+    /*
+     * Deleted ports are only removed once inserts are seen, as an
+     * ovsdb-server reconnect deletes and inserts every row again.
+     */
+    OVSREC_PORT_FOR_EACH_TRACKED (row, idl) {
+        if (ovsrec_port_is_deleted(row)) {
+            proc_stats.port_rows_tracked++;
+            port_cache = port_cache_find_by_uuid(&row->header_.uuid);
+            if (port_cache) {
+                port_cache->del_pending = true;
+            }
+        }
+    }
 
-                if (!shash_add_once(&all_ports, port_row->name, new_port)) {
-                    VLOG_WARN("Port %s specified twice", port_row->name);
-                    free(new_port);
-                    new_port = NULL;
-                    port_data_alloc --;
-                    continue;
-                }
-                new_port->port = port_row;
-                /*setting up default value for ipv4_address */
-                strcpy(new_port->ipv4_address, DEFAULT_IPV4_ADD);
-                strcpy(new_port->admin, PORT_CONFIG_ADMIN_DOWN);
-                /*Storing incoming ip4 info and admin for the created port */
-                if (port_row->ip4_address)
-                    strncpy(new_port->ipv4_address, port_row->ip4_address, INET_ADDRSTRLEN);
-                if(port_row->admin)
-                    strncpy(new_port->admin, port_row->admin, 32);
-                /* May be moved to VLOG_DBG */
-                VLOG_INFO("New port %s added. ip %s admin %s", sh_port->name, new_port->ipv4_address, new_port->admin);
-		struct vrf* vrf = find_port_vrf_in_cache(port_row->name);
-		int local_sock = (vrf == NULL) ? nl_neighbor_sock : vrf->nl_sock;
-
-		/* Send netlink DUMP request to kernel to check for any existing
-		 * neighbors on this PORT */
-		if (local_sock > 0) {
-			netlink_request_neighbor_dump(local_sock);
-		}
-	    }
-	}
-        /* Send netlink DUMP request to kernel to check for any existing
-         * neighbors on this PORT */
-        if (nl_neighbor_sock > 0) {
-            netlink_request_neighbor_dump(nl_neighbor_sock);
-            VLOG_DBG("Asked for a dump from kernel");
-        }
-    }
-    if (OVSREC_IDL_ANY_TABLE_ROWS_MODIFIED(first_row, idl_seqno)) {
-        const struct ovsrec_port *ovs_port;
-        OVSREC_PORT_FOR_EACH (ovs_port, idl) {
-            if (ovs_port && OVSREC_IDL_IS_ROW_MODIFIED(ovs_port, idl_seqno)) {
-                struct port_data *port_cache = shash_find_data(&all_ports, ovs_port->name);
-                bool no_ipv4 = false;
-                if(!port_cache) {
-                    VLOG_ERR("Entry for Port %s is not found in port cache", ovs_port->name);
-                    continue;
-                }
-                /*IF port transitioned to down state or no ip4 state. Trigger chache & DB clean up for the associated nbr with the port. */
-                if(((strcmp(port_cache->admin, PORT_CONFIG_ADMIN_DOWN)) &&
-                            (ovs_port->admin && (0 == strcmp(ovs_port->admin,PORT_CONFIG_ADMIN_DOWN)))) ||
-                        (no_ipv4 = (!ovs_port->ip4_address && strcmp(DEFAULT_IPV4_ADD, port_cache->ipv4_address)))
-                  ) {
-                    VLOG_INFO("Port %s is admin down or %d noip4 adress.cleaning the related nbrs form db and cache: %s %s",
-                            ovs_port->name,no_ipv4, port_cache->admin, port_cache->ipv4_address);
-                    if(no_ipv4)
-                        strncpy(port_cache->ipv4_address, DEFAULT_IPV4_ADD, INET_ADDRSTRLEN);
-                    /* Go though neighbors and remove neighbors with this port from DB
-                     * Cache will be updated by kernel */
-                    SHASH_FOR_EACH_SAFE (sh_nbr, sh_nbr_next, &all_neighbors) {
-                        struct neighbor_data *nbr_cache = sh_nbr->data;
-                        if (nbr_cache->device && ovs_port->name
-                                && !strcmp(nbr_cache->device, ovs_port->name)) {
-                            if(!nbr_cache->routes_nh) {
-                                if(!no_ipv4 ||
-                                        (!strcmp(nbr_cache->network_family,
-                                                 OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4))) {
-                                    delete_cache_nbr_from_ovsdb(nbr_cache);
-                                    /* Delete the neighbor from cache */
-                                    shash_delete(&all_neighbors, sh_nbr);
-
-                                    free(nbr_cache);
-                                    nbr_alloc_cnt --;
-                                }
-                            }
-                            else {
-                                if(!no_ipv4 ||
-                                        (!strcmp(nbr_cache->network_family,
-                                                 OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4))) {
-                                    /* Don't clean. entry should present in db and cache */
-                                    strcpy(nbr_cache->state, OVSREC_NEIGHBOR_STATE_INCOMPLETE);
-                                    strcpy(nbr_cache->mac, "");
-                                    if(!nbr_cache->nbr) {
-                                        VLOG_ERR("Delete attmpted cache entry does not have ovs_nbr set.");
-                                        continue;
-                                    }
-                                    const struct ovsrec_neighbor *ovs_nbr = nbr_cache->nbr;
-                                    ovsrec_neighbor_set_mac(ovs_nbr, nbr_cache->mac);
-                                    ovsrec_neighbor_set_state(ovs_nbr, nbr_cache->state);
-                                    ovsdb_commit_required = true;
-                                }
-                            }
-                        }
-                    }
-                }
-                /* port admin state changes from DOWN -> UP, ping all the next hops
-                 * ipv4 add set back Then ping the only ipv4 next hops .
-                 */
-                no_ipv4 = false;
-                if((!(strcmp(port_cache->admin, PORT_CONFIG_ADMIN_DOWN)) &&
-                            (ovs_port->admin && (strcmp(ovs_port->admin,PORT_CONFIG_ADMIN_DOWN)))) ||
-                        (no_ipv4 = (ovs_port->ip4_address && !strcmp(DEFAULT_IPV4_ADD, port_cache->ipv4_address)))
-                  ) {
-                    VLOG_INFO("Port %s either came up or ip4 resotred,<%d>. cur state: %s %s",
-                            ovs_port->name,no_ipv4, port_cache->admin, port_cache->ipv4_address);
-                    if(ovs_port->name) {
-                        strncpy(port_cache->port_up_reinstal.name,ovs_port->name,IF_NAMESIZE);
-                    }
-                    port_cache->port_up_reinstal.ipv4 = no_ipv4;
-                    reinstal_nh_port_up = true;
-                    /*ping send was failing because of network unavalibity, so to give some time move the ping send in
-                     * main loop */
-                }
+    /* Add new ports, and update modified ones */
+    OVSREC_PORT_FOR_EACH_TRACKED (row, idl) {
+        if (ovsrec_port_is_deleted(row)) {
+            continue;
+        }
+        proc_stats.port_rows_tracked++;
+        if (ovsrec_port_is_new(row)) {
+            port_cache_add(row);
+            continue;
+        }
+        port_cache = port_cache_find_by_uuid(&row->header_.uuid);
+        if(!port_cache) {
+            VLOG_ERR("Entry for Port %s is not found in port cache", row->name);
+            continue;
+        }
+        port_cache_update(port_cache, row);
+    }
 
-                /*Storing the ip4 and admin info, whichever got changed. */
-                if(ovs_port->ip4_address && (strcmp(port_cache->ipv4_address, ovs_port->ip4_address))) {
-                    VLOG_INFO("port %s ip is modified: from %s to %s",ovs_port->name, port_cache->ipv4_address, ovs_port->ip4_address);
-                    strncpy(port_cache->ipv4_address, ovs_port->ip4_address, INET_ADDRSTRLEN);
-                }
-                if (ovs_port->admin && (strcmp(port_cache->admin, ovs_port->admin))) {
-                    VLOG_INFO("port%s admin state modified from %s to %s",ovs_port->name, port_cache->admin, ovs_port->admin);
-                    strncpy(port_cache->admin, ovs_port->admin, 32);
-                }
+    /* Delete ports which were not inserted again */
+    OVSREC_PORT_FOR_EACH_TRACKED (row, idl) {
+        if (ovsrec_port_is_deleted(row)) {
+            port_cache = port_cache_find_by_uuid(&row->header_.uuid);
+            if (port_cache && port_cache->del_pending) {
+                port_cache_del(port_cache);
             }
         }
     }
-    /* Destroy the shash of the IDL ports */
-    shash_destroy(&sh_idl_ports);
 } /* arpmgrd_reconfigure_port */
 
 /*Updates the cache_nbr with the externally configured ovs_nbr entry.
@@ -1563,66 +5002,62 @@ static void
 update_configured_entry_to_neighbor_cache(const struct ovsrec_neighbor *ovs_nbr,
                                             struct neighbor_data *cache_nbr,
                                             int *family,
-                                            char *mac_addr, char *state)
+                                            const char *mac_addr,
+                                            const char *state)
 {
-    const struct ovsrec_vrf *vrf = ovs_nbr->vrf;
-    bool is_ipv6 = false;
-
-    if (strchr(ovs_nbr->ip_address, ':')) {
-        is_ipv6 = true;
-        *family = AF_INET6;
-    }
-    else {
-        *family = AF_INET;
-    }
-    if(!is_ipv6)  {
-        strcpy((cache_nbr)->network_family, OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4);
-    } else  {
-        strcpy((cache_nbr)->network_family, OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6);
-    }
-
-    strcpy((cache_nbr)->vrf_name, vrf->name);
-    strcpy((cache_nbr)->ip_address, ovs_nbr->ip_address);
-    strcpy((cache_nbr)->state, state);
-    strcpy((cache_nbr)->device, "");
+    /* Address and family are already in the cache key */
+    *family = cache_nbr->key.family;
+    (cache_nbr)->state = nbr_state_from_string(state);
+    neighbor_set_device(cache_nbr, "");
     if(mac_addr){
-        strcpy((cache_nbr)->mac, mac_addr);
+        uint8_t *mac = cache_nbr->mac;
+
+        cache_nbr->has_mac =
+            sscanf(mac_addr, "%hhx:%hhx:%hhx:%hhx:%hhx:%hhx",
+                   &mac[0], &mac[1], &mac[2],
+                   &mac[3], &mac[4], &mac[5]) == MAC_ADDRLEN;
     }
     (cache_nbr)->nbr = ovs_nbr;
 }
 
 
+/*
+ * Process Neighbor rows inserted, or with status or in_use_by_routes
+ * modified, since last run. Only these columns are tracked, so our own
+ * updates of mac and state are not walked again.
+ */
 static void
 arpmgrd_reconfigure_neighbor(struct ovsdb_idl *idl)
 {
-    const struct ovsrec_neighbor *ovs_nbr, *first_row;
-    first_row = ovsrec_neighbor_first(idl);
-    if (first_row &&
-            (!OVSREC_IDL_ANY_TABLE_ROWS_INSERTED(first_row, idl_seqno))&&
-            !OVSREC_IDL_ANY_TABLE_ROWS_MODIFIED(first_row, idl_seqno)) {
-        VLOG_DBG("No rows in table modified.");
-        return;
-    }
-    OVSREC_NEIGHBOR_FOR_EACH (ovs_nbr, idl) {
+    const struct ovsrec_neighbor *ovs_nbr;
+
+    OVSREC_NEIGHBOR_FOR_EACH_TRACKED (ovs_nbr, idl) {
         struct neighbor_data *cache_nbr;
+        struct nbr_key key;
         bool dp_hit;
-        if(ovs_nbr && ovs_nbr->in_use_by_routes &&
-                OVSREC_IDL_IS_ROW_INSERTED(ovs_nbr, idl_seqno)) {
+
+        if (ovsrec_neighbor_is_deleted(ovs_nbr)) {
+            continue;
+        }
+        proc_stats.nbr_rows_tracked++;
+        if (!idl_nbr_key(ovs_nbr, &key)) {
+            VLOG_DBG("Invalid neighbor row. ip %s", ovs_nbr->ip_address);
+            continue;
+        }
+        if (ovsrec_neighbor_is_new(ovs_nbr)) {
+            if (!ovs_nbr->in_use_by_routes) {
+                continue;
+            }
             /*Process for neighbor entry add into cache */
             struct neighbor_data *cache_nbr = NULL;
             int family = AF_INET;
-            cache_nbr = find_neighbor_in_cache(ovs_nbr->vrf->name, ovs_nbr->ip_address);
+            cache_nbr = find_neighbor_in_cache(&key);
             if (!cache_nbr) {
                 VLOG_INFO("Neighbor entry is added by external module. ip %s, vrf %s",
                     ovs_nbr->ip_address, ovs_nbr->vrf->name);
-                cache_nbr = add_neighbor_to_cache(ovs_nbr->vrf->name, ovs_nbr->ip_address);
-                if (!(cache_nbr)) {
-                    VLOG_ERR("Unable to add new neighbor.<ip> %s <vrf>%s",
-                            ovs_nbr->ip_address,ovs_nbr->vrf->name);
-                    return ;
-                }
+                cache_nbr = add_neighbor_to_cache(&key);
                 char *mac_addr = NULL;
-                char *state = OVSREC_NEIGHBOR_STATE_INCOMPLETE;
+                const char *state = OVSREC_NEIGHBOR_STATE_INCOMPLETE;
                 update_configured_entry_to_neighbor_cache(ovs_nbr, cache_nbr, &family, mac_addr,state);
                 cache_nbr->nbr_unresolved = true;
                 if((ovs_nbr->in_use_by_routes && (*(ovs_nbr->in_use_by_routes) == true)) &&
@@ -1638,25 +5073,11 @@ arpmgrd_reconfigure_neighbor(struct ovsdb_idl *idl)
                      *   Notify back to arpmgrd via netlink notification.
                      */
                     VLOG_INFO("externerally added entry is placed in cache, invoking ping...");
-                    int ping_err = -1;
-                    if(family == AF_INET6){
-                        ping_err = ping6(ovs_nbr->ip_address);
-                    }
-                    else {
-                        ping_err = ping4(ovs_nbr->ip_address);
-                    }
-                    if(ping_err < 0) {
-                        VLOG_INFO("Need reinstal_nh %d",__LINE__);
-                        reinstal_nh = true;
-                    }
+                    nbr_ping(cache_nbr);
                 }
             }
             continue;
         }
-        if (ovs_nbr && !OVSREC_IDL_IS_ROW_MODIFIED(ovs_nbr, idl_seqno)) {
-            VLOG_DBG("Neighbor row not modified");
-            continue;
-        }
 
         /*
          * Check for dp_hit in Neighbor rows.
@@ -1664,7 +5085,7 @@ arpmgrd_reconfigure_neighbor(struct ovsdb_idl *idl)
          * If dp_hit is set, we need to probe
          * and refresh kernel entry
          * */
-        cache_nbr = find_neighbor_in_cache(ovs_nbr->vrf->name, ovs_nbr->ip_address);
+        cache_nbr = find_neighbor_in_cache(&key);
         if (!cache_nbr) {
             VLOG_DBG("Did not find ovsdb neighbor in cache. ip %s, vrf %s",
                     ovs_nbr->ip_address, ovs_nbr->vrf->name);
@@ -1683,51 +5104,21 @@ arpmgrd_reconfigure_neighbor(struct ovsdb_idl *idl)
         if(ovs_nbr->in_use_by_routes &&
             (cache_nbr->routes_nh != (*(ovs_nbr->in_use_by_routes)))){
             VLOG_INFO("Modified in_use_by_routes for %s from %d to %d",
-                cache_nbr->ip_address, cache_nbr->routes_nh, (*(ovs_nbr->in_use_by_routes)));
+                ovs_nbr->ip_address, cache_nbr->routes_nh, (*(ovs_nbr->in_use_by_routes)));
             cache_nbr->routes_nh = (*(ovs_nbr->in_use_by_routes));
         }
         /* routing deamon make in_use_by_routes to true for an existing entry in Neighbor Tbl whose state is
          * STALE. Then send probe to keep the entry REACHABLE.*/
-        if (cache_nbr->routes_nh &&(0 == strcmp(cache_nbr->state,
-                OVSREC_NEIGHBOR_STATE_STALE)) &&
+        if (cache_nbr->routes_nh && cache_nbr->state == NBR_STATE_STALE &&
                 (nl_neighbor_sock > 0)) {
-            int family = AF_INET;
-            uint32_t dst[8];
-            int plen = 0;
-
-            if (strcmp(ovs_nbr->address_family,
-                       OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6) == 0) {
-                family = AF_INET6;
-                inet_pton(AF_INET6, ovs_nbr->ip_address, dst);
-                plen = 16;
-            } else if (strcmp(ovs_nbr->address_family,
-                              OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4) == 0) {
-                family = AF_INET;
-                inet_pton(AF_INET, ovs_nbr->ip_address, dst);
-                plen = 4;
-            }
-            send_neighbor_probe(nl_neighbor_sock, cache_nbr->ifindex,
-                                 family, dst, plen);
-            strcpy(cache_nbr->state, OVSREC_NEIGHBOR_STATE_REACHABLE);
+            probe_sched_add(cache_nbr);
+            cache_nbr->state = NBR_STATE_REACHABLE;
             update_neighbor_to_ovsdb(cache_nbr, false);
         }
-        if (cache_nbr->routes_nh &&(0 == strcmp(cache_nbr->state,
-                OVSREC_NEIGHBOR_STATE_INCOMPLETE))
-                ) {
-            int ping_err = 0;
-            VLOG_INFO("routes_nh is set for %s",cache_nbr->ip_address);
-            if (strcmp(cache_nbr->network_family,
-                       OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6) == 0) {
-                 ping_err = ping6(cache_nbr->ip_address);
-            }
-            else if (strcmp(cache_nbr->network_family,
-                              OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4) == 0) {
-                 ping_err = ping4(cache_nbr->ip_address);
-            }
-            if(ping_err < 0) {
-                VLOG_INFO("Need reinstal_nh %d",__LINE__);
-                reinstal_nh = true;
-            }
+        if (cache_nbr->routes_nh &&
+            cache_nbr->state == NBR_STATE_INCOMPLETE) {
+            VLOG_INFO("routes_nh is set for %s",ovs_nbr->ip_address);
+            nbr_ping(cache_nbr);
         }
 
         /* Get dp_hit from status column */
@@ -1737,33 +5128,16 @@ arpmgrd_reconfigure_neighbor(struct ovsdb_idl *idl)
         /* Check if dp_hit changed */
         if (cache_nbr->dp_hit != dp_hit) {
             /* If dp_hit is set, state in not reachable send probe */
-            if (dp_hit &&(0 == strcmp(cache_nbr->state,
-                    OVSREC_NEIGHBOR_STATE_STALE)) &&
+            if (dp_hit && cache_nbr->state == NBR_STATE_STALE &&
                     (nl_neighbor_sock > 0)) {
-                int family = AF_INET;
-                uint32_t dst[8];
-                int plen = 0;
-
-                if (strcmp(ovs_nbr->address_family,
-                           OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6) == 0) {
-                    family = AF_INET6;
-                    inet_pton(AF_INET6, ovs_nbr->ip_address, dst);
-                    plen = 16;
-                } else if (strcmp(ovs_nbr->address_family,
-                                  OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4) == 0) {
-                    family = AF_INET;
-                    inet_pton(AF_INET, ovs_nbr->ip_address, dst);
-                    plen = 4;
-                }
-                send_neighbor_probe(nl_neighbor_sock, cache_nbr->ifindex,
-                                     family, dst, plen);
+                probe_sched_add(cache_nbr);
                 /*
                  * FIXME: Set state to reachable. Currently we are not receiving
                  * Reachable state from Stale (Bug)
                  * If kernel is unable to resolve, we will get an explicit
                  * notification for FAILED state
                  */
-                strcpy(cache_nbr->state, OVSREC_NEIGHBOR_STATE_REACHABLE);
+                cache_nbr->state = NBR_STATE_REACHABLE;
                 update_neighbor_to_ovsdb(cache_nbr, false);
             }
             /* Update dp_hit attribute in our cache */
@@ -1783,10 +5157,12 @@ arpmgrd_reconfigure(struct ovsdb_idl *idl)
         return;
     }
 
+    idl_nbr_index_run();
     arpmgrd_add_del_vrf(idl);
     arpmgrd_reconfigure_port(idl);
     arpmgrd_reconfigure_neighbor(idl);
 
+    ovsdb_idl_track_clear(idl);
     idl_seqno = new_idl_seqno;
 } /* arpmgrd_reconfigure */
 
@@ -1822,18 +5198,26 @@ arpmgrd_run(void)
                 goto done;
             }
         }
+        resync_commit_done(txn_status);
 
-        /* Some transaction failure case. Lets resync with kernel */
-        if(txn_status != TXN_SUCCESS && txn_status != TXN_UNCHANGED) {
-            VLOG_INFO("Retry failed %d", txn_status);
-            sync_mode = SYNC_WITHOUT_CACHE_RESET;
-            sync_state = SYNC_IN_PROGRESS;
-        }
-
+        /*
+         * Some transaction failure case. Retry what the transaction
+         * wrote, or resync with kernel if that keeps failing.
+         * A failed resync chunk is written again after the same
+         * backoff, or the resync is started over.
+         */
         if (txn) {
-            ovsdb_idl_txn_destroy(txn);
-            txn = NULL;
+            if (txn_status == TXN_SUCCESS || txn_status == TXN_UNCHANGED) {
+                txn_fail_streak = 0;
+                nbr_stats_commit_done(true);
+                nbr_lat_commit_done();
+            } else if (!txn_retry_failed(txn_status)) {
+                sync_mode = SYNC_WITHOUT_CACHE_RESET;
+                sync_state = SYNC_IN_PROGRESS;
+            }
         }
+
+        arpmgrd_txn_destroy();
         if ((sync_state == SYNC_IN_PROGRESS) ||
             (sync_state == SYNC_FAILED))
          {
@@ -1842,14 +5226,18 @@ arpmgrd_run(void)
              * Create a new transaction
              */
             VLOG_INFO("Sync with kernel called");
-            if (txn) {
-                ovsdb_idl_txn_destroy(txn);
-            }
-            txn = NULL;
             txn = ovsdb_idl_txn_create(idl);
+            /* Port and vrf caches must match IDL before resync uses them */
+            arpmgrd_reconfigure(idl);
+            commit_sched_clear();
             resync_db_with_kernel();
             VLOG_INFO("Sync with kernel was called: nbr_alloc_cnt %d, multi_part_res %d, no_n_res %d, nl_dump_res_size %d",
             nbr_alloc_cnt,nl_dump_res_cnt, nl_dump_res_nof_multi_cnt,nl_dump_res_size);
+        } else if (resync.active && time_msec() >= txn_retry_until) {
+            /* Previous chunk is confirmed or backed off, write next one */
+            txn = ovsdb_idl_txn_create(idl);
+            arpmgrd_reconfigure(idl);
+            resync_run_chunk();
         }
 
         /* End "sync in progress state", and reset */
@@ -1860,6 +5248,7 @@ arpmgrd_run(void)
                 close_netlink_socket(nl_neighbor_sock);
                 VLOG_DBG("closed netlink socket");
                 nl_neighbor_sock = 0;
+                nl_recovery_cancel_all();
             }
             sync_mode = SYNC_WITHOUT_CACHE_RESET;
         }
@@ -1871,8 +5260,16 @@ arpmgrd_run(void)
             VLOG_DBG("sync_state changed from %d to IN_PROGRESS", sync_state);
             if(sync_mode == SYNC_WITH_CACHE_RESET) {
                 /* Clear up our cache for resync */
-                shash_destroy_free_data(&all_neighbors);
-                shash_init(&all_neighbors);
+                struct neighbor_data *nbr;
+
+                commit_sched_clear();
+                nl_recovery_cancel_all();
+                nl_reader_discard_default();
+                neighbor_port_lists_clear();
+                HMAP_FOR_EACH_POP (nbr, node, &all_neighbors) {
+                    free(nbr);
+                }
+                nh_timer_wheel_init();
                 nbr_alloc_cnt = 0;
 
                 if(sync_state != SYNC_FAILED) {
@@ -1883,75 +5280,32 @@ arpmgrd_run(void)
 
                    /* Open new socket for resync */
                    netlink_socket_open(DEFAULT_VRF_NAME, &nl_neighbor_sock, NETLINK_ROUTE, 0);
+                   vrf_ifname_flush_default();
                 }
             }
             /* Update state to sync_in_progress */
             sync_state = SYNC_IN_PROGRESS;
         }
 
-        if (!nl_neighbor_sock) {
+        if (nl_neighbor_sock <= 0) {
             VLOG_DBG("opening netlink socket");
-            netlink_socket_open(DEFAULT_VRF_NAME, &nl_neighbor_sock, NETLINK_ROUTE, RTMGRP_NEIGH);
+            netlink_socket_open(DEFAULT_VRF_NAME, &nl_neighbor_sock, NETLINK_ROUTE,
+                                RTMGRP_NEIGH | RTMGRP_LINK);
+            vrf_ifname_flush_default();
         }
 
         if(!txn){
             txn = ovsdb_idl_txn_create(idl);
         }
 
-        if(reinstal_nh_port_up || reinstal_nh){
-            struct shash_node *sh_nbr, *sh_nbr_next;
-            int ping_err = 0;
-            bool require_reinstall = false;
-            SHASH_FOR_EACH_SAFE (sh_nbr, sh_nbr_next, &all_neighbors) {
-                struct neighbor_data *nbr_cache = sh_nbr->data;
-                /* Triggering the ping_send cycle for the unresolved nbr at port is up event */
-                if(reinstal_nh_port_up && (!strcmp(nbr_cache->device, ""))) {
-                    nbr_cache->ping_retry_cnt = 0;
-                    goto send_ping;
-                }
-                /* Trggering ping_send for the unresolved entries.
-                 * This should take care if ping was sent for nh resolution before the actual interface is up by the kernel */
-                if(reinstal_nh && !strcmp(nbr_cache->state, OVSREC_NEIGHBOR_STATE_INCOMPLETE)) {
-                    goto send_ping;
-                }
-                /*find the port_data for the nbr_cache->device */
-                struct port_data *pport_data = shash_find_data(&all_ports, nbr_cache->device);
-                if(!pport_data) {
-                    VLOG_ERR("port_data not found for the dev %s",nbr_cache->device);
-                    continue;
-                }
-                if (nbr_cache->device
-                        && !strcmp(nbr_cache->device, pport_data->port_up_reinstal.name)) {
-send_ping:
-                    if(nbr_cache->routes_nh && (nbr_cache->ping_retry_cnt < MAX_NH_PING_CNT)) {
-                        VLOG_INFO("pinging %s to restore nh in port %s again", nbr_cache->ip_address, nbr_cache->device);
-                        if(!strcmp(nbr_cache->network_family,
-                                    OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV4)) {
-                            ping_err = ping4(nbr_cache->ip_address);
-                            /*The state is changed to unresolved nbr*/
-                            strcpy(nbr_cache->state,OVSREC_NEIGHBOR_STATE_INCOMPLETE);
-                        }
-                        else if(!strcmp(nbr_cache->network_family, OVSREC_NEIGHBOR_ADDRESS_FAMILY_IPV6)) {
-                            ping_err = ping6(nbr_cache->ip_address);
-                            strcpy(nbr_cache->state,OVSREC_NEIGHBOR_STATE_INCOMPLETE);
-                        }
-                        if(ping_err < 0) {
-                            require_reinstall = true;
-                        }
-                    }
-                    nbr_cache->ping_retry_cnt ++;
-                }
-            }
-            /* Clears only when all the ping_sends are succesful.*/
-            if(!require_reinstall) {
-                reinstal_nh = false;
-            }
-            /*After first ping send,reinstal_nh event gets convreted into reinstal_nh for unresolved nbr*/
-            reinstal_nh_port_up = false;
-        }
+        nh_retry_run();
 
         arpmgrd_reconfigure(idl);
         arpmgrd_run__();
+        nl_replay_run();
+        nbr_probe_run();
+        probe_sched_run();
+        commit_sched_run();
 
         if(ovsdb_commit_required == true) {
             txn_status = ovsdb_idl_txn_commit(txn);
@@ -1959,49 +5313,82 @@ send_ping:
             VLOG_DBG("Txn status after commit = %d", txn_status);
             ovsdb_commit_required = false;
             if (txn_status == TXN_SUCCESS) {
-                ovsdb_idl_txn_destroy(txn);
-                txn = NULL;
+                txn_fail_streak = 0;
+                nbr_stats_commit_done(true);
+                nbr_lat_commit_done();
+                arpmgrd_txn_destroy();
             }
         } else {
-            ovsdb_idl_txn_destroy(txn);
-            txn = NULL;
+            arpmgrd_txn_destroy();
         }
     }
     done:
     return;
 } /* arpmgrd_run */
 
+/* Wake up on neighbor updates from any vrf namespace */
 static void
 neighbor_netlink_recv_wait__()
 {
-    if(nl_neighbor_sock > 0 && system_configured) {
+    struct shash_node *vrf_node = NULL;
+
+    if (!system_configured) {
+        return;
+    }
+    nl_reader_wait();
+    if(nl_neighbor_sock > 0 && !nl_reader_owns(true)) {
         poll_fd_wait(nl_neighbor_sock , POLLIN);
     }
+    SHASH_FOR_EACH(vrf_node, &all_vrfs) {
+        struct vrf *vrf = vrf_node->data;
+        if (!arpmgrd_vrf_is_default(vrf) && vrf->nl_sock > 0
+            && !nl_reader_owns(false)) {
+            poll_fd_wait(vrf->nl_sock, POLLIN);
+        }
+    }
 } /* neighbor_netlink_recv_wait__ */
 
+/*
+ * Wake up for IDL changes, netlink messages and pending deadlines only,
+ * so that an idle daemon does not wake up at all.
+ */
 static void
 arpmgrd_wait(void)
 {
     ovsdb_idl_wait(idl);
+
+    /* Nothing else is done until IDL changes, see arpmgrd_run() */
+    if (!system_configured || !ovsdb_idl_has_lock(idl)
+        || (txn && txn_status == TXN_INCOMPLETE)) {
+        return;
+    }
+
     neighbor_netlink_recv_wait__();
-    poll_timer_wait(ARPMGR_POLL_INTERVAL * 1000);
+    commit_sched_wait();
+    probe_sched_wait();
+    nh_retry_wait();
+
+    /* Failed resync chunk is written again after its backoff */
+    if (resync.active && !resync.chunk_pending) {
+        poll_timer_wait_until(txn_retry_until);
+    }
+    /* Resync and replay go on with next iteration */
+    if (sync_state != SYNC_NONE || nl_replay_pending()) {
+        poll_immediate_wake();
+    }
+    /* Opening the netlink socket failed, try again later */
+    if (nl_neighbor_sock <= 0) {
+        poll_timer_wait(ARPMGR_POLL_INTERVAL * 1000);
+    }
 } /* arpmgrd_wait */
 
 static void
 arpmgrd_unixctl_debug_cnt(struct unixctl_conn *conn, int argc OVS_UNUSED,
         const char *argv[] OVS_UNUSED, void *aux OVS_UNUSED)
 {
-    const struct ovsrec_neighbor *ovs_nbr;
-    struct shash_node *sh_node, *sh_next;
     struct ds ds = DS_EMPTY_INITIALIZER;
-    ovs_idl_nbr_cnt = 0;
-    all_neighbors_len = 0;
-    OVSREC_NEIGHBOR_FOR_EACH(ovs_nbr, idl) {
-        ovs_idl_nbr_cnt ++;
-    }
-    SHASH_FOR_EACH_SAFE(sh_node, sh_next, &all_neighbors) {
-        all_neighbors_len ++;
-    }
+    ovs_idl_nbr_cnt = hmap_count(&idl_nbr_by_uuid);
+    all_neighbors_len = hmap_count(&all_neighbors);
     ds_put_format(&ds,
 "nbr_alloc_cnt %d \n\
 port_data_alloc %d \n\
@@ -2020,10 +5407,292 @@ nl_probe_req_cnt %d, nl_dump_res_size %d,ovsdb_tr_trigger_cnt %d \n",
 nl_dump_req_cnt,nl_dump_res_cnt, nl_dump_res_nof_multi_cnt,
 nl_probe_req_cnt, nl_dump_res_size,
 ovsdb_tr_trigger_cnt);
+    /* Settings and state, counters are in arpmgrd/stats */
+    ds_put_format(&ds, "nl_recv_batch %d, nl_recv_buffer_size %d\n",
+                  gbl_nl_recv_batch, gbl_nl_recv_buf_size);
+    ds_put_format(&ds, "ovsdb_commit_batch %d, ovsdb_commit_hold_ms %d, \
+commit_pending %d\n",
+                  gbl_commit_batch, gbl_commit_hold_ms,
+                  (int) commit_sched_pending());
+    ds_put_format(&ds, "resync_chunk %d, resync_active %d, resync_pos %d/%d, \
+txn_fail_streak %d\n",
+                  gbl_resync_chunk, resync.active, (int) resync.pos,
+                  (int) (resync.n_keys + resync.n_uuids), txn_fail_streak);
+    ds_put_format(&ds, "nl_bpf_filter %d, nl_bpf_filter_cnt %d, \
+nl_bpf_filter_err_cnt %d\n",
+                  gbl_nl_bpf_filter, nl_bpf_filter_cnt, nl_bpf_filter_err_cnt);
+    ds_put_format(&ds, "nl_overrun_recovery %s\n",
+                  gbl_nl_overrun_recovery == NL_OVERRUN_INCREMENTAL
+                  ? "incremental" : "reset");
+    ds_put_format(&ds, "nl_strict_chk_cnt %d, nl_strict_chk_err_cnt %d, \
+nl_dump_filter %d\n",
+                  nl_strict_chk_cnt, nl_strict_chk_err_cnt, nl_dump_filter);
+    ds_put_format(&ds, "nl_reader_thread %d, nl_reader_ring %d\n",
+                  nl_reader.started,
+                  nl_reader.started ? (int) (nl_reader.mask + 1) : 0);
+    ds_put_format(&ds, "probe_rate %d, probe_port_rate %d, \
+probe_queue_nh %d, probe_queue_dp_hit %d\n",
+                  gbl_probe_rate, gbl_probe_port_rate,
+                  (int) probe_queues[PROBE_PRIO_NH].n_reqs,
+                  (int) probe_queues[PROBE_PRIO_DP_HIT].n_reqs);
+    ds_put_format(&ds, "nh_retry_pending %d\n", (int) nh_timers.n);
     unixctl_command_reply(conn, ds_cstr(&ds));
     ds_destroy(&ds);
 }
 
+static void
+nbr_lat_vrf_name(const struct nbr_lat_vrf *lv, struct ds *ds)
+{
+    const struct vrf *vrf = arpmgrd_vrf_find_by_table_id(lv->vrf_id);
+
+    if (vrf) {
+        ds_put_cstr(ds, vrf->name);
+    } else {
+        ds_put_format(ds, "table %"PRIu32, lv->vrf_id);
+    }
+} /* nbr_lat_vrf_name */
+
+static struct json *
+nbr_lat_hist_to_json(const struct nbr_lat_hist *h)
+{
+    struct json *json = json_object_create();
+    struct json *buckets = json_array_create_empty();
+    int i;
+
+    json_object_put(json, "count", json_integer_create(h->count));
+    json_object_put(json, "sum_usec", json_integer_create(h->sum_usec));
+    json_object_put(json, "max_usec", json_integer_create(h->max_usec));
+    for (i = 0; i < NBR_LAT_BUCKETS; i++) {
+        json_array_add(buckets, json_integer_create(h->buckets[i]));
+    }
+    json_object_put(json, "buckets", buckets);
+    return json;
+} /* nbr_lat_hist_to_json */
+
+static void
+nbr_lat_hist_format(const struct nbr_lat_hist *h, const char *type,
+                    struct ds *ds)
+{
+    int i;
+
+    ds_put_format(ds, "  %s: count %"PRIu64", avg %"PRIu64" us, "
+                  "max %"PRIu64" us\n", type, h->count,
+                  h->count ? h->sum_usec / h->count : 0, h->max_usec);
+    for (i = 0; i < NBR_LAT_BUCKETS; i++) {
+        if (!h->buckets[i]) {
+            continue;
+        }
+        if (i == NBR_LAT_BUCKETS - 1) {
+            ds_put_format(ds, "    >= %"PRIu64" us: %"PRIu64"\n",
+                          UINT64_C(1) << i, h->buckets[i]);
+        } else {
+            ds_put_format(ds, "    < %"PRIu64" us: %"PRIu64"\n",
+                          UINT64_C(1) << (i + 1), h->buckets[i]);
+        }
+    }
+} /* nbr_lat_hist_format */
+
+/*
+ * arpmgrd/latency [json] [reset]
+ * Kernel event to OVSDB commit latency per VRF and event type. With
+ * "json", bucket i of "buckets" counts latencies in [2^i, 2^(i+1)) us.
+ * With "reset", histograms are cleared once reported.
+ */
+static void
+arpmgrd_unixctl_latency(struct unixctl_conn *conn, int argc,
+                        const char *argv[], void *aux OVS_UNUSED)
+{
+    struct ds ds = DS_EMPTY_INITIALIZER;
+    const struct nbr_lat_vrf *lv;
+    bool json = false;
+    bool reset = false;
+    int i, t;
+
+    for (i = 1; i < argc; i++) {
+        if (!strcmp(argv[i], "json")) {
+            json = true;
+        } else if (!strcmp(argv[i], "reset")) {
+            reset = true;
+        } else {
+            unixctl_command_reply_error(conn, "usage: arpmgrd/latency "
+                                        "[json] [reset]");
+            return;
+        }
+    }
+
+    if (json) {
+        struct json *top = json_object_create();
+        char *s;
+
+        HMAP_FOR_EACH (lv, node, &nbr_lat_vrfs) {
+            struct json *vrf_json = json_object_create();
+
+            json_object_put(vrf_json, "table_id",
+                            json_integer_create(lv->vrf_id));
+            for (t = 0; t < NBR_LAT_N_TYPES; t++) {
+                json_object_put(vrf_json, nbr_lat_type_names[t],
+                                nbr_lat_hist_to_json(&lv->hists[t]));
+            }
+            nbr_lat_vrf_name(lv, &ds);
+            json_object_put(top, ds_cstr(&ds), vrf_json);
+            ds_clear(&ds);
+        }
+        s = json_to_string(top, JSSF_SORT);
+        ds_put_cstr(&ds, s);
+        free(s);
+        json_destroy(top);
+    } else {
+        HMAP_FOR_EACH (lv, node, &nbr_lat_vrfs) {
+            ds_put_cstr(&ds, "vrf ");
+            nbr_lat_vrf_name(lv, &ds);
+            ds_put_format(&ds, " (table %"PRIu32")\n", lv->vrf_id);
+            for (t = 0; t < NBR_LAT_N_TYPES; t++) {
+                nbr_lat_hist_format(&lv->hists[t], nbr_lat_type_names[t],
+                                    &ds);
+            }
+        }
+    }
+
+    if (reset) {
+        nbr_lat_reset();
+    }
+    unixctl_command_reply(conn, ds_cstr(&ds));
+    ds_destroy(&ds);
+} /* arpmgrd_unixctl_latency */
+
+static void
+nbr_stats_format(const struct nbr_stats *st, struct ds *ds)
+{
+    int i;
+
+    ds_put_cstr(ds, "  events:");
+    for (i = 0; i < NBR_STATS_EV_N; i++) {
+        ds_put_format(ds, " %s %"PRIu64, nbr_stats_event_names[i],
+                      st->events[i]);
+    }
+    ds_put_format(ds, "\n  probes %"PRIu64", pings %"PRIu64", "
+                  "ping_failures %"PRIu64"\n", st->probes, st->pings,
+                  st->ping_failures);
+    ds_put_format(ds, "  rows_updated %"PRIu64", rows_deleted %"PRIu64", "
+                  "rows_committed %"PRIu64", rows_failed %"PRIu64"\n",
+                  st->rows_updated, st->rows_deleted, st->rows_committed,
+                  st->rows_failed);
+    ds_put_format(ds, "  overruns %"PRIu64", recovery_dumps %"PRIu64"\n",
+                  st->overruns, st->recovery_dumps);
+} /* nbr_stats_format */
+
+/* Counters of 'proc_stats', one "name value" pair each */
+static void
+proc_stats_format(struct ds *ds)
+{
+    const struct proc_stats *st = &proc_stats;
+
+    ds_put_format(ds, "  commits %"PRIu64", commit_failures %"PRIu64", "
+                  "resyncs %"PRIu64"\n", st->commits, st->commit_failures,
+                  st->resyncs);
+    ds_put_format(ds, "  nl_recv_syscalls %"PRIu64", nl_recv_dgrams %"PRIu64
+                  ", nl_recv_full_batches %"PRIu64"\n"
+                  "  nl_recv_batch_max %"PRIu64", nl_recv_truncated %"PRIu64
+                  "\n", st->nl_recv_syscalls, st->nl_recv_dgrams,
+                  st->nl_recv_full_batches, st->nl_recv_batch_max,
+                  st->nl_recv_truncated);
+    ds_put_format(ds, "  ifname_misses %"PRIu64", ifname_updates %"PRIu64
+                  "\n", st->ifname_misses, st->ifname_updates);
+    ds_put_format(ds, "  recovery_swept %"PRIu64", recovery_busy %"PRIu64
+                  "\n  dumps_queued %"PRIu64", dumps_coalesced %"PRIu64
+                  ", dumps_sent %"PRIu64"\n", st->recovery_swept,
+                  st->recovery_busy, st->dumps_queued, st->dumps_coalesced,
+                  st->dumps_sent);
+    ds_put_format(ds, "  nbr_rows_tracked %"PRIu64", port_rows_tracked %"
+                  PRIu64"\n", st->nbr_rows_tracked, st->port_rows_tracked);
+    ds_put_format(ds, "  reader_events %"PRIu64", reader_applied %"PRIu64
+                  ", reader_dropped %"PRIu64", reader_pending_max %"PRIu64
+                  "\n  reader_recvs %"PRIu64", reader_full %"PRIu64
+                  ", reader_truncated %"PRIu64", reader_overruns %"PRIu64
+                  "\n", nl_reader_counter(&nl_reader.event_cnt),
+                  st->reader_applied, st->reader_dropped,
+                  st->reader_pending_max,
+                  nl_reader_counter(&nl_reader.recv_cnt),
+                  nl_reader_counter(&nl_reader.full_cnt),
+                  nl_reader_counter(&nl_reader.trunc_cnt),
+                  nl_reader_counter(&nl_reader.overrun_cnt));
+    ds_put_format(ds, "  dirty_marked %"PRIu64", dirty_flushed %"PRIu64
+                  "\n  commit_batches %"PRIu64", commit_batch_rows %"PRIu64
+                  ", commit_batch_last %"PRIu64", commit_batch_max %"PRIu64
+                  "\n", st->dirty_marked, st->dirty_flushed,
+                  st->commit_batches, st->commit_batch_rows,
+                  st->commit_batch_last, st->commit_batch_max);
+    ds_put_format(ds, "  resync_active %d, resync_chunks %"PRIu64
+                  ", resync_chunk_retries %"PRIu64", resync_inserts %d, "
+                  "resync_deletes %d\n", resync.active, st->resync_chunks,
+                  st->resync_chunk_retries, idl_nbr_force_ins_cnt,
+                  idl_nbr_force_del_cnt);
+    ds_put_format(ds, "  txn_retries %"PRIu64", txn_retry_rows %"PRIu64
+                  ", txn_resyncs %"PRIu64"\n", st->txn_retries,
+                  st->txn_retry_rows, st->txn_resyncs);
+    ds_put_format(ds, "  nbr_probes_queued %"PRIu64", nbr_probes_sent %"
+                  PRIu64", nbr_probes_gw %"PRIu64"\n  nbr_probes_noroute %"
+                  PRIu64", nbr_probes_failed %"PRIu64"\n",
+                  st->nbr_probes_queued, st->nbr_probes_sent,
+                  st->nbr_probes_gw, st->nbr_probes_noroute,
+                  st->nbr_probes_failed);
+    ds_put_format(ds, "  nh_retries_armed %"PRIu64", nh_retries_fired %"
+                  PRIu64", nh_retry_pings %"PRIu64"\n",
+                  st->nh_retries_armed, st->nh_retries_fired,
+                  st->nh_retry_pings);
+    ds_put_format(ds, "  probes_queued %"PRIu64", probes_sent %"PRIu64
+                  ", probes_deferred %"PRIu64", probes_dropped %"PRIu64
+                  ", probe_queue_max %"PRIu64"\n", st->probes_queued,
+                  st->probes_sent, st->probes_deferred, st->probes_dropped,
+                  st->probe_queue_max);
+} /* proc_stats_format */
+
+/*
+ * arpmgrd/stats
+ * Counters of the process, of each VRF and of each port. Only counters
+ * and hash map sizes are read, no table is walked.
+ */
+static void
+arpmgrd_unixctl_stats(struct unixctl_conn *conn, int argc OVS_UNUSED,
+                      const char *argv[] OVS_UNUSED, void *aux OVS_UNUSED)
+{
+    struct ds ds = DS_EMPTY_INITIALIZER;
+    struct shash_node *node;
+
+    ds_put_format(&ds, "total: neighbors %d, neighbor_rows %d, dirty %d, "
+                  "pending_deletes %d\n",
+                  (int) hmap_count(&all_neighbors),
+                  (int) hmap_count(&idl_nbr_by_uuid),
+                  (int) hmap_count(&dirty_neighbors),
+                  (int) hmap_count(&pending_nbr_deletes));
+    proc_stats_format(&ds);
+    nbr_stats_format(&nbr_stats_total, &ds);
+    if (gbl_nl_replay_file) {
+        long long int end = nl_replay.end ? nl_replay.end : time_msec();
+
+        ds_put_format(&ds, "  replay: datagrams %"PRIu64", done %s, "
+                      "elapsed_ms %lld\n", nl_replay.dgram_cnt,
+                      nl_replay.done ? "yes" : "no",
+                      nl_replay.start ? end - nl_replay.start : 0);
+    }
+
+    SHASH_FOR_EACH (node, &all_vrfs) {
+        const struct vrf *vrf = node->data;
+
+        ds_put_format(&ds, "vrf %s (table %"PRId64"):\n", vrf->name,
+                      vrf->table_id);
+        nbr_stats_format(&vrf->stats, &ds);
+    }
+    SHASH_FOR_EACH (node, &all_ports) {
+        const struct port_data *pd = node->data;
+
+        ds_put_format(&ds, "port %s:\n", node->name);
+        nbr_stats_format(&pd->stats, &ds);
+    }
+    unixctl_command_reply(conn, ds_cstr(&ds));
+    ds_destroy(&ds);
+} /* arpmgrd_unixctl_stats */
+
 int
 main(int argc, char *argv[])
 {
@@ -2074,6 +5743,18 @@ parse_options(int argc, char *argv[], char **unixctl_pathp)
 {
     enum {
         OPT_UNIXCTL = UCHAR_MAX + 1,
+        OPT_NL_RECV_BATCH,
+        OPT_NL_RECV_BUFFER_SIZE,
+        OPT_OVSDB_COMMIT_BATCH,
+        OPT_OVSDB_COMMIT_HOLD_MS,
+        OPT_RESYNC_CHUNK,
+        OPT_NL_BPF_FILTER,
+        OPT_NL_OVERRUN_RECOVERY,
+        OPT_NL_READER_THREAD,
+        OPT_NL_READER_RING,
+        OPT_PROBE_RATE,
+        OPT_PROBE_PORT_RATE,
+        OPT_NL_REPLAY,
         VLOG_OPTION_ENUMS,
         DAEMON_OPTION_ENUMS,
     };
@@ -2082,6 +5763,22 @@ parse_options(int argc, char *argv[], char **unixctl_pathp)
             {"help",        no_argument, NULL, 'h'},
             {"version",     no_argument, NULL, 'V'},
             {"unixctl",     required_argument, NULL, OPT_UNIXCTL},
+            {"nl-recv-batch", required_argument, NULL, OPT_NL_RECV_BATCH},
+            {"nl-recv-buffer-size", required_argument, NULL,
+             OPT_NL_RECV_BUFFER_SIZE},
+            {"ovsdb-commit-batch", required_argument, NULL,
+             OPT_OVSDB_COMMIT_BATCH},
+            {"ovsdb-commit-hold-ms", required_argument, NULL,
+             OPT_OVSDB_COMMIT_HOLD_MS},
+            {"resync-chunk", required_argument, NULL, OPT_RESYNC_CHUNK},
+            {"nl-bpf-filter", no_argument, NULL, OPT_NL_BPF_FILTER},
+            {"nl-overrun-recovery", required_argument, NULL,
+             OPT_NL_OVERRUN_RECOVERY},
+            {"nl-reader-thread", no_argument, NULL, OPT_NL_READER_THREAD},
+            {"nl-reader-ring", required_argument, NULL, OPT_NL_READER_RING},
+            {"probe-rate", required_argument, NULL, OPT_PROBE_RATE},
+            {"probe-port-rate", required_argument, NULL, OPT_PROBE_PORT_RATE},
+            {"nl-replay", required_argument, NULL, OPT_NL_REPLAY},
             DAEMON_LONG_OPTIONS,
             VLOG_LONG_OPTIONS,
             {NULL, 0, NULL, 0},
@@ -2110,6 +5807,99 @@ parse_options(int argc, char *argv[], char **unixctl_pathp)
             *unixctl_pathp = optarg;
             break;
 
+        case OPT_NL_RECV_BATCH:
+            gbl_nl_recv_batch = atoi(optarg);
+            if (gbl_nl_recv_batch < 1 ||
+                gbl_nl_recv_batch > NL_RECV_BATCH_MAX) {
+                VLOG_FATAL("--nl-recv-batch must be between 1 and %d",
+                           NL_RECV_BATCH_MAX);
+            }
+            break;
+
+        case OPT_NL_RECV_BUFFER_SIZE:
+            gbl_nl_recv_buf_size = atoi(optarg);
+            if (gbl_nl_recv_buf_size < RECV_BUFFER_SIZE_MIN ||
+                gbl_nl_recv_buf_size > RECV_BUFFER_SIZE_MAX) {
+                VLOG_FATAL("--nl-recv-buffer-size must be between %d and %d",
+                           RECV_BUFFER_SIZE_MIN, RECV_BUFFER_SIZE_MAX);
+            }
+            break;
+
+        case OPT_OVSDB_COMMIT_BATCH:
+            gbl_commit_batch = atoi(optarg);
+            if (gbl_commit_batch < 1 ||
+                gbl_commit_batch > OVSDB_COMMIT_BATCH_MAX) {
+                VLOG_FATAL("--ovsdb-commit-batch must be between 1 and %d",
+                           OVSDB_COMMIT_BATCH_MAX);
+            }
+            break;
+
+        case OPT_OVSDB_COMMIT_HOLD_MS:
+            gbl_commit_hold_ms = atoi(optarg);
+            if (gbl_commit_hold_ms < 0 ||
+                gbl_commit_hold_ms > OVSDB_COMMIT_HOLD_MS_MAX) {
+                VLOG_FATAL("--ovsdb-commit-hold-ms must be between 0 and %d",
+                           OVSDB_COMMIT_HOLD_MS_MAX);
+            }
+            break;
+
+        case OPT_RESYNC_CHUNK:
+            gbl_resync_chunk = atoi(optarg);
+            if (gbl_resync_chunk < 1 || gbl_resync_chunk > RESYNC_CHUNK_MAX) {
+                VLOG_FATAL("--resync-chunk must be between 1 and %d",
+                           RESYNC_CHUNK_MAX);
+            }
+            break;
+
+        case OPT_NL_BPF_FILTER:
+            gbl_nl_bpf_filter = true;
+            break;
+
+        case OPT_NL_OVERRUN_RECOVERY:
+            if (!strcmp(optarg, "reset")) {
+                gbl_nl_overrun_recovery = NL_OVERRUN_RESET;
+            } else if (!strcmp(optarg, "incremental")) {
+                gbl_nl_overrun_recovery = NL_OVERRUN_INCREMENTAL;
+            } else {
+                VLOG_FATAL("--nl-overrun-recovery must be reset or "
+                           "incremental");
+            }
+            break;
+
+        case OPT_NL_READER_THREAD:
+            gbl_nl_reader_thread = true;
+            break;
+
+        case OPT_NL_READER_RING:
+            gbl_nl_reader_ring = atoi(optarg);
+            if (gbl_nl_reader_ring < 1 ||
+                gbl_nl_reader_ring > NL_READER_RING_MAX) {
+                VLOG_FATAL("--nl-reader-ring must be between 1 and %d",
+                           NL_READER_RING_MAX);
+            }
+            break;
+
+        case OPT_PROBE_RATE:
+            gbl_probe_rate = atoi(optarg);
+            if (gbl_probe_rate < 0 || gbl_probe_rate > PROBE_RATE_MAX) {
+                VLOG_FATAL("--probe-rate must be between 0 and %d",
+                           PROBE_RATE_MAX);
+            }
+            break;
+
+        case OPT_PROBE_PORT_RATE:
+            gbl_probe_port_rate = atoi(optarg);
+            if (gbl_probe_port_rate < 0 ||
+                gbl_probe_port_rate > PROBE_RATE_MAX) {
+                VLOG_FATAL("--probe-port-rate must be between 0 and %d",
+                           PROBE_RATE_MAX);
+            }
+            break;
+
+        case OPT_NL_REPLAY:
+            gbl_nl_replay_file = xstrdup(optarg);
+            break;
+
             VLOG_OPTION_HANDLERS
             DAEMON_OPTION_HANDLERS
 
@@ -2151,8 +5941,48 @@ usage(void)
     vlog_usage();
     printf("\nOther options:\n"
             "  --unixctl=SOCKET        override default control socket name\n"
+            "  --nl-recv-batch=N       netlink datagrams received per "
+            "syscall (default: %d)\n"
+            "  --nl-recv-buffer-size=BYTES\n"
+            "                          size of each netlink receive buffer "
+            "(default: %d)\n"
+            "  --ovsdb-commit-batch=N  maximum neighbor changes per OVSDB "
+            "transaction\n"
+            "                          (default: %d)\n"
+            "  --ovsdb-commit-hold-ms=MS\n"
+            "                          maximum time a neighbor change is "
+            "held for batching\n"
+            "                          (default: %d)\n"
+            "  --resync-chunk=N        neighbors reconciled per OVSDB "
+            "transaction on resync\n"
+            "                          (default: %d)\n"
+            "  --nl-bpf-filter         drop ignored neighbor notifications "
+            "in kernel\n"
+            "  --nl-overrun-recovery=reset|incremental\n"
+            "                          on netlink overrun, rebuild neighbor "
+            "cache or\n"
+            "                          dump and apply differences "
+            "(default: reset)\n"
+            "  --nl-reader-thread      receive netlink messages in a "
+            "separate thread\n"
+            "  --nl-reader-ring=N      events queued by the reader thread, "
+            "rounded up to\n"
+            "                          a power of 2 (default: %d)\n"
+            "  --probe-rate=N          stale neighbor probes per second "
+            "per vrf, 0 for\n"
+            "                          no limit (default: %d)\n"
+            "  --probe-port-rate=N     stale neighbor probes per second "
+            "per port, 0 for\n"
+            "                          no limit (default: %d)\n"
+            "  --nl-replay=FILE        apply netlink datagrams recorded in "
+            "FILE to the\n"
+            "                          default vrf, for benchmarking\n"
             "  -h, --help              display this help message\n"
-            "  -V, --version           display version information\n");
+            "  -V, --version           display version information\n",
+            NL_RECV_BATCH_DEFAULT, RECV_BUFFER_SIZE,
+            OVSDB_COMMIT_BATCH_DEFAULT, OVSDB_COMMIT_HOLD_MS_DEFAULT,
+            RESYNC_CHUNK_DEFAULT, NL_READER_RING_DEFAULT,
+            PROBE_RATE_DEFAULT, PROBE_PORT_RATE_DEFAULT);
     exit(EXIT_SUCCESS);
 } /* usage */
 
@@ -39,6 +39,12 @@ class arpManagerRestartabiltyTests(OpsVsiTest):
                            host=Host, link=OpsVsiLink,
                            controller=None, build=True)
 
+    def arpmgrd_counter(self, name):
+        s1 = self.net.switches[0]
+        output = s1.cmd("ovs-appctl -t ops-arpmgrd arpmgrd/stats")
+        words = output.replace(",", " ").split()
+        return int(words[words.index(name) + 1])
+
     def arp_manager_configure_and_setup(self):
         s1 = self.net.switches[0]
         h1 = self.net.hosts[0]
@@ -410,6 +416,60 @@ class arpManagerRestartabiltyTests(OpsVsiTest):
         info("Entries deleted from db after arpmgrd restart\n")
         info("Failed entries state updated db after arpmgrd restart\n")
 
+    def arp_manager_restart_chunked_resync(self):
+        info("\n########## Test to verify a resync larger than "
+             "--resync-chunk converges without spurious deletes "
+             "##########\n")
+        s1 = self.net.switches[0]
+
+        info("Adding 20 static arp entries with arpmgrd running\n")
+        for i in range(101, 121):
+            s1.cmd("ip netns exec swns ip neigh add 192.168.3.%d \
+                   lladdr 00:bb:cc:dd:ee:ff dev 3" % i)
+
+        time.sleep(5)
+        output = s1.cmdCLI("do show arp")
+        for i in range(101, 121):
+            assert ("192.168.3.%d" % i) in output, \
+                "static entry 192.168.3.%d missing" % i
+
+        # kill arpmgrd
+        info("\nKilling arpmgrd\n")
+        s1.cmd("ip netns exec swns killall ops-arpmgrd")
+
+        info("Adding 30 static arp entries and deleting 2 with arpmgrd "
+             "stopped\n")
+        for i in range(121, 151):
+            s1.cmd("ip netns exec swns ip neigh add 192.168.3.%d \
+                   lladdr 00:bb:cc:dd:ee:ff dev 3" % i)
+        s1.cmd("ip netns exec swns ip neigh del 192.168.3.101 dev 3")
+        s1.cmd("ip netns exec swns ip neigh del 192.168.3.102 dev 3")
+
+        # Restart arpmgrd, resync is written 8 neighbors at a time
+        info("Restarting arpmgrd with --resync-chunk=8\n")
+        s1.cmd("ip netns exec swns ops-arpmgrd --pidfile --detach \
+               --resync-chunk=8")
+
+        time.sleep(15)
+        output = s1.cmdCLI("do show arp")
+        info(output + "\n\n")
+        assert "192.168.3.101" not in output, \
+            "Deleted entry 192.168.3.101 still in ovsdb"
+        assert "192.168.3.102" not in output, \
+            "Deleted entry 192.168.3.102 still in ovsdb"
+        for i in range(103, 151):
+            assert ("192.168.3.%d" % i) in output, \
+                "static entry 192.168.3.%d missing" % i
+
+        assert self.arpmgrd_counter("resync_active") == 0, \
+            "Resync did not complete"
+        assert self.arpmgrd_counter("resync_chunks") > 1, \
+            "Resync was not split in chunks"
+        assert self.arpmgrd_counter("resync_deletes") == 2, \
+            "Resync deleted rows of neighbors still in kernel"
+
+        info("Verified chunked resync after arpmgrd restart\n")
+
 
 @pytest.mark.skipif(True, reason="Disabling old tests")
 class Test_arp_manager_restartability:
@@ -430,6 +490,10 @@ class Test_arp_manager_restartability:
     def test_arp_manager_restart_check_new_updates(self):
         self.test.arp_manager_restart_check_new_updates()
 
+    # Test for verifying resync in chunks after arpmgrd restart
+    def test_arp_manager_restart_chunked_resync(self):
+        self.test.arp_manager_restart_chunked_resync()
+
     def teardown_class(cls):
         # Stop the Docker containers, and
         # mininet topology
@@ -39,6 +39,12 @@ class arpManagerTxnFailTests(OpsVsiTest):
                            host=Host, link=OpsVsiLink,
                            controller=None, build=True)
 
+    def arpmgrd_counter(self, name):
+        s1 = self.net.switches[0]
+        output = s1.cmd("ovs-appctl -t ops-arpmgrd arpmgrd/stats")
+        words = output.replace(",", " ").split()
+        return int(words[words.index(name) + 1])
+
     def arp_manager_configure_and_setup(self):
         s1 = self.net.switches[0]
         h1 = self.net.hosts[0]
@@ -269,6 +275,64 @@ class arpManagerTxnFailTests(OpsVsiTest):
 
         info("Verified modified/deleted entries after ovsdb restart\n")
 
+    def arp_manager_ovsdb_txn_retry(self):
+        info("\n########## Test to verify a transaction aborted by an "
+             "ovsdb-server restart is retried without a resync with "
+             "kernel ##########\n")
+        s1 = self.net.switches[0]
+
+        retry_cnt = self.arpmgrd_counter("txn_retries")
+        resync_cnt = self.arpmgrd_counter("txn_resyncs")
+        force_ins_cnt = self.arpmgrd_counter("resync_inserts")
+
+        # Kill l3 portd so it does not add new ip address
+        # on restart which will clear neighbors
+        s1.cmd("ip netns exec swns killall ops-portd")
+
+        # Stop ovsdb-server, so the transaction adding new entries
+        # is still in progress when the server is killed
+        info("\nStopping ovsdb server\n")
+        s1.cmd("ip netns exec swns killall -STOP ovsdb-server")
+
+        info("Adding 5 static arp entries with ovsdb-server stopped\n")
+        for i in range(111, 116):
+            s1.cmd("ip netns exec swns ip neigh add 192.168.1.%d \
+                   lladdr 00:bb:cc:dd:ee:ff dev 1" % i)
+
+        time.sleep(2)
+
+        # Transaction in progress is aborted with TRY_AGAIN
+        info("\nKilling ovsdb server\n")
+        s1.cmd("ip netns exec swns killall -KILL ovsdb-server")
+
+        info("Restarting ovsdb-server\n")
+        s1.cmd("ip netns exec swns /usr/sbin/ovsdb-server \
+               --remote=punix:/var/run/openvswitch/db.sock \
+               --detach --no-chdir --pidfile -vSYSLOG:INFO \
+               /var/run/openvswitch/ovsdb.db /var/local/openvswitch/config.db")
+
+        time.sleep(16)
+
+        output = s1.cmdCLI("do show arp")
+        info("\n" + output + "\n\n")
+
+        info("Verifying new static neighbors in ovsdb after retry\n")
+        for i in range(111, 116):
+            assert ("192.168.1.%d" % i) in output, \
+                "static entry 192.168.1.%d missing" % i
+
+        assert self.arpmgrd_counter("txn_retries") > retry_cnt, \
+            "Aborted transaction was not retried"
+        assert self.arpmgrd_counter("txn_resyncs") == resync_cnt, \
+            "Aborted transaction caused a resync with kernel"
+        assert self.arpmgrd_counter("resync_inserts") == force_ins_cnt, \
+            "Neighbors were inserted again by a resync"
+
+        # Restart l3 portd killed above
+        s1.cmd("ip netns exec swns ops-portd --pidfile --detach")
+
+        info("Verified transaction retry after ovsdb restart\n")
+
 @pytest.mark.skipif(True, reason="skipped test case due to random gate job failures.")
 class Test_arp_manager_txn_fail:
 
@@ -288,6 +352,10 @@ class Test_arp_manager_txn_fail:
     def test_arp_manager_ovsdb_failure_check_new_updates(self):
         self.test.arp_manager_ovsdb_failure_check_new_updates()
 
+    # Test for verifying arpmgr retries a transaction aborted by ovsdb
+    def test_arp_manager_ovsdb_txn_retry(self):
+        self.test.arp_manager_ovsdb_txn_retry()
+
     def teardown_class(cls):
         # Stop the Docker containers, and
         # mininet topology